@@ -0,0 +1,82 @@
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .blob_store import load_report_results
+from .scanners.scan_diff import apply_delta
+
+logger = logging.getLogger(__name__)
+
+# Rapports incrémentaux successifs au-delà desquels un nouvel état complet est scanné
+SCAN_BASELINE_MAX_CHAIN = int(os.getenv("SCAN_BASELINE_MAX_CHAIN", "20"))
+# Rapports consultés pour trouver le dernier scan réseau réussi de la cible
+SCAN_BASELINE_LOOKBACK = 20
+
+def network_section(report: Optional[models.Report]) -> Optional[Dict[str, Any]]:
+    """Résultat NetworkScanner d'un rapport, s'il a abouti"""
+    if report is None:
+        return None
+    # Le résumé suffit à écarter un rapport sans scan réseau réussi, sans lire son corps
+    if report.summary is not None:
+        scanner = (report.summary.get("scanners") or {}).get("NetworkScanner") or {}
+        if scanner.get("status") != "completed":
+            return None
+    results = load_report_results(report)
+    if not isinstance(results, dict):
+        return None
+    section = (results.get("results") or {}).get("NetworkScanner")
+    if not section or section.get("status") != "completed":
+        return None
+    return section
+
+def load_baseline(db: Session, owner_id: int, target: str) -> Optional[Dict[str, Any]]:
+    """État complet de la cible d'après le dernier rapport de l'utilisateur.
+
+    Un rapport incrémental ne contient que son écart : la chaîne de ses
+    références est remontée jusqu'au dernier état complet, puis les écarts
+    sont réappliqués dans l'ordre. Une chaîne trop longue ou rompue donne
+    None, et le scan repart d'un état complet.
+    """
+    reports = db.query(models.Report).filter(
+        models.Report.owner_id == owner_id,
+        models.Report.target == target
+    ).order_by(models.Report.id.desc()).limit(SCAN_BASELINE_LOOKBACK)
+    # Résultats lus une seule fois par rapport (corps dans le stockage de blobs)
+    latest = latest_section = None
+    for report in reports:
+        latest_section = network_section(report)
+        if latest_section:
+            latest = report
+            break
+    if latest is None:
+        return None
+
+    chain = []
+    section = latest_section
+    while section["results"].get("mode") == "incremental":
+        chain.append(section["results"])
+        if len(chain) > SCAN_BASELINE_MAX_CHAIN:
+            logger.info(f"Référence de {target} trop ancienne ({len(chain)} écarts) : nouvel état complet")
+            return None
+        # Référence d'un rapport de l'utilisateur seulement
+        report = db.query(models.Report).filter(
+            models.Report.id == section["results"]["baseline"]["report_id"],
+            models.Report.owner_id == owner_id
+        ).first()
+        section = network_section(report)
+        if section is None:
+            return None
+
+    # Sans date de détection propre, un hôte date du scan complet qui l'a sondé
+    hosts = [{**host, "probed_at": host.get("probed_at") or section.get("timestamp")}
+             for host in section["results"].get("hosts", [])]
+    for results in reversed(chain):
+        hosts = apply_delta(hosts, results)
+    return {
+        "report_id": latest.id,
+        "timestamp": latest_section.get("timestamp"),
+        "hosts": hosts
+    }
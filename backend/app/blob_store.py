@@ -0,0 +1,135 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from . import models
+
+# Stockage des corps de rapports : type de stockage et répertoire du stockage local
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "local")
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "./blobs")
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
+# Taille des blocs envoyés au client
+BLOB_CHUNK_SIZE = 64 * 1024
+
+class BlobStore(ABC):
+    """Contenus compressés (gzip), adressés par leur empreinte.
+
+    La référence d'un contenu est l'empreinte SHA-256 de ses octets non
+    compressés : un contenu identique n'est stocké qu'une fois.
+    """
+
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        """Stocke un contenu s'il est nouveau et retourne sa référence"""
+
+    @abstractmethod
+    def open_compressed(self, ref: str) -> BinaryIO:
+        """Flux gzip d'un contenu, tel que stocké"""
+
+    @contextmanager
+    def open(self, ref: str) -> Iterator[BinaryIO]:
+        """Flux décompressé d'un contenu, lu à la demande"""
+        with self.open_compressed(ref) as raw, gzip.GzipFile(fileobj=raw, mode="rb") as body:
+            yield body
+
+    def put_json(self, value: Any) -> str:
+        # Clés triées : deux résultats identiques ont la même empreinte
+        return self.put(json.dumps(value, sort_keys=True, separators=(",", ":")).encode())
+
+    def load_json(self, ref: str) -> Any:
+        with self.open(ref) as body:
+            return json.load(body)
+
+    def iter_chunks(self, ref: str, compressed: bool = False) -> Iterator[bytes]:
+        with (self.open_compressed(ref) if compressed else self.open(ref)) as body:
+            while True:
+                chunk = body.read(BLOB_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+class LocalBlobStore(BlobStore):
+    """Contenus dans un répertoire partagé par l'API et les workers"""
+
+    def __init__(self, root: str = BLOB_STORE_PATH, compression_level: int = BLOB_COMPRESSION_LEVEL):
+        self.root = root
+        self.compression_level = compression_level
+
+    def path(self, ref: str) -> str:
+        if len(ref) != 64 or not all(c in "0123456789abcdef" for c in ref):
+            raise ValueError(f"Invalid blob reference: {ref}")
+        return os.path.join(self.root, ref[:2], ref[2:4], f"{ref}.json.gz")
+
+    def put(self, data: bytes) -> str:
+        ref = hashlib.sha256(data).hexdigest()
+        path = self.path(ref)
+        if os.path.exists(path):
+            return ref
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Écriture dans un fichier temporaire renommé ensuite : un lecteur ne
+        # voit jamais de contenu partiel, deux écritures concurrentes s'écrasent
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=self.compression_level, mtime=0) as body:
+                    body.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return ref
+
+    def open_compressed(self, ref: str) -> BinaryIO:
+        return open(self.path(ref), "rb")
+
+# Stockages disponibles, choisis par BLOB_STORE_BACKEND
+BLOB_STORE_BACKENDS = {"local": LocalBlobStore}
+
+blob_store = None
+
+def get_blob_store() -> BlobStore:
+    global blob_store
+    if blob_store is None:
+        if BLOB_STORE_BACKEND not in BLOB_STORE_BACKENDS:
+            raise ValueError(f"Unknown blob store backend: {BLOB_STORE_BACKEND}")
+        blob_store = BLOB_STORE_BACKENDS[BLOB_STORE_BACKEND]()
+    return blob_store
+
+def load_report_results(report: models.Report) -> Optional[Dict[str, Any]]:
+    """Résultats d'un rapport, stockés à part ou (rapports anciens) dans la ligne"""
+    if report.results_ref:
+        return get_blob_store().load_json(report.results_ref)
+    return report.results
+
+def iter_report_json(report: models.Report, metadata: str) -> Iterator[bytes]:
+    """Rapport complet en JSON : métadonnées (objet JSON), puis résultats lus par blocs"""
+    yield metadata.rstrip()[:-1].encode() + b', "results": '
+    if report.results_ref:
+        yield from get_blob_store().iter_chunks(report.results_ref)
+    else:
+        yield json.dumps(report.results).encode()
+    yield b"}"
+
+def report_results_response(report: models.Report, accept_encoding: Optional[str] = None) -> Response:
+    """Résultats d'un rapport envoyés par blocs, sans les charger en mémoire.
+
+    Un client acceptant gzip reçoit le contenu tel que stocké, sans
+    décompression par l'API.
+    """
+    if not report.results_ref:
+        return JSONResponse(report.results)
+    store = get_blob_store()
+    if "gzip" in (accept_encoding or ""):
+        return StreamingResponse(
+            store.iter_chunks(report.results_ref, compressed=True),
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip"}
+        )
+    return StreamingResponse(store.iter_chunks(report.results_ref), media_type="application/json")
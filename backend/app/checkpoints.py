@@ -0,0 +1,54 @@
+import logging
+import os
+from typing import Any, Dict
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .events import ScanEventWriter
+
+logger = logging.getLogger(__name__)
+
+# Délai maximal avant l'écriture d'un point de reprise (secondes)
+SCAN_CHECKPOINT_INTERVAL = float(os.getenv("SCAN_CHECKPOINT_INTERVAL", "1"))
+
+class CheckpointWriter(ScanEventWriter):
+    """Enregistre les points de reprise d'un scan dans scan_checkpoints, par lots.
+
+    Un point de reprise marque une unité de travail terminée (bloc nmap,
+    hôte d'un bloc en cours) : une tâche reprise après l'arrêt de son worker
+    ne perd que le travail des flush_interval dernières secondes et des
+    blocs en cours.
+    """
+
+    model = models.ScanCheckpoint
+
+    def __init__(self, scan_id: int, flush_interval: float = SCAN_CHECKPOINT_INTERVAL):
+        super().__init__(scan_id, flush_interval)
+
+    def save(self, scanner: str, key: str, data: Any) -> None:
+        self.pending.append({
+            "scan_job_id": self.scan_id,
+            "scanner": scanner,
+            "key": key,
+            "data": data
+        })
+
+def load_checkpoints(db: Session, scan_id: int) -> Dict[str, Dict[str, Any]]:
+    """Points de reprise d'une tâche, par scanner puis par clé (le plus récent l'emporte)"""
+    checkpoints = {}
+    rows = db.query(models.ScanCheckpoint).filter(
+        models.ScanCheckpoint.scan_job_id == scan_id
+    ).order_by(models.ScanCheckpoint.id)
+    for row in rows:
+        checkpoints.setdefault(row.scanner, {})[row.key] = row.data
+    return checkpoints
+
+def clear_checkpoints(db: Session, scan_id: int) -> None:
+    """Supprime les points de reprise d'une tâche terminée"""
+    deleted = db.query(models.ScanCheckpoint).filter(
+        models.ScanCheckpoint.scan_job_id == scan_id
+    ).delete(synchronize_session=False)
+    db.commit()
+    if deleted:
+        logger.info(f"{deleted} points de reprise du scan {scan_id} supprimés")
@@ -1,23 +1,142 @@
-from sqlalchemy import create_engine
+import asyncio
+import logging
+from typing import Any, Callable
+
+from sqlalchemy import create_engine, inspect, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
 
+logger = logging.getLogger(__name__)
+
 POSTGRES_USER = os.getenv("POSTGRES_USER", "postgres")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
 POSTGRES_DB = os.getenv("POSTGRES_DB", "security_toolbox")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "db")
 
-SQLALCHEMY_DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DB}"
+# DATABASE_URL permet de pointer vers une autre base (ex: sqlite:///./dev.db en local)
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DB}"
+)
+# Connexions simultanées du moteur asynchrone (requêtes de l'API, tâches du worker)
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def async_database_url(url: str) -> str:
+    """Même base, avec le pilote asynchrone (asyncpg, aiosqlite)"""
+    scheme, _, rest = url.partition("://")
+    driver = {"postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    return f"{driver.get(scheme.split('+')[0], scheme)}://{rest}"
+
+connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
+# Moteur synchrone : création des tables, compte admin
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Moteur asynchrone : routes async et worker, sans bloquer la boucle d'événements
+# (sous SQLite, le pool évite d'ouvrir une connexion et son thread à chaque requête)
+async_engine = create_async_engine(
+    async_database_url(SQLALCHEMY_DATABASE_URL),
+    pool_size=DATABASE_POOL_SIZE,
+    max_overflow=DATABASE_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    **({"poolclass": AsyncAdaptedQueuePool} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {})
+)
+# Les objets restent lisibles après commit : un accès expiré déclencherait
+# une requête implicite, impossible hors de run_sync
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
+def upgrade_schema(bind=engine) -> None:
+    """Crée les tables manquantes et complète les tables existantes.
+
+    create_all ignore les tables déjà présentes : les colonnes et index
+    ajoutés aux modèles depuis leur création sont donc ajoutés ici
+    (ALTER TABLE ... ADD COLUMN, CREATE INDEX). Idempotent, appelé au
+    démarrage de l'API et du worker.
+    """
+    Base.metadata.create_all(bind=bind)
+    existing = {
+        table: {column["name"] for column in inspect(bind).get_columns(table)}
+        for table in Base.metadata.tables
+    }
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for column in table.columns:
+                if column.name in existing[table.name]:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=bind.dialect)}"
+                # Valeur par défaut constante (priorité, compteurs) : aussi appliquée aux lignes existantes
+                if column.default is not None and column.default.is_scalar:
+                    value = literal(column.default.arg, column.type).compile(
+                        dialect=bind.dialect, compile_kwargs={"literal_binds": True}
+                    )
+                    ddl += f" DEFAULT {value}"
+                logger.info(f"Mise à jour du schéma: {ddl}")
+                connection.execute(text(ddl))
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Session asynchrone propre à la requête"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+class JobSession:
+    """Session asynchrone d'une tâche de scan.
+
+    Une AsyncSession ne supporte pas d'opérations concurrentes, or les
+    scanners signalent avancement et résultats par des callbacks
+    synchrones. Chaque opération (fonction recevant la Session synchrone,
+    exécutée par run_sync) passe donc par un verrou, dans l'ordre d'arrivée :
+    call() attend son résultat, schedule() n'attend pas ; les opérations
+    programmées sont terminées avant la fermeture de la session.
+    """
+
+    def __init__(self):
+        self.session = AsyncSessionLocal()
+        self.lock = asyncio.Lock()
+        self.scheduled = set()
+
+    async def __aenter__(self) -> "JobSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        try:
+            if self.scheduled:
+                await asyncio.gather(*self.scheduled, return_exceptions=True)
+        finally:
+            # Attendre l'opération en cours, même protégée d'une annulation
+            async with self.lock:
+                await self.session.close()
+
+    async def call(self, function: Callable[..., Any], *args) -> Any:
+        async with self.lock:
+            try:
+                return await self.session.run_sync(function, *args)
+            except Exception:
+                await self.session.rollback()
+                raise
+
+    def schedule(self, function: Callable[..., Any], *args) -> None:
+        task = asyncio.ensure_future(self.call(function, *args))
+        self.scheduled.add(task)
+
+        def done(task: asyncio.Future) -> None:
+            self.scheduled.discard(task)
+            if not task.cancelled() and task.exception():
+                logger.error(f"Écriture en base impossible: {str(task.exception())}")
+        task.add_done_callback(done)
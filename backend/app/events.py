@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Délai entre deux lectures de scan_events par l'API (secondes)
+SCAN_EVENTS_POLL_INTERVAL = float(os.getenv("SCAN_EVENTS_POLL_INTERVAL", "0.5"))
+# Lots (un par lecture) en attente par client avant d'écarter les plus anciens
+SCAN_EVENTS_QUEUE_SIZE = int(os.getenv("SCAN_EVENTS_QUEUE_SIZE", "20"))
+# Conservation des événements d'une tâche terminée (secondes), le temps
+# qu'un client reconnecté rejoue la fin de son flux
+SCAN_EVENTS_RETENTION = float(os.getenv("SCAN_EVENTS_RETENTION", "3600"))
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+def event_to_dict(event: models.ScanEvent) -> Dict[str, Any]:
+    return {
+        "id": event.id,
+        "scan_id": event.scan_job_id,
+        "scanner": event.scanner,
+        "type": event.type,
+        "data": event.data,
+        "created_at": event.created_at.isoformat()
+    }
+
+def is_final(event: Dict[str, Any]) -> bool:
+    """Vrai pour le changement de statut qui termine la tâche"""
+    return event["type"] == "status" and event["scanner"] is None and event["data"].get("status") in TERMINAL_STATUSES
+
+def format_sse(event_type: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Sérialise un événement au format text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+def purge_events(db: Session, retention: float = SCAN_EVENTS_RETENTION) -> int:
+    """Supprime les événements des tâches terminées depuis plus de retention secondes"""
+    finished = select(models.ScanJob.id).filter(
+        models.ScanJob.status.in_(TERMINAL_STATUSES),
+        models.ScanJob.completed_at < datetime.utcnow() - timedelta(seconds=retention)
+    )
+    # Le dernier événement est gardé : sous SQLite, un identifiant supprimé en fin
+    # de table serait réattribué et échapperait aux lectures "id > last_id"
+    latest = db.query(func.max(models.ScanEvent.id)).scalar()
+    deleted = db.query(models.ScanEvent).filter(
+        models.ScanEvent.scan_job_id.in_(finished),
+        models.ScanEvent.id < (latest or 0)
+    ).delete(synchronize_session=False)
+    db.commit()
+    if deleted:
+        logger.info(f"{deleted} événements de scans terminés supprimés")
+    return deleted
+
+class ScanEventWriter:
+    """Enregistre les événements d'un scan dans scan_events, par lots.
+
+    Les scanners publient depuis la boucle d'événements ; l'écriture est
+    regroupée toutes les flush_interval secondes pour qu'un scan de milliers
+    d'hôtes ne fasse pas une transaction par hôte.
+    """
+
+    model = models.ScanEvent
+
+    def __init__(self, scan_id: int, flush_interval: float = 0.5):
+        self.scan_id = scan_id
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.task = None
+
+    def publish(self, event_type: str, data: Dict[str, Any], scanner: Optional[str] = None) -> None:
+        self.pending.append({
+            "scan_job_id": self.scan_id,
+            "scanner": scanner,
+            "type": event_type,
+            "data": data
+        })
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.run_sync(lambda session: session.bulk_insert_mappings(self.model, batch))
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Écriture des événements du scan {self.scan_id} impossible: {str(e)}")
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+
+    async def close(self) -> None:
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+class Subscription:
+    """File bornée de lots d'événements d'un client.
+
+    Un client qui a plus de maxsize lectures de retard perd les lots les
+    plus anciens ; le nombre d'événements perdus est tenu dans dropped.
+    """
+
+    def __init__(self, scan_id: int, maxsize: int):
+        self.scan_id = scan_id
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, batch: List[Dict[str, Any]]) -> None:
+        if self.queue.full():
+            self.dropped += len(self.queue.get_nowait())
+        self.queue.put_nowait(batch)
+
+class EventBroker:
+    """Diffuse les événements de scan aux clients connectés.
+
+    Une seule tâche par processus lit scan_events pour toutes les tâches
+    suivies, quel que soit le nombre de clients, puis répartit chaque
+    événement dans les files des abonnés. Elle s'arrête quand plus personne
+    n'écoute.
+    """
+
+    def __init__(self, poll_interval: float = SCAN_EVENTS_POLL_INTERVAL, queue_size: int = SCAN_EVENTS_QUEUE_SIZE):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.subscribers: Dict[int, Set[Subscription]] = {}
+        self.last_id = 0
+        self.task = None
+        self.starting = asyncio.Lock()
+
+    @staticmethod
+    async def fetch(scan_ids: List[int], after_id: int, limit: int = 1000) -> List[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.ScanEvent)
+                .filter(models.ScanEvent.scan_job_id.in_(scan_ids), models.ScanEvent.id > after_id)
+                .order_by(models.ScanEvent.id)
+                .limit(limit)
+            )
+            return [event_to_dict(event) for event in result.scalars()]
+
+    @staticmethod
+    async def latest_id() -> int:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(func.max(models.ScanEvent.id)))
+            return result.scalar() or 0
+
+    async def subscribe(self, scan_id: int) -> Subscription:
+        subscription = Subscription(scan_id, self.queue_size)
+        async with self.starting:
+            if self.task is None:
+                # Ne diffuser que les événements postérieurs à l'abonnement
+                self.last_id = await self.latest_id()
+                self.task = asyncio.create_task(self.poll())
+        self.subscribers.setdefault(scan_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self.subscribers.get(subscription.scan_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self.subscribers.pop(subscription.scan_id, None)
+
+    async def poll(self) -> None:
+        try:
+            while self.subscribers:
+                try:
+                    events = await self.fetch(list(self.subscribers), self.last_id)
+                except Exception as e:
+                    logger.error(f"Lecture des événements impossible: {str(e)}")
+                    events = []
+                batches = {}
+                for event in events:
+                    self.last_id = max(self.last_id, event["id"])
+                    batches.setdefault(event["scan_id"], []).append(event)
+                for scan_id, batch in batches.items():
+                    for subscription in list(self.subscribers.get(scan_id, ())):
+                        subscription.offer(batch)
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self.task = None
+
+_broker = None
+
+def get_event_broker() -> EventBroker:
+    """Diffuseur partagé par les connexions du processus API"""
+    global _broker
+    if _broker is None:
+        _broker = EventBroker()
+    return _broker
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from . import models, security
-from .database import SessionLocal, engine
+from .database import SessionLocal, upgrade_schema
 import logging
 
 # Configuration du logging
@@ -10,7 +10,7 @@ logger = logging.getLogger(__name__)
 def init_admin():
     try:
         # Création des tables
-        models.Base.metadata.create_all(bind=engine)
+        upgrade_schema()
         
         # Création de la session
         db = SessionLocal()
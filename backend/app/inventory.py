@@ -0,0 +1,247 @@
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .blob_store import load_report_results
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Lignes par requête IN et par insertion groupée
+INVENTORY_BATCH_SIZE = 500
+
+VERSION_NUMBER = re.compile(r"(\d+)(?:\.(\d+))?")
+
+def parse_version(version: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Version majeure et mineure d'une version nmap ("8.9p1 Ubuntu" -> 8, 9)"""
+    match = VERSION_NUMBER.search(version or "")
+    if match is None:
+        return None, None
+    return int(match.group(1)), int(match.group(2)) if match.group(2) is not None else None
+
+def observed_at(section: Dict[str, Any], results: Dict[str, Any]) -> datetime:
+    """Date de l'observation : début du scanner, à défaut du scan"""
+    for value in (section.get("timestamp"), results.get("timestamp")):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            continue
+    return datetime.utcnow()
+
+def batches(items: Sequence[Any], size: int = INVENTORY_BATCH_SIZE) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def scanner_section(results: Dict[str, Any], scanner: str) -> Optional[Dict[str, Any]]:
+    section = (results.get("results") or {}).get(scanner)
+    if not isinstance(section, dict) or not isinstance(section.get("results"), dict):
+        return None
+    return section
+
+class InventoryWriter:
+    """Reporte le contenu d'un rapport dans hosts, services et findings.
+
+    Les lignes existantes sont lues par lots puis mises à jour, les autres
+    insérées par lots. Une observation plus ancienne que l'état connu
+    (rapport copié d'un cache) ne l'écrase pas.
+    """
+
+    def __init__(self, db: Session, report: models.Report):
+        self.db = db
+        self.report = report
+        self.owner_id = report.owner_id
+
+    def host_ids(self, addresses: Sequence[str]) -> Dict[str, Tuple[int, Optional[datetime]]]:
+        known = {}
+        for batch in batches(addresses):
+            rows = self.db.query(models.Host.id, models.Host.address, models.Host.last_seen).filter(
+                models.Host.owner_id == self.owner_id,
+                models.Host.address.in_(batch)
+            )
+            for host_id, address, last_seen in rows:
+                known[address] = (host_id, last_seen)
+        return known
+
+    def service_ids(self, host_ids: Sequence[int]) -> Dict[Tuple[int, str, int], Tuple[int, Optional[datetime]]]:
+        known = {}
+        for batch in batches(host_ids):
+            rows = self.db.query(
+                models.Service.id, models.Service.host_id, models.Service.protocol,
+                models.Service.port, models.Service.last_seen
+            ).filter(models.Service.host_id.in_(batch))
+            for service_id, host_id, protocol, port, last_seen in rows:
+                known[(host_id, protocol, port)] = (service_id, last_seen)
+        return known
+
+    def record_network(self, section: Dict[str, Any], seen: datetime) -> int:
+        scan_results = section["results"]
+        hosts = {host["ip"]: host for host in scan_results.get("hosts", [])}
+        delta = scan_results.get("delta") or {}
+        # Scan incrémental : hôtes confirmés actifs par la découverte sans être sondés
+        unchanged = set(scan_results.get("unchanged", [])) - set(hosts)
+
+        # Hôtes sondés : créés ou mis à jour (et hôtes de l'écart d'un scan incrémental)
+        known = self.host_ids(list(
+            set(hosts) | unchanged | set(delta.get("gone_hosts", []))
+            | {entry["ip"] for entry in delta.get("closed", [])}
+        ))
+        self.db.bulk_update_mappings(models.Host, [
+            {"id": host_id, "status": hosts[address]["status"] if address in hosts else "up",
+             "last_seen": seen, "report_id": self.report.id}
+            for address, (host_id, last_seen) in known.items()
+            if (address in hosts or address in unchanged) and (last_seen is None or last_seen <= seen)
+        ])
+        new_hosts = [address for address in hosts if address not in known]
+        for batch in batches(new_hosts):
+            self.db.bulk_insert_mappings(models.Host, [{
+                "owner_id": self.owner_id,
+                "address": address,
+                "status": hosts[address]["status"],
+                "first_seen": seen,
+                "last_seen": seen,
+                "report_id": self.report.id
+            } for address in batch])
+        known.update(self.host_ids(new_hosts))
+
+        # Scan incrémental : hôtes disparus depuis la référence
+        self.db.bulk_update_mappings(models.Host, [
+            {"id": known[address][0], "status": "down", "report_id": self.report.id}
+            for address in delta.get("gone_hosts", []) if address in known
+        ])
+
+        # Ports des hôtes sondés, puis ports fermés depuis la référence
+        ports = {}
+        for address, host in hosts.items():
+            host_id, last_seen = known[address]
+            if last_seen is not None and last_seen > seen:
+                continue
+            for port in host.get("ports", []):
+                ports[(host_id, port["protocol"], int(port["number"]))] = port
+        closed = [
+            (known[entry["ip"]][0], entry["protocol"], int(entry["port"]))
+            for entry in delta.get("closed", []) if entry["ip"] in known
+        ]
+        services = self.service_ids(list({key[0] for key in list(ports) + closed}))
+
+        updates, inserts = [], []
+        for key, port in ports.items():
+            service = port.get("service") or {}
+            major, minor = parse_version(service.get("version"))
+            values = {
+                "state": port["state"],
+                "name": service.get("name"),
+                "product": service.get("product"),
+                "version": service.get("version"),
+                "version_major": major,
+                "version_minor": minor,
+                "last_seen": seen,
+                "report_id": self.report.id
+            }
+            if key in services:
+                service_id, last_seen = services[key]
+                if last_seen is None or last_seen <= seen:
+                    updates.append({"id": service_id, **values})
+            else:
+                host_id, protocol, number = key
+                inserts.append({
+                    "owner_id": self.owner_id, "host_id": host_id, "protocol": protocol,
+                    "port": number, "first_seen": seen, **values
+                })
+        updates.extend(
+            {"id": services[key][0], "state": "closed", "last_seen": seen, "report_id": self.report.id}
+            for key in closed if key in services
+        )
+        self.db.bulk_update_mappings(models.Service, updates)
+        for batch in batches(inserts):
+            self.db.bulk_insert_mappings(models.Service, batch)
+        return len(ports)
+
+    def record_alerts(self, section: Dict[str, Any], seen: datetime) -> int:
+        alerts = {
+            (str(alert.get("plugin_id")), alert.get("risk")): alert
+            for alert in section["results"].get("alerts", [])
+        }
+        known = {}
+        for plugin_id, risk, finding_id, last_seen in self.db.query(
+            models.Finding.plugin_id, models.Finding.risk, models.Finding.id, models.Finding.last_seen
+        ).filter(
+            models.Finding.owner_id == self.owner_id,
+            models.Finding.target == self.report.target
+        ):
+            known[(plugin_id, risk)] = (finding_id, last_seen)
+
+        updates, inserts = [], []
+        for key, alert in alerts.items():
+            values = {
+                "name": alert.get("name"),
+                "count": alert.get("count", 0),
+                "url": (alert.get("urls") or [None])[0],
+                "last_seen": seen,
+                "report_id": self.report.id
+            }
+            if key in known:
+                finding_id, last_seen = known[key]
+                if last_seen is None or last_seen <= seen:
+                    updates.append({"id": finding_id, **values})
+            else:
+                inserts.append({
+                    "owner_id": self.owner_id, "target": self.report.target,
+                    "plugin_id": key[0], "risk": key[1], "first_seen": seen, **values
+                })
+        self.db.bulk_update_mappings(models.Finding, updates)
+        self.db.bulk_insert_mappings(models.Finding, inserts)
+        return len(alerts)
+
+    def record(self, results: Dict[str, Any]) -> None:
+        network = scanner_section(results, "NetworkScanner")
+        services = self.record_network(network, observed_at(network, results)) if network else 0
+        vulnerability = scanner_section(results, "VulnerabilityScanner")
+        alerts = self.record_alerts(vulnerability, observed_at(vulnerability, results)) if vulnerability else 0
+        self.db.commit()
+        logger.info(f"Inventaire de l'utilisateur {self.owner_id} : {services} ports et "
+                    f"{alerts} alertes du rapport {self.report.id}")
+
+def record_inventory(db: Session, report: models.Report, results: Dict[str, Any]) -> None:
+    try:
+        InventoryWriter(db, report).record(results)
+    except IntegrityError:
+        # Hôte ou service inséré entre-temps par un autre worker : une seconde
+        # passe le trouve et le met à jour
+        db.rollback()
+        InventoryWriter(db, report).record(results)
+
+def index_job(scan_id: int, results: Optional[Dict[str, Any]] = None) -> None:
+    """Alimente l'inventaire avec le rapport d'une tâche et ceux des tâches rattachées.
+
+    Exécuté hors de la boucle d'événements, avec sa propre session ; une
+    erreur est journalisée sans affecter la tâche.
+    """
+    db = SessionLocal()
+    try:
+        scan_jobs = db.query(models.ScanJob).filter(
+            or_(models.ScanJob.id == scan_id, models.ScanJob.source_job_id == scan_id),
+            models.ScanJob.report_id.isnot(None)
+        ).order_by(models.ScanJob.id).all()
+        indexed = set()
+        for scan_job in scan_jobs:
+            # Résultat réutilisé par son propriétaire : déjà dans son inventaire
+            if scan_job.cache_status == "hit" and scan_job.source_job.owner_id == scan_job.owner_id:
+                continue
+            if scan_job.owner_id in indexed:
+                continue
+            indexed.add(scan_job.owner_id)
+            if results is None:
+                results = load_report_results(scan_job.report)
+            if isinstance(results, dict):
+                record_inventory(db, scan_job.report, results)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Inventaire du scan {scan_id} impossible: {str(e)}")
+    finally:
+        db.close()
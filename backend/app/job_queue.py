@@ -0,0 +1,348 @@
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session, aliased
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import logging
+import os
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Durée maximale d'une tâche (secondes), réductible par le paramètre job_timeout
+SCAN_JOB_TIMEOUT = float(os.getenv("SCAN_JOB_TIMEOUT", "21600"))
+
+def parse_job_timeout(parameters: Optional[Dict[str, Any]]) -> float:
+    """Délai de la tâche d'après ses paramètres ; ValueError si job_timeout est invalide"""
+    value = (parameters or {}).get("job_timeout")
+    if value is None:
+        return SCAN_JOB_TIMEOUT
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= SCAN_JOB_TIMEOUT:
+        raise ValueError(f"job_timeout must be a number of seconds in ]0, {SCAN_JOB_TIMEOUT:g}]")
+    return float(value)
+
+class ScanJobQueue:
+    """File d'attente persistante des scans, adossée à la table scan_jobs.
+
+    Une tâche est en file tant que son statut vaut "pending". Sous PostgreSQL,
+    la réclamation utilise SELECT ... FOR UPDATE SKIP LOCKED pour que plusieurs
+    workers ne se bloquent pas mutuellement ; sous SQLite (backend de test
+    local) la clause est ignorée et seule la mise à jour conditionnelle sur le
+    statut garantit qu'une tâche n'est réclamée qu'une fois.
+
+    Ordre de réclamation : priorité décroissante, puis partage équitable
+    (d'abord les utilisateurs ayant le moins de scans en cours), puis
+    ancienneté. Un utilisateur qui lance dix scans ne bloque donc pas celui
+    qui n'en lance qu'un.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, scan_job: models.ScanJob) -> models.ScanJob:
+        """Ajoute une tâche de scan à la file"""
+        scan_job.status = "pending"
+        self.db.add(scan_job)
+        self.db.commit()
+        self.db.refresh(scan_job)
+        return scan_job
+
+    def attach(self, scan_job: models.ScanJob, source: models.ScanJob) -> models.ScanJob:
+        """Rattache une tâche à l'exécution identique source, en file ou en cours.
+
+        La tâche n'est jamais réclamée : elle suit le statut de source et
+        reçoit une copie de son rapport à la fin.
+        """
+        scan_job.source_job_id = source.id
+        scan_job.cache_status = "coalesced"
+        scan_job.status = source.status
+        scan_job.started_at = source.started_at
+        scan_job.progress = source.progress
+        scan_job.eta = source.eta
+        self.db.add(scan_job)
+        self.db.commit()
+        self.db.refresh(scan_job)
+        return scan_job
+
+    def reuse(self, scan_job: models.ScanJob, source: models.ScanJob) -> models.ScanJob:
+        """Termine aussitôt une tâche avec le résultat de la tâche identique source"""
+        now = datetime.utcnow()
+        scan_job.source_job_id = source.id
+        scan_job.cache_status = "hit"
+        scan_job.status = "completed"
+        scan_job.started_at = now
+        scan_job.completed_at = now
+        scan_job.progress = 100.0
+        scan_job.wait_seconds = 0.0
+        scan_job.report_id = self.copy_report(source.report, scan_job.owner_id).id
+        self.db.add(scan_job)
+        self.db.commit()
+        self.db.refresh(scan_job)
+        return scan_job
+
+    def copy_report(self, report: models.Report, owner_id: int) -> models.Report:
+        """Rapport d'une exécution partagée, au nom d'un autre demandeur"""
+        copy = models.Report(
+            title=report.title,
+            description=report.description,
+            scan_type=report.scan_type,
+            target=report.target,
+            status=report.status,
+            summary=report.summary,
+            results_ref=report.results_ref,
+            results=report.results,
+            owner_id=owner_id
+        )
+        self.db.add(copy)
+        self.db.commit()
+        return copy
+
+    def followers(self, job_id: int) -> List[models.ScanJob]:
+        """Tâches encore actives rattachées à l'exécution job_id"""
+        return self.db.query(models.ScanJob).filter(
+            models.ScanJob.source_job_id == job_id,
+            models.ScanJob.status.in_(("pending", "running"))
+        ).all()
+
+    def pending(self):
+        """Requête des tâches en attente, dans l'ordre où elles seront réclamées"""
+        running = aliased(models.ScanJob)
+        owner_running = (
+            self.db.query(func.count(running.id))
+            .filter(running.owner_id == models.ScanJob.owner_id, running.status == "running")
+            .correlate(models.ScanJob)
+            .scalar_subquery()
+        )
+        return (
+            self.db.query(models.ScanJob.id)
+            .filter(models.ScanJob.status == "pending", models.ScanJob.source_job_id.is_(None))
+            .order_by(func.coalesce(models.ScanJob.priority, 0).desc(), owner_running, models.ScanJob.id)
+        )
+
+    def queue_positions(self) -> Dict[int, int]:
+        """Rang (à partir de 1) de chaque tâche en attente"""
+        return {row.id: position for position, row in enumerate(self.pending(), start=1)}
+
+    def claim(self, worker_id: str) -> Optional[int]:
+        """Réclame la prochaine tâche en attente et la passe à "running" """
+        candidate = self.pending().with_for_update(skip_locked=True).first()
+        if candidate is None:
+            self.db.rollback()
+            return None
+
+        claimed = (
+            self.db.query(models.ScanJob)
+            .filter(models.ScanJob.id == candidate.id, models.ScanJob.status == "pending")
+            .update(
+                {
+                    "status": "running",
+                    "worker_id": worker_id,
+                    "started_at": datetime.utcnow(),
+                    "heartbeat_at": datetime.utcnow(),
+                    "attempts": func.coalesce(models.ScanJob.attempts, 0) + 1
+                },
+                synchronize_session=False
+            )
+        )
+        if claimed:
+            self.db.query(models.ScanJob).filter(
+                models.ScanJob.source_job_id == candidate.id, models.ScanJob.status == "pending"
+            ).update({"status": "running", "started_at": datetime.utcnow()}, synchronize_session=False)
+        self.db.commit()
+        if not claimed:
+            # Un autre worker a pris la tâche entre la lecture et la mise à jour
+            return None
+        logger.info(f"Tâche {candidate.id} réclamée par {worker_id}")
+        return candidate.id
+
+    def heartbeat(self, job_ids: List[int]) -> None:
+        """Signale que le worker exécute toujours job_ids"""
+        self.db.query(models.ScanJob).filter(
+            models.ScanJob.id.in_(job_ids),
+            models.ScanJob.status == "running"
+        ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+        self.db.commit()
+
+    def requeue_stale(self, stale_after: float, max_attempts: int) -> Dict[str, List[int]]:
+        """Reprend les tâches "running" dont le worker ne donne plus signe de vie.
+
+        Une tâche sans battement depuis stale_after secondes (worker tué,
+        machine arrêtée) retourne en file et sera reprise depuis ses points
+        de reprise ; après max_attempts réclamations elle échoue, et une
+        tâche dont l'arrêt avait été demandé est annulée.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+        stale = self.db.query(models.ScanJob).filter(
+            models.ScanJob.status == "running",
+            models.ScanJob.source_job_id.is_(None),
+            or_(models.ScanJob.heartbeat_at < cutoff,
+                models.ScanJob.heartbeat_at.is_(None) & (models.ScanJob.started_at < cutoff))
+        ).with_for_update(skip_locked=True).all()
+
+        outcome = {"requeued": [], "failed": [], "cancelled": []}
+        now = datetime.utcnow()
+        for job in stale:
+            if job.cancel_requested:
+                status = "cancelled"
+            elif (job.attempts or 0) >= max_attempts:
+                status = "failed"
+            else:
+                status = "pending"
+            values = {"status": status, "worker_id": None, "heartbeat_at": None}
+            if status != "pending":
+                values["completed_at"] = now
+                values["eta"] = None
+                # Les sections interrompues ne seront pas terminées
+                self.db.query(models.ScanSection).filter(
+                    models.ScanSection.scan_job_id == job.id,
+                    models.ScanSection.status == "running"
+                ).update({"status": status, "completed_at": now}, synchronize_session=False)
+            self.db.query(models.ScanJob).filter(
+                models.ScanJob.id == job.id, models.ScanJob.status == "running"
+            ).update(values, synchronize_session=False)
+            self.db.query(models.ScanJob).filter(
+                models.ScanJob.source_job_id == job.id,
+                models.ScanJob.status.in_(("pending", "running"))
+            ).update({key: value for key, value in values.items() if key != "heartbeat_at"},
+                     synchronize_session=False)
+            outcome["requeued" if status == "pending" else status].append(job.id)
+        self.db.commit()
+        for job_id in outcome["requeued"]:
+            logger.warning(f"Tâche {job_id} abandonnée par son worker : remise en file")
+        for job_id in outcome["failed"] + outcome["cancelled"]:
+            logger.warning(f"Tâche {job_id} abandonnée par son worker : terminée")
+        return outcome
+
+    def release(self, job_id: int) -> None:
+        """Remet en file une tâche en cours abandonnée par l'arrêt de son worker"""
+        self.db.rollback()
+        self.db.query(models.ScanJob).filter(
+            or_(models.ScanJob.id == job_id, models.ScanJob.source_job_id == job_id),
+            models.ScanJob.status == "running"
+        ).update({"status": "pending", "worker_id": None}, synchronize_session=False)
+        self.db.query(models.ScanJob).filter(models.ScanJob.id == job_id).update(
+            {"heartbeat_at": None}, synchronize_session=False
+        )
+        self.db.commit()
+
+    def sections(self, job_id: int) -> Dict[str, models.ScanSection]:
+        """Sections déjà créées pour la tâche, par scanner"""
+        return {
+            section.scanner: section
+            for section in self.db.query(models.ScanSection).filter(models.ScanSection.scan_job_id == job_id)
+        }
+
+    def start_sections(self, job_id: int, scanners: List[str]) -> None:
+        """Crée une section "running" par scanner lancé pour la tâche.
+
+        Pour une tâche reprise, les sections existantes sont conservées et
+        celles restées "running" le redeviennent simplement.
+        """
+        existing = self.sections(job_id)
+        for scanner in scanners:
+            if scanner not in existing:
+                self.db.add(models.ScanSection(scan_job_id=job_id, scanner=scanner, status="running"))
+        self.db.commit()
+
+    def save_section(self, job_id: int, scanner: str, results: Dict[str, Any]) -> None:
+        """Enregistre le résultat d'un scanner dès qu'il est terminé"""
+        status = results.get("status") if results.get("status") in ("failed", "cancelled") else "completed"
+        self.db.query(models.ScanSection).filter(
+            models.ScanSection.scan_job_id == job_id,
+            models.ScanSection.scanner == scanner
+        ).update(
+            {"status": status, "results": results, "completed_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        self.db.commit()
+
+    def set_wait(self, job_id: int, seconds: float) -> None:
+        """Enregistre le temps passé avant le démarrage du premier scanner"""
+        self.db.query(models.ScanJob).filter(models.ScanJob.id == job_id).update(
+            {"wait_seconds": seconds},
+            synchronize_session=False
+        )
+        self.db.commit()
+
+    def set_progress(self, job_id: int, progress: float, eta: Optional[datetime]) -> None:
+        """Enregistre l'avancement (en pourcentage) et la fin estimée d'une tâche et des tâches rattachées"""
+        self.db.query(models.ScanJob).filter(
+            or_(models.ScanJob.id == job_id, models.ScanJob.source_job_id == job_id)
+        ).update(
+            {"progress": progress, "eta": eta},
+            synchronize_session=False
+        )
+        self.db.commit()
+
+    def complete(self, job_id: int, report_id: int, status: str = "completed") -> None:
+        """Termine une tâche (completed, ou cancelled/failed avec résultats partiels) et la relie à son rapport"""
+        values = {"status": status, "completed_at": datetime.utcnow(), "report_id": report_id, "eta": None}
+        if status == "completed":
+            values["progress"] = 100.0
+        self.db.query(models.ScanJob).filter(models.ScanJob.id == job_id).update(
+            values,
+            synchronize_session=False
+        )
+        self.db.commit()
+
+    def request_cancel(self, job_id: int) -> None:
+        """Demande l'arrêt d'une tâche.
+
+        Une tâche en attente est annulée immédiatement ; pour une tâche en
+        cours, le worker qui l'exécute voit la demande et l'arrête. Une tâche
+        rattachée à l'exécution d'une autre s'en détache sans l'arrêter ;
+        l'arrêt d'une exécution partagée vaut pour toutes ses tâches.
+        """
+        detached = self.db.query(models.ScanJob).filter(
+            models.ScanJob.id == job_id,
+            models.ScanJob.source_job_id.isnot(None),
+            models.ScanJob.status.in_(("pending", "running"))
+        ).update(
+            {"status": "cancelled", "completed_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        if detached:
+            self.db.commit()
+            return
+        cancelled = self.db.query(models.ScanJob).filter(
+            or_(models.ScanJob.id == job_id, models.ScanJob.source_job_id == job_id),
+            models.ScanJob.status == "pending"
+        ).update(
+            {"status": "cancelled", "completed_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        if not cancelled:
+            self.db.query(models.ScanJob).filter(
+                models.ScanJob.id == job_id,
+                models.ScanJob.status == "running"
+            ).update({"cancel_requested": True}, synchronize_session=False)
+        self.db.commit()
+
+    def cancel_requested(self, job_ids: List[int]) -> List[int]:
+        """Tâches parmi job_ids dont l'arrêt a été demandé"""
+        rows = self.db.query(models.ScanJob.id).filter(
+            models.ScanJob.id.in_(job_ids),
+            models.ScanJob.cancel_requested.is_(True)
+        ).all()
+        self.db.commit()
+        return [row.id for row in rows]
+
+    def fail(self, job_id: int) -> None:
+        """Marque une tâche comme échouée, avec les tâches qui lui sont rattachées"""
+        self.db.rollback()
+        self.db.query(models.ScanJob).filter(
+            or_(models.ScanJob.id == job_id, models.ScanJob.source_job_id == job_id),
+            models.ScanJob.status.in_(("pending", "running"))
+        ).update(
+            {"status": "failed", "completed_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        # Les sections déjà terminées restent consultables
+        self.db.query(models.ScanSection).filter(
+            models.ScanSection.scan_job_id == job_id,
+            models.ScanSection.status == "running"
+        ).update(
+            {"status": "failed", "completed_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        self.db.commit()
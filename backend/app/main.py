@@ -1,24 +1,27 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 import uvicorn
 import logging
 from datetime import timedelta
 
 from . import models, schemas, security
-from .database import SessionLocal, engine, get_db
-from .database import Base
+from .blob_store import iter_report_json, report_results_response
+from .database import async_engine, get_async_db, upgrade_schema
 from .init_admin import init_admin
-from .routers import scan
+from .pagination import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, keyset, page
+from .routers import inventory, scan
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Création des tables au démarrage
-Base.metadata.create_all(bind=engine)
+# Création des tables et des colonnes manquantes au démarrage
+upgrade_schema()
 
 # Initialisation de l'admin
 init_admin()
@@ -34,23 +37,21 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Dépendance pour obtenir la session DB
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 # Inclure les routeurs
 app.include_router(scan.router, prefix="/api/v1", tags=["scan"])
+app.include_router(inventory.router, prefix="/api/v1", tags=["inventory"])
+
+@app.on_event("shutdown")
+async def close_database():
+    security.password_executor.shutdown(wait=False)
+    await async_engine.dispose()
 
 @app.post("/token", response_model=schemas.Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Tentative de connexion pour l'utilisateur: {form_data.username}")
-    user = security.authenticate_user(db, form_data.username, form_data.password)
+    user = await security.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         logger.warning(f"Échec de l'authentification pour l'utilisateur: {form_data.username}")
         raise HTTPException(
@@ -70,28 +71,76 @@ async def root():
     return {"message": "Security Toolbox API is running"}
 
 @app.post("/users/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if db_user:
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(models.User).filter(models.User.username == user.username))
+    if result.scalars().first():
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = security.get_password_hash(user.password)
+    hashed_password = await security.in_password_pool(security.get_password_hash, user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.get("/users/me/", response_model=schemas.User)
 async def read_users_me(current_user: models.User = Depends(security.get_current_active_user)):
     return current_user
 
-@app.get("/users/me/reports/", response_model=List[schemas.Report])
-async def read_user_reports(current_user: models.User = Depends(security.get_current_active_user), db: Session = Depends(get_db)):
-    return db.query(models.Report).filter(models.Report.owner_id == current_user.id).all()
+# Colonnes lues pour les listes de rapports : jamais les résultats
+REPORT_SUMMARY_COLUMNS = (
+    models.Report.id, models.Report.title, models.Report.description, models.Report.scan_type, models.Report.target,
+    models.Report.status, models.Report.summary, models.Report.created_at, models.Report.owner_id
+)
+
+@app.get("/users/me/reports/", response_model=schemas.ReportPage)
+async def read_user_reports(
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Rapports de l'utilisateur, du plus récent au plus ancien, sans leurs résultats"""
+    columns = [models.Report.created_at, models.Report.id]
+    query = select(*REPORT_SUMMARY_COLUMNS).filter(models.Report.owner_id == current_user.id)
+    result = await db.execute(keyset(query, columns, cursor, limit))
+    return page(result.all(), columns, limit)
+
+async def get_owned_report(db: AsyncSession, report_id: int, current_user: models.User) -> models.Report:
+    result = await db.execute(select(models.Report).filter(
+        models.Report.id == report_id,
+        models.Report.owner_id == current_user.id
+    ))
+    report = result.scalars().first()
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report
+
+# Corps transmis par blocs, sans validation : le schéma n'est que documenté
+@app.get(
+    "/users/me/reports/{report_id}",
+    response_class=StreamingResponse,
+    responses={200: {"model": schemas.Report, "content": {"application/json": {}}}}
+)
+async def read_user_report(report_id: int, current_user: models.User = Depends(security.get_current_active_user), db: AsyncSession = Depends(get_async_db)):
+    """Rapport complet ; les résultats sont lus par blocs depuis le stockage de blobs"""
+    report = await get_owned_report(db, report_id, current_user)
+    metadata = schemas.ReportSummary.from_orm(report).json()
+    return StreamingResponse(iter_report_json(report, metadata), media_type="application/json")
+
+@app.get("/users/me/reports/{report_id}/results")
+async def read_user_report_results(
+    report_id: int,
+    accept_encoding: Optional[str] = Header(None),
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Résultats seuls, transmis compressés si le client accepte gzip"""
+    report = await get_owned_report(db, report_id, current_user)
+    return report_results_response(report, accept_encoding)
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
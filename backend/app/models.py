@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, JSON
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, DateTime, Float, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -19,13 +19,18 @@ class User(Base):
 
 class Report(Base):
     __tablename__ = "reports"
+    # Pagination par curseur des rapports d'un utilisateur, du plus récent au plus ancien
+    __table_args__ = (Index("ix_reports_owner_created", "owner_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     description = Column(String, nullable=True)
     scan_type = Column(String)
     target = Column(String)
-    results = Column(JSON)
+    status = Column(String, nullable=True)  # completed, failed, cancelled
+    summary = Column(JSON, nullable=True)  # statut et compteurs par scanner, pour les listes
+    results_ref = Column(String, nullable=True, index=True)  # corps des résultats dans le stockage de blobs
+    results = Column(JSON, nullable=True)  # rapports antérieurs au stockage de blobs
     created_at = Column(DateTime, default=datetime.utcnow)
     owner_id = Column(Integer, ForeignKey("users.id"))
 
@@ -34,16 +39,183 @@ class Report(Base):
 
 class ScanJob(Base):
     __tablename__ = "scan_jobs"
+    # Pagination par curseur des tâches d'un utilisateur (id croissant avec la création)
+    __table_args__ = (Index("ix_scan_jobs_owner_id", "owner_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     scan_type = Column(String)
     target = Column(String)
     parameters = Column(JSON)
-    status = Column(String, default="pending")  # pending, running, completed, failed
+    status = Column(String, default="pending", index=True)  # pending, running, completed, failed, cancelled
+    priority = Column(Integer, default=0)  # les plus hautes sont réclamées d'abord
+    queued_at = Column(DateTime, default=datetime.utcnow)
+    wait_seconds = Column(Float, nullable=True)  # de la mise en file au démarrage du premier scanner
     started_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
+    worker_id = Column(String, nullable=True)  # worker ayant réclamé la tâche
+    heartbeat_at = Column(DateTime, nullable=True)  # dernier signe de vie du worker
+    attempts = Column(Integer, default=0)  # réclamations successives (reprises après arrêt)
+    cancel_requested = Column(Boolean, default=False)  # arrêt demandé, appliqué par le worker
+    progress = Column(Float, default=0.0)  # en pourcentage
+    eta = Column(DateTime, nullable=True)  # fin estimée
+    estimated_duration = Column(Float, nullable=True)  # en secondes, d'après l'historique
+    cache_key = Column(String, nullable=True, index=True)  # empreinte de (cible, type, paramètres)
+    cache_status = Column(String, nullable=True)  # miss, hit, coalesced, bypass
+    source_job_id = Column(Integer, ForeignKey("scan_jobs.id"), nullable=True)  # exécution partagée
     owner_id = Column(Integer, ForeignKey("users.id"))
     report_id = Column(Integer, ForeignKey("reports.id"), nullable=True)
 
     owner = relationship("User", back_populates="scan_jobs")
-    report = relationship("Report", back_populates="scan_jobs") 
\ No newline at end of file
+    report = relationship("Report", back_populates="scan_jobs")
+    sections = relationship("ScanSection", back_populates="scan_job", order_by="ScanSection.id")
+    source_job = relationship("ScanJob", remote_side=[id])
+
+    # Rang dans la file des tâches en attente, renseigné par l'API
+    queue_position = None
+
+    @property
+    def wait_time(self):
+        """Attente en secondes, en cours de décompte tant que la tâche n'a pas démarré"""
+        if self.wait_seconds is not None:
+            return self.wait_seconds
+        if self.status in ("pending", "running") and self.queued_at:
+            return (datetime.utcnow() - self.queued_at).total_seconds()
+        return None
+
+class ScanSection(Base):
+    __tablename__ = "scan_sections"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scan_job_id = Column(Integer, ForeignKey("scan_jobs.id"), index=True)
+    scanner = Column(String)  # NetworkScanner, VulnerabilityScanner, NetworkAnalyzer
+    status = Column(String, default="running")  # running, completed, failed, cancelled
+    results = Column(JSON, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+    scan_job = relationship("ScanJob", back_populates="sections")
+
+class ScanDuration(Base):
+    """Durée moyenne des scans terminés par type et taille de cible"""
+    __tablename__ = "scan_durations"
+    __table_args__ = (UniqueConstraint("scan_type", "port_bucket", "host_bucket"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    scan_type = Column(String)
+    port_bucket = Column(Integer)  # nombre de bits du nombre de ports
+    host_bucket = Column(Integer)  # nombre de bits du nombre d'hôtes
+    samples = Column(Integer, default=0)
+    mean_seconds = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ScanEvent(Base):
+    __tablename__ = "scan_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scan_job_id = Column(Integer, ForeignKey("scan_jobs.id"), index=True)
+    scanner = Column(String, nullable=True)  # None pour les événements de la tâche elle-même
+    type = Column(String)  # status, section, host, counters, alert
+    data = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ScanCheckpoint(Base):
+    """Unité de travail terminée d'un scanner, pour reprendre une tâche interrompue"""
+    __tablename__ = "scan_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scan_job_id = Column(Integer, ForeignKey("scan_jobs.id"), index=True)
+    scanner = Column(String)
+    key = Column(String)  # bloc nmap terminé, ou hôte obtenu d'un bloc en cours
+    data = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ScanCacheEntry(Base):
+    """Résultat réutilisable d'un scan entièrement réussi"""
+    __tablename__ = "scan_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True)
+    scan_job_id = Column(Integer, ForeignKey("scan_jobs.id"))
+    completed_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    hits = Column(Integer, default=0)
+
+    scan_job = relationship("ScanJob")
+
+class ResourceLease(Base):
+    """Ressources réservées par un scanner en cours, visibles de tous les workers"""
+    __tablename__ = "resource_leases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    holder = Column(String)  # worker qui détient la réservation
+    host = Column(String, index=True)  # machine qui exécute les outils
+    needs = Column(JSON)  # quantités accordées : nmap, zap, tshark, cpu, memory
+    locks = Column(JSON)  # verrous exclusifs (interfaces de capture)
+    expires_at = Column(DateTime, index=True)  # repoussée tant que le worker est en vie
+
+class Host(Base):
+    """Hôte de l'inventaire d'un utilisateur, tel que vu par son dernier scan réseau"""
+    __tablename__ = "hosts"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "address"),
+        Index("ix_hosts_owner_last_seen", "owner_id", "last_seen"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    address = Column(String)
+    status = Column(String)  # up, down
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    report_id = Column(Integer, ForeignKey("reports.id"), nullable=True)  # dernier rapport l'ayant sondé
+
+    services = relationship("Service", back_populates="host")
+
+class Service(Base):
+    """Port d'un hôte de l'inventaire et service détecté"""
+    __tablename__ = "services"
+    __table_args__ = (
+        UniqueConstraint("host_id", "protocol", "port"),
+        Index("ix_services_owner_port", "owner_id", "port", "id"),
+        Index("ix_services_owner_name", "owner_id", "name", "id"),
+        Index("ix_services_owner_product", "owner_id", "product", "version_major", "version_minor"),
+        Index("ix_services_owner_last_seen", "owner_id", "last_seen"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))  # dénormalisé pour filtrer sans jointure
+    host_id = Column(Integer, ForeignKey("hosts.id"))
+    protocol = Column(String)
+    port = Column(Integer)
+    state = Column(String)  # open, filtered, closed
+    name = Column(String, nullable=True)
+    product = Column(String, nullable=True)
+    version = Column(String, nullable=True)
+    version_major = Column(Integer, nullable=True)  # extraits de version, pour les comparaisons
+    version_minor = Column(Integer, nullable=True)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    report_id = Column(Integer, ForeignKey("reports.id"), nullable=True)
+
+    host = relationship("Host", back_populates="services")
+
+class Finding(Base):
+    """Alerte ZAP de l'inventaire, par cible, plugin et niveau de risque"""
+    __tablename__ = "findings"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "target", "plugin_id", "risk"),
+        Index("ix_findings_owner_risk", "owner_id", "risk", "id"),
+        Index("ix_findings_owner_last_seen", "owner_id", "last_seen"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    target = Column(String)
+    plugin_id = Column(String)
+    name = Column(String, nullable=True)
+    risk = Column(String)  # high, medium, low, informational
+    count = Column(Integer, default=0)  # occurrences lors du dernier scan
+    url = Column(String, nullable=True)  # première URL concernée
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    report_id = Column(Integer, ForeignKey("reports.id"), nullable=True)
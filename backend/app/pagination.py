@@ -0,0 +1,53 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import literal, tuple_
+from sqlalchemy.sql import Select
+
+# Taille par défaut et maximale d'une page de liste
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 200
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Curseur opaque : valeurs de tri de la dernière ligne d'une page"""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(values) != len(columns):
+            raise ValueError(cursor)
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            decoded.append(python_type.fromisoformat(value) if python_type is datetime else python_type(value))
+        return decoded
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset(query: Select, columns: Sequence[Any], cursor: Optional[str], limit: int) -> Select:
+    """Page d'une requête triée par columns décroissantes, après le curseur.
+
+    La dernière colonne doit être unique (clé primaire) ; l'index composite
+    (filtre, columns...) permet de lire la page sans parcourir les pages
+    précédentes. Une ligne de plus est lue pour savoir s'il reste une page.
+    """
+    if cursor:
+        values = [literal(value, column.type) for column, value in zip(columns, decode_cursor(cursor, columns))]
+        if len(columns) == 1:
+            query = query.filter(columns[0] < values[0])
+        else:
+            query = query.filter(tuple_(*columns) < tuple_(*values))
+    return query.order_by(*[column.desc() for column in columns]).limit(limit + 1)
+
+def page(rows: Sequence[Any], columns: Sequence[Any], limit: int) -> Dict[str, Any]:
+    """Lignes de la page et curseur de la suivante (None sur la dernière page)"""
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns])
+    return {"items": items, "next_cursor": next_cursor}
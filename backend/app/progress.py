@@ -0,0 +1,126 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .scanners.port_prescan import count_hosts, parse_ports
+from .scanners.scanner_manager import ScannerManager
+
+logger = logging.getLogger(__name__)
+
+# Ports scannés par NetworkScanner sans paramètre "ports"
+DEFAULT_PORTS = "1-1000"
+# Nombre de scans sur lequel porte la moyenne glissante des durées
+HISTORY_WINDOW = 20
+# En dessous de cet avancement, l'ETA s'appuie surtout sur l'historique
+EXTRAPOLATION_THRESHOLD = 0.1
+
+def scan_dimensions(scan_type: str, target: str, parameters: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+    """Nombre de ports et d'hôtes d'un scan (0 port si aucun scanner réseau)"""
+    ports = 0
+    if any(scanner == "network" for scanner, _ in ScannerManager.SCAN_PROFILES.get(scan_type, [])):
+        try:
+            ports = len(parse_ports(str((parameters or {}).get("ports", DEFAULT_PORTS))))
+        except ValueError:
+            ports = 0
+    return ports, count_hosts(target)
+
+def duration_key(scan_type: str, target: str, parameters: Optional[Dict[str, Any]]) -> Tuple[str, int, int]:
+    """Clé de l'historique : type de scan et ordre de grandeur des ports et des hôtes"""
+    ports, hosts = scan_dimensions(scan_type, target, parameters)
+    if (parameters or {}).get("incremental"):
+        # Un scan différentiel ne coûte pas le prix d'un scan complet
+        scan_type = f"{scan_type}:incremental"
+    return scan_type, ports.bit_length(), hosts.bit_length()
+
+def find_duration(db: Session, key: Tuple[str, int, int]) -> Optional[models.ScanDuration]:
+    scan_type, port_bucket, host_bucket = key
+    return db.query(models.ScanDuration).filter(
+        models.ScanDuration.scan_type == scan_type,
+        models.ScanDuration.port_bucket == port_bucket,
+        models.ScanDuration.host_bucket == host_bucket
+    ).first()
+
+def predict_duration(db: Session, scan_type: str, target: str, parameters: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Durée attendue d'après les scans comparables déjà terminés"""
+    history = find_duration(db, duration_key(scan_type, target, parameters))
+    return history.mean_seconds if history else None
+
+def record_duration(db: Session, scan_type: str, target: str, parameters: Optional[Dict[str, Any]],
+                    seconds: float) -> None:
+    """Ajoute la durée d'un scan terminé à l'historique"""
+    key = duration_key(scan_type, target, parameters)
+    try:
+        add_sample(db, key, seconds)
+    except IntegrityError:
+        # Deux scans comparables terminés en même temps : la ligne existe désormais
+        db.rollback()
+        add_sample(db, key, seconds)
+
+def add_sample(db: Session, key: Tuple[str, int, int], seconds: float) -> None:
+    history = find_duration(db, key)
+    if history is None:
+        scan_type, port_bucket, host_bucket = key
+        history = models.ScanDuration(
+            scan_type=scan_type, port_bucket=port_bucket, host_bucket=host_bucket,
+            samples=0, mean_seconds=seconds
+        )
+        db.add(history)
+    history.samples += 1
+    history.mean_seconds += (seconds - history.mean_seconds) / min(history.samples, HISTORY_WINDOW)
+    history.updated_at = datetime.utcnow()
+    db.commit()
+
+class JobProgress:
+    """Avancement global d'une tâche et fin estimée.
+
+    L'avancement est la moyenne de celui des scanners. Au début du scan,
+    l'ETA vient de la durée prévue par l'historique ; elle bascule ensuite
+    vers l'extrapolation de l'avancement mesuré. on_update n'est appelé
+    qu'une fois toutes les min_interval secondes.
+    """
+
+    def __init__(self, scanners: List[str], predicted: Optional[float],
+                 on_update: Callable[[float, Optional[datetime]], None], min_interval: float = 5.0):
+        self.scanners = {scanner: 0.0 for scanner in scanners}
+        self.predicted = predicted
+        self.on_update = on_update
+        self.min_interval = min_interval
+        self.started = time.monotonic()
+        self.last_update = 0.0
+
+    @property
+    def percent(self) -> float:
+        return sum(self.scanners.values()) / len(self.scanners) if self.scanners else 0.0
+
+    def remaining(self) -> Optional[float]:
+        """Secondes restantes estimées, None sans aucune information"""
+        elapsed = time.monotonic() - self.started
+        fraction = self.percent / 100
+        extrapolated = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+        if self.predicted is None:
+            return extrapolated
+        predicted = max(self.predicted - elapsed, 0.0)
+        if extrapolated is None:
+            return predicted
+        weight = min(fraction / EXTRAPOLATION_THRESHOLD, 1.0)
+        return (1 - weight) * predicted + weight * extrapolated
+
+    def update(self, scanner: str, percent: float) -> None:
+        if scanner not in self.scanners:
+            return
+        self.scanners[scanner] = max(self.scanners[scanner], percent)
+        now = time.monotonic()
+        if now - self.last_update < self.min_interval:
+            return
+        self.last_update = now
+        remaining = self.remaining()
+        eta = datetime.utcnow() + timedelta(seconds=remaining) if remaining is not None else None
+        try:
+            self.on_update(round(self.percent, 1), eta)
+        except Exception as e:
+            logger.error(f"Mise à jour de l'avancement impossible: {str(e)}")
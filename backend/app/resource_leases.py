@@ -0,0 +1,123 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import AsyncSessionLocal
+
+# Validité d'une réservation non renouvelée : libère celles d'un worker arrêté brutalement (secondes)
+SCAN_LEASE_TTL = float(os.getenv("SCAN_LEASE_TTL", "120"))
+# Délai entre deux tentatives d'une réservation refusée (secondes)
+SCAN_LEASE_POLL_INTERVAL = float(os.getenv("SCAN_LEASE_POLL_INTERVAL", "1"))
+# Machine qui exécute les outils : cœurs, mémoire et interfaces lui sont propres
+SCAN_RESOURCE_HOST = os.getenv("SCAN_RESOURCE_HOST", socket.gethostname())
+
+# Budgets de la machine ; les emplacements d'outils sont comptés sur tous les workers
+HOST_RESOURCES = {"cpu", "memory"}
+
+# Verrou consultatif PostgreSQL qui sérialise les réservations
+LEASE_LOCK_KEY = 0x7465650001
+
+class ResourceLeases:
+    """Réservations de ressources de tous les workers (table resource_leases).
+
+    Les emplacements nmap, zap et tshark sont comptés sur l'ensemble des
+    workers ; le budget CPU et mémoire et les verrous d'interface, sur ceux
+    de la même machine. Une réservation non renouvelée expire.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def lock(self) -> None:
+        """Sérialise les réservations jusqu'à la fin de la transaction"""
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LEASE_LOCK_KEY})
+
+    def acquire(self, holder: str, host: str, needs: Dict[str, float], locks: List[str],
+                capacity: Dict[str, float], ttl: float = SCAN_LEASE_TTL) -> Optional[int]:
+        """Enregistre la réservation si les ressources sont libres, sinon None"""
+        now = datetime.utcnow()
+        self.lock()
+        # Sous SQLite, cette écriture ouvre aussi la transaction exclusive
+        self.db.query(models.ResourceLease).filter(
+            models.ResourceLease.expires_at < now
+        ).delete(synchronize_session=False)
+
+        used = {resource: 0.0 for resource in capacity}
+        held_locks = set()
+        for lease in self.db.query(models.ResourceLease):
+            same_host = lease.host == host
+            for resource, amount in (lease.needs or {}).items():
+                if resource in used and (same_host or resource not in HOST_RESOURCES):
+                    used[resource] += amount
+            if same_host:
+                held_locks.update(lease.locks or [])
+
+        if held_locks.intersection(locks) or any(
+            used[resource] + amount > capacity[resource] + 1e-9 for resource, amount in needs.items()
+        ):
+            self.db.commit()
+            return None
+        lease = models.ResourceLease(holder=holder, host=host, needs=needs, locks=list(locks),
+                                     expires_at=now + timedelta(seconds=ttl))
+        self.db.add(lease)
+        self.db.commit()
+        return lease.id
+
+    def renew(self, lease_ids: List[int], ttl: float = SCAN_LEASE_TTL) -> None:
+        self.db.query(models.ResourceLease).filter(models.ResourceLease.id.in_(lease_ids)).update(
+            {"expires_at": datetime.utcnow() + timedelta(seconds=ttl)}, synchronize_session=False
+        )
+        self.db.commit()
+
+    def release(self, lease_id: int) -> None:
+        self.db.query(models.ResourceLease).filter(
+            models.ResourceLease.id == lease_id
+        ).delete(synchronize_session=False)
+        self.db.commit()
+
+class SharedResources:
+    """Réservations communes vues d'un worker : attente, renouvellement et libération"""
+
+    def __init__(self, holder: str, capacity: Dict[str, float], host: str = SCAN_RESOURCE_HOST,
+                 ttl: float = SCAN_LEASE_TTL, poll_interval: float = SCAN_LEASE_POLL_INTERVAL):
+        self.holder = holder
+        self.capacity = capacity
+        self.host = host
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.held = set()
+
+    @staticmethod
+    async def call(function, *args):
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(lambda session: function(ResourceLeases(session), *args))
+
+    async def try_acquire(self, needs: Dict[str, float], locks: Iterable[str]) -> Optional[int]:
+        lease_id = await self.call(ResourceLeases.acquire, self.holder, self.host, needs, list(locks),
+                                   self.capacity, self.ttl)
+        if lease_id is not None:
+            self.held.add(lease_id)
+        return lease_id
+
+    async def acquire(self, needs: Dict[str, float], locks: Iterable[str]) -> int:
+        """Attend que les autres workers libèrent de quoi servir la réservation"""
+        while True:
+            lease_id = await self.try_acquire(needs, locks)
+            if lease_id is not None:
+                return lease_id
+            await asyncio.sleep(self.poll_interval)
+
+    async def renew(self) -> None:
+        if self.held:
+            await self.call(ResourceLeases.renew, list(self.held), self.ttl)
+
+    async def release(self, lease_id: int) -> None:
+        self.held.discard(lease_id)
+        await self.call(ResourceLeases.release, lease_id)
@@ -0,0 +1,146 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime
+
+from .. import models, schemas, security
+from ..database import get_async_db
+from ..inventory import parse_version
+from ..pagination import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, keyset, page
+
+router = APIRouter()
+
+def version_condition(version: str, below: bool):
+    """Comparaison sur (version_major, version_minor) : "8" ou "8.2" """
+    major, minor = parse_version(version)
+    if major is None:
+        raise HTTPException(status_code=400, detail=f"Invalid version: {version}")
+    service_minor = func.coalesce(models.Service.version_minor, 0)
+    if below:
+        if minor is None:
+            return models.Service.version_major < major
+        return or_(models.Service.version_major < major,
+                   and_(models.Service.version_major == major, service_minor < minor))
+    if minor is None:
+        return models.Service.version_major >= major
+    return or_(models.Service.version_major > major,
+               and_(models.Service.version_major == major, service_minor >= minor))
+
+def service_filters(owner_id: int, port: Optional[int], protocol: Optional[str], state: Optional[str],
+                    service: Optional[str], product: Optional[str], version_below: Optional[str],
+                    version_at_least: Optional[str], seen_since: Optional[datetime]) -> list:
+    filters = [models.Service.owner_id == owner_id]
+    if port is not None:
+        filters.append(models.Service.port == port)
+    if protocol:
+        filters.append(models.Service.protocol == protocol)
+    if state:
+        filters.append(models.Service.state == state)
+    if service:
+        filters.append(models.Service.name == service)
+    if product:
+        filters.append(models.Service.product == product)
+    if version_below:
+        filters.append(version_condition(version_below, below=True))
+    if version_at_least:
+        filters.append(version_condition(version_at_least, below=False))
+    if seen_since:
+        filters.append(models.Service.last_seen >= seen_since)
+    return filters
+
+@router.get("/inventory/services", response_model=schemas.InventoryServicePage)
+async def list_services(
+    port: Optional[int] = None,
+    protocol: Optional[str] = None,
+    state: Optional[str] = "open",
+    service: Optional[str] = None,
+    product: Optional[str] = None,
+    version_below: Optional[str] = None,
+    version_at_least: Optional[str] = None,
+    seen_since: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Services de l'inventaire, ex. product=OpenSSH&version_below=8 ou port=3389"""
+    columns = [models.Service.id]
+    query = select(
+        models.Service.id, models.Host.address, models.Service.protocol, models.Service.port,
+        models.Service.state, models.Service.name, models.Service.product, models.Service.version,
+        models.Service.first_seen, models.Service.last_seen, models.Service.report_id
+    ).join(models.Host, models.Host.id == models.Service.host_id).filter(*service_filters(
+        current_user.id, port, protocol, state, service, product, version_below, version_at_least, seen_since
+    ))
+    result = await db.execute(keyset(query, columns, cursor, limit))
+    return page(result.all(), columns, limit)
+
+@router.get("/inventory/hosts", response_model=schemas.InventoryHostPage)
+async def list_hosts(
+    port: Optional[int] = None,
+    service: Optional[str] = None,
+    product: Optional[str] = None,
+    version_below: Optional[str] = None,
+    version_at_least: Optional[str] = None,
+    status: Optional[str] = None,
+    seen_since: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Hôtes de l'inventaire, filtrés par leurs ports ouverts (ex. port=3389)"""
+    columns = [models.Host.id]
+    query = select(models.Host).filter(models.Host.owner_id == current_user.id)
+    if status:
+        query = query.filter(models.Host.status == status)
+    if seen_since:
+        query = query.filter(models.Host.last_seen >= seen_since)
+    if any(value is not None for value in (port, service, product, version_below, version_at_least)):
+        query = query.filter(models.Host.id.in_(select(models.Service.host_id).filter(*service_filters(
+            current_user.id, port, None, "open", service, product, version_below, version_at_least, None
+        ))))
+    result = await db.execute(keyset(query, columns, cursor, limit))
+    host_page = page(result.scalars().all(), columns, limit)
+
+    # Ports ouverts des seuls hôtes de la page
+    open_ports = {}
+    if host_page["items"]:
+        ports = await db.execute(select(models.Service.host_id, models.Service.port).filter(
+            models.Service.host_id.in_([host.id for host in host_page["items"]]),
+            models.Service.state == "open"
+        ).order_by(models.Service.port))
+        for host_id, number in ports:
+            open_ports.setdefault(host_id, []).append(number)
+    host_page["items"] = [
+        schemas.InventoryHost(**schemas.InventoryHost.from_orm(host).dict(exclude={"open_ports"}),
+                              open_ports=open_ports.get(host.id, []))
+        for host in host_page["items"]
+    ]
+    return host_page
+
+@router.get("/inventory/findings", response_model=schemas.InventoryFindingPage)
+async def list_findings(
+    risk: Optional[str] = None,
+    plugin_id: Optional[str] = None,
+    target: Optional[str] = None,
+    seen_since: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Alertes de l'inventaire, ex. risk=high"""
+    columns = [models.Finding.id]
+    query = select(models.Finding).filter(models.Finding.owner_id == current_user.id)
+    if risk:
+        query = query.filter(models.Finding.risk == risk)
+    if plugin_id:
+        query = query.filter(models.Finding.plugin_id == plugin_id)
+    if target:
+        query = query.filter(models.Finding.target == target)
+    if seen_since:
+        query = query.filter(models.Finding.last_seen >= seen_since)
+    result = await db.execute(keyset(query, columns, cursor, limit))
+    return page(result.scalars().all(), columns, limit)
@@ -1,151 +1,282 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import Dict, Any, List
-import json
-from datetime import datetime
-import os
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+from typing import List, Optional
+import asyncio
 
 from .. import models, schemas, security
-from ..database import get_db
+from ..blob_store import report_results_response
+from ..database import AsyncSessionLocal, get_async_db
+from ..events import TERMINAL_STATUSES, format_sse, get_event_broker, is_final
+from ..inventory import index_job
+from ..job_queue import ScanJobQueue, parse_job_timeout
+from ..pagination import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, keyset, page
+from ..progress import predict_duration
+from ..scan_cache import SCAN_CACHE_MAX_ENTRIES, SCAN_CACHE_TTL, ScanCache, cache_key, get_cache_stats
 from ..scanners.scanner_manager import ScannerManager
 
 router = APIRouter()
 
-# Stockage temporaire des résultats de scan
-active_scans = {}
+# Priorités acceptées ; seuls les administrateurs peuvent dépasser 0
+SCAN_MAX_PRIORITY = 10
+
+def with_queue_positions(db: Session, scan_jobs: List[models.ScanJob]) -> List[models.ScanJob]:
+    """Renseigne le rang dans la file des tâches encore en attente"""
+    if any(scan_job.status == "pending" for scan_job in scan_jobs):
+        positions = ScanJobQueue(db).queue_positions()
+        for scan_job in scan_jobs:
+            scan_job.queue_position = positions.get(scan_job.source_job_id or scan_job.id)
+    return scan_jobs
+
+async def get_owned_scan(db: AsyncSession, scan_id: int, current_user: models.User) -> models.ScanJob:
+    """Tâche de scan de l'utilisateur, HTTPException 404 sinon"""
+    result = await db.execute(select(models.ScanJob).filter(
+        models.ScanJob.id == scan_id,
+        models.ScanJob.owner_id == current_user.id
+    ))
+    scan_job = result.scalars().first()
+    if not scan_job:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return scan_job
+
+def submit_scan(db: Session, scan_request: schemas.ScanJobCreate, current_user: models.User) -> models.ScanJob:
+    """Place la demande en file, ou la sert par une exécution identique récente ou en cours"""
+    # Le scan est exécuté par un processus worker (voir app/worker.py)
+    key = cache_key(scan_request.scan_type, scan_request.target, scan_request.parameters, current_user.id)
+    scan_job = models.ScanJob(
+        scan_type=scan_request.scan_type,
+        target=scan_request.target,
+        parameters=scan_request.parameters,
+        owner_id=current_user.id,
+        priority=scan_request.priority,
+        cache_key=key,
+        # Durée prévue avant tout démarrage, d'après les scans comparables
+        estimated_duration=predict_duration(
+            db, scan_request.scan_type, scan_request.target, scan_request.parameters
+        )
+    )
+    queue = ScanJobQueue(db)
+    cache = ScanCache(db)
+    stats = get_cache_stats()
+
+    if scan_request.force:
+        stats.bypassed += 1
+        scan_job.cache_status = "bypass"
+    else:
+        # Même scan réussi récemment : réutiliser son résultat
+        entry = cache.fresh(key, scan_request.max_age)
+        if entry is not None and entry.scan_job.report is not None:
+            stats.hits += 1
+            cache.touch(entry)
+            return queue.reuse(scan_job, entry.scan_job)
+        # Même scan en file ou en cours : attendre son résultat
+        leader = cache.in_flight(key)
+        if leader is not None:
+            stats.coalesced += 1
+            return with_queue_positions(db, [queue.attach(scan_job, leader)])[0]
+        stats.misses += 1
+        scan_job.cache_status = "miss"
+
+    scan_job = queue.enqueue(scan_job)
+    return with_queue_positions(db, [scan_job])[0]
 
 @router.post("/scan/", response_model=schemas.ScanJob)
 async def create_scan(
     scan_request: schemas.ScanJobCreate,
     background_tasks: BackgroundTasks,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Crée une nouvelle tâche de scan"""
+    """Crée une nouvelle tâche de scan et la place dans la file des workers"""
+    if scan_request.scan_type not in ScannerManager.SCAN_PROFILES:
+        raise HTTPException(status_code=400, detail="Invalid scan type")
+    if abs(scan_request.priority) > SCAN_MAX_PRIORITY:
+        raise HTTPException(status_code=400, detail=f"Priority must be between -{SCAN_MAX_PRIORITY} and {SCAN_MAX_PRIORITY}")
+    if scan_request.priority > 0 and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only administrators can raise scan priority")
     try:
-        # Créer la tâche de scan dans la base de données
-        scan_job = models.ScanJob(
-            scan_type=scan_request.scan_type,
-            target=scan_request.target,
-            parameters=scan_request.parameters,
-            status="pending",
-            owner_id=current_user.id
-        )
-        db.add(scan_job)
-        db.commit()
-        db.refresh(scan_job)
-
-        # Créer le gestionnaire de scan
-        manager = ScannerManager(scan_request.target, scan_request.parameters)
-        
-        # Ajouter les scanners selon le type de scan
-        if scan_request.scan_type == "full":
-            manager.add_scanner("network", {"scan_type": "full"})
-            manager.add_scanner("vulnerability", {"scan_type": "full"})
-            manager.add_scanner("network_analysis", {"duration": 300})
-        elif scan_request.scan_type == "network":
-            manager.add_scanner("network", {"scan_type": "full"})
-        elif scan_request.scan_type == "vulnerability":
-            manager.add_scanner("vulnerability", {"scan_type": "full"})
-        elif scan_request.scan_type == "network_analysis":
-            manager.add_scanner("network_analysis", {"duration": 300})
-        else:
-            raise HTTPException(status_code=400, detail="Invalid scan type")
-
-        # Stocker le gestionnaire pour référence future
-        active_scans[scan_job.id] = manager
-
-        # Lancer le scan en arrière-plan
-        background_tasks.add_task(run_scan, scan_job.id, manager, db)
-
-        return scan_job
+        parse_job_timeout(scan_request.parameters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    try:
+        scan_job = await db.run_sync(submit_scan, scan_request, current_user)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if scan_job.cache_status == "hit":
+        # Résultat d'un scan identique : inventaire du demandeur alimenté après
+        # la réponse (FastAPI exécute la fonction synchrone dans son pool de threads)
+        background_tasks.add_task(index_job, scan_job.id)
+    return scan_job
 
 @router.get("/scan/{scan_id}", response_model=schemas.ScanJob)
 async def get_scan(
     scan_id: int,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Récupère les informations d'une tâche de scan"""
-    scan_job = db.query(models.ScanJob).filter(
-        models.ScanJob.id == scan_id,
-        models.ScanJob.owner_id == current_user.id
-    ).first()
-    
-    if not scan_job:
-        raise HTTPException(status_code=404, detail="Scan not found")
-    
-    return scan_job
+    scan_job = await get_owned_scan(db, scan_id, current_user)
+    return (await db.run_sync(with_queue_positions, [scan_job]))[0]
+
+@router.post("/scan/{scan_id}/stop", response_model=schemas.ScanJob)
+async def stop_scan(
+    scan_id: int,
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Arrête une tâche de scan ; les résultats déjà obtenus sont conservés"""
+    scan_job = await get_owned_scan(db, scan_id, current_user)
+
+    if scan_job.status in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail="Scan already finished")
+
+    await db.run_sync(lambda session: ScanJobQueue(session).request_cancel(scan_id))
+    await db.refresh(scan_job)
+    return (await db.run_sync(with_queue_positions, [scan_job]))[0]
+
+def scan_sections(db: Session, scan_job: models.ScanJob) -> List[models.ScanSection]:
+    # Une tâche servie par une exécution partagée lit les sections de celle-ci
+    return (scan_job.source_job or scan_job).sections
 
 @router.get("/scan/{scan_id}/results")
 async def get_scan_results(
     scan_id: int,
+    accept_encoding: Optional[str] = Header(None),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Récupère les résultats d'une tâche de scan"""
-    scan_job = db.query(models.ScanJob).filter(
-        models.ScanJob.id == scan_id,
-        models.ScanJob.owner_id == current_user.id
-    ).first()
-    
-    if not scan_job:
-        raise HTTPException(status_code=404, detail="Scan not found")
+    scan_job = await get_owned_scan(db, scan_id, current_user)
     
+    # Sections déjà terminées, avec le statut de celles encore en cours
+    sections = await db.run_sync(scan_sections, scan_job)
+    if sections:
+        return {
+            "scan_id": scan_job.id,
+            "status": scan_job.status,
+            "sections": [schemas.ScanSection.from_orm(section) for section in sections]
+        }
+
     if scan_job.status != "completed":
         return {"status": scan_job.status}
     
-    # Récupérer les résultats du scan
-    if scan_job.id in active_scans:
-        return active_scans[scan_job.id].results
-    else:
+    # Tâches antérieures aux sections : rapport complet
+    report = await db.run_sync(lambda session: scan_job.report)
+    if report is None:
         raise HTTPException(status_code=404, detail="Scan results not found")
+    return report_results_response(report, accept_encoding)
+
+# Commentaire SSE envoyé en l'absence d'événement pour garder la connexion ouverte
+SSE_KEEPALIVE_INTERVAL = 15  # en secondes
+
+@router.get("/scan/{scan_id}/events")
+async def stream_scan_events(
+    scan_id: int,
+    request: Request,
+    token: Optional[str] = None,
+    authorization: Optional[str] = Header(None),
+    last_event_id: Optional[int] = Header(None)
+):
+    """Flux Server-Sent Events d'une tâche de scan.
+
+    EventSource ne permet pas d'en-tête Authorization : le JWT peut être
+    passé dans le paramètre token. Le premier événement (snapshot) donne le
+    statut et les sections de la tâche, les suivants arrivent en direct.
+    """
+    if not token and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    broker = get_event_broker()
+    # Session courte : la connexion SSE ne garde pas de connexion à la base
+    async with AsyncSessionLocal() as db:
+        current_user = await security.resolve_user(db, token)
+        if not current_user.is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
+        scan_job = await get_owned_scan(db, scan_id, current_user)
 
-@router.get("/scans/", response_model=List[schemas.ScanJob])
+        # Les événements d'une tâche rattachée sont ceux de l'exécution partagée
+        subscription = await broker.subscribe(scan_job.source_job_id or scan_job.id)
+        sections = await db.run_sync(scan_sections, scan_job)
+        snapshot = {
+            "scan_id": scan_job.id,
+            "status": scan_job.status,
+            "sections": [{"scanner": section.scanner, "status": section.status} for section in sections]
+        }
+
+    # Reconnexion : rejouer ce que le client a manqué
+    missed = await broker.fetch([subscription.scan_id], last_event_id) if last_event_id is not None else []
+
+    async def event_stream():
+        try:
+            yield format_sse("snapshot", snapshot)
+            for event in missed:
+                yield format_sse(event["type"], event, event["id"])
+            if snapshot["status"] in TERMINAL_STATUSES or any(is_final(event) for event in missed):
+                return
+
+            while not await request.is_disconnected():
+                try:
+                    batch = await asyncio.wait_for(subscription.queue.get(), timeout=SSE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if subscription.dropped:
+                    # Client trop lent : il sait qu'il doit relire /results
+                    yield format_sse("lagged", {"dropped": subscription.dropped})
+                    subscription.dropped = 0
+                yield "".join(format_sse(event["type"], event, event["id"]) for event in batch)
+                if any(is_final(event) for event in batch):
+                    return
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Colonnes lues pour les listes : ni paramètres ni sections
+SCAN_SUMMARY_COLUMNS = (
+    "scan_type", "target", "status", "progress", "priority", "queued_at", "wait_seconds",
+    "started_at", "completed_at", "eta", "cache_status", "source_job_id", "report_id"
+)
+
+@router.get("/scans/", response_model=schemas.ScanJobPage)
 async def list_scans(
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Liste toutes les tâches de scan de l'utilisateur"""
-    return db.query(models.ScanJob).filter(
-        models.ScanJob.owner_id == current_user.id
-    ).all()
+    """Tâches de scan de l'utilisateur, des plus récentes aux plus anciennes.
 
-async def run_scan(scan_id: int, manager: ScannerManager, db: Session):
-    """Exécute un scan en arrière-plan"""
-    try:
-        # Mettre à jour le statut
-        scan_job = db.query(models.ScanJob).filter(models.ScanJob.id == scan_id).first()
-        scan_job.status = "running"
-        db.commit()
-
-        # Exécuter le scan
-        results = await manager.run_all()
-
-        # Créer un rapport
-        report = models.Report(
-            title=f"Scan Report - {scan_job.target}",
-            description=f"Scan type: {scan_job.scan_type}",
-            scan_type=scan_job.scan_type,
-            target=scan_job.target,
-            results=results,
-            owner_id=scan_job.owner_id
-        )
-        db.add(report)
-        db.commit()
-
-        # Mettre à jour la tâche de scan
-        scan_job.status = "completed"
-        scan_job.completed_at = datetime.utcnow()
-        scan_job.report_id = report.id
-        db.commit()
+    Le curseur next_cursor d'une page donne la suivante ; le détail d'une
+    tâche est servi par /scan/{scan_id}.
+    """
+    columns = [models.ScanJob.id]
+    query = select(models.ScanJob).options(load_only(*SCAN_SUMMARY_COLUMNS)).filter(
+        models.ScanJob.owner_id == current_user.id
+    )
+    result = await db.execute(keyset(query, columns, cursor, limit))
+    scan_page = page(result.scalars().all(), columns, limit)
+    scan_page["items"] = await db.run_sync(with_queue_positions, scan_page["items"])
+    return scan_page
 
-    except Exception as e:
-        # En cas d'erreur, mettre à jour le statut
-        scan_job = db.query(models.ScanJob).filter(models.ScanJob.id == scan_id).first()
-        scan_job.status = "failed"
-        db.commit()
-        print(f"Scan error: {str(e)}") 
\ No newline at end of file
+@router.get("/scans/cache")
+async def get_scan_cache_stats(
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Compteurs du cache des scans (depuis le démarrage de l'API) et taille actuelle"""
+    return {
+        **get_cache_stats().to_dict(),
+        "entries": await db.run_sync(lambda session: ScanCache(session).entries()),
+        "max_entries": SCAN_CACHE_MAX_ENTRIES,
+        "ttl": SCAN_CACHE_TTL
+    }
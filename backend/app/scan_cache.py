@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Durée pendant laquelle un résultat est réutilisé (secondes)
+SCAN_CACHE_TTL = float(os.getenv("SCAN_CACHE_TTL", "900"))
+# Nombre maximal de résultats gardés ; les moins récemment utilisés sont évincés
+SCAN_CACHE_MAX_ENTRIES = int(os.getenv("SCAN_CACHE_MAX_ENTRIES", "500"))
+
+# Paramètres sans effet sur le résultat d'un scan (délais, cadence du suivi)
+NON_RESULT_PARAMETERS = {"timeout", "job_timeout", "poll_interval", "stats_every", "counters_interval"}
+
+def normalize_target(target: str) -> str:
+    target = target.strip().lower()
+    return target.rstrip("/") if "://" in target else target
+
+def cache_key(scan_type: str, target: str, parameters: Optional[Dict[str, Any]],
+              owner_id: Optional[int] = None) -> str:
+    """Empreinte de (cible, type de scan, paramètres) indépendante de l'ordre des clés.
+
+    Un scan incrémental dépend de l'historique de son demandeur (référence
+    de baseline.load_baseline) : son empreinte inclut owner_id.
+    """
+    relevant = {key: value for key, value in (parameters or {}).items() if key not in NON_RESULT_PARAMETERS}
+    document = [scan_type, normalize_target(target), relevant]
+    if relevant.get("incremental"):
+        document.append(owner_id)
+    return hashlib.sha256(json.dumps(document, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+class CacheStats:
+    """Compteurs du cache depuis le démarrage du processus"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else None
+        }
+
+_stats = CacheStats()
+
+def get_cache_stats() -> CacheStats:
+    return _stats
+
+class ScanCache:
+    """Réutilisation des scans identiques, adossée aux tables scan_jobs et scan_cache.
+
+    Une demande identique à un scan encore en file ou en cours s'y rattache
+    (une seule exécution pour tous) ; une demande identique à un scan réussi
+    depuis moins de ttl secondes reprend son résultat. Les entrées sont
+    évincées par âge et, au-delà de max_entries, par dernière utilisation.
+    """
+
+    def __init__(self, db: Session, ttl: float = SCAN_CACHE_TTL, max_entries: int = SCAN_CACHE_MAX_ENTRIES):
+        self.db = db
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def in_flight(self, key: str) -> Optional[models.ScanJob]:
+        """Exécution en file ou en cours pour cette clé"""
+        return self.db.query(models.ScanJob).filter(
+            models.ScanJob.cache_key == key,
+            models.ScanJob.source_job_id.is_(None),
+            models.ScanJob.status.in_(("pending", "running")),
+            models.ScanJob.cancel_requested.isnot(True)
+        ).order_by(models.ScanJob.id.desc()).first()
+
+    def fresh(self, key: str, max_age: Optional[float] = None) -> Optional[models.ScanCacheEntry]:
+        """Entrée de moins de max_age secondes (ttl au plus) pour cette clé"""
+        age = min(max_age, self.ttl) if max_age is not None else self.ttl
+        return self.db.query(models.ScanCacheEntry).filter(
+            models.ScanCacheEntry.cache_key == key,
+            models.ScanCacheEntry.completed_at >= datetime.utcnow() - timedelta(seconds=age)
+        ).first()
+
+    def touch(self, entry: models.ScanCacheEntry) -> None:
+        entry.hits += 1
+        entry.last_used_at = datetime.utcnow()
+
+    def store(self, key: str, job_id: int) -> None:
+        """Enregistre le résultat d'un scan réussi et applique l'éviction"""
+        try:
+            self.save(key, job_id)
+        except IntegrityError:
+            # Deux scans identiques (force) terminés en même temps : mettre à jour l'entrée créée
+            self.db.rollback()
+            self.save(key, job_id)
+        self.evict()
+
+    def save(self, key: str, job_id: int) -> None:
+        now = datetime.utcnow()
+        entry = self.db.query(models.ScanCacheEntry).filter(models.ScanCacheEntry.cache_key == key).first()
+        if entry is None:
+            entry = models.ScanCacheEntry(cache_key=key, hits=0)
+            self.db.add(entry)
+        entry.scan_job_id = job_id
+        entry.completed_at = now
+        entry.last_used_at = now
+        self.db.commit()
+
+    def evict(self) -> int:
+        expired = self.db.query(models.ScanCacheEntry).filter(
+            models.ScanCacheEntry.completed_at < datetime.utcnow() - timedelta(seconds=self.ttl)
+        ).delete(synchronize_session=False)
+        overflow = [
+            row.id for row in self.db.query(models.ScanCacheEntry.id)
+            .order_by(models.ScanCacheEntry.last_used_at.desc())
+            .offset(self.max_entries)
+        ]
+        if overflow:
+            self.db.query(models.ScanCacheEntry).filter(
+                models.ScanCacheEntry.id.in_(overflow)
+            ).delete(synchronize_session=False)
+        self.db.commit()
+        if expired or overflow:
+            logger.info(f"Cache des scans : {expired} entrées expirées, {len(overflow)} évincées")
+        return expired + len(overflow)
+
+    def entries(self) -> int:
+        return self.db.query(models.ScanCacheEntry).count()
@@ -1,7 +1,32 @@
 from abc import ABC, abstractmethod
+import asyncio
 import json
+import os
+import signal
 from datetime import datetime
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional
+
+# Default wall-clock budget of a scanner, in seconds
+SCANNER_TIMEOUT = float(os.getenv("SCANNER_TIMEOUT", "3600"))
+
+async def terminate_process(process: asyncio.subprocess.Process, grace: float = 5.0) -> None:
+    """Stop a subprocess started with start_new_session=True, children included"""
+    if process.returncode is None:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        try:
+            await asyncio.wait_for(process.wait(), timeout=grace)
+        except asyncio.TimeoutError:
+            pass
+    # Children (zap.sh -> java, tshark -> dumpcap) may outlive the group leader
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    if process.returncode is None:
+        await process.wait()
 
 class BaseScanner(ABC):
     def __init__(self, target: str, options: Dict[str, Any] = None):
@@ -14,6 +39,11 @@ class BaseScanner(ABC):
             "status": "pending",
             "results": {}
         }
+        self.event_sink = None
+        self.checkpoints = {}
+        self.checkpoint_sink = None
+        self.progress = 0.0
+        self.timeout = self.options.get('timeout', SCANNER_TIMEOUT)
 
     @abstractmethod
     async def scan(self) -> Dict[str, Any]:
@@ -29,9 +59,53 @@ class BaseScanner(ABC):
         with open(filename, 'w') as f:
             json.dump(self.results, f, indent=2)
 
+    def resources(self) -> Dict[str, float]:
+        """Tool slots, cores and memory (MB) reserved before scan() runs"""
+        return {}
+
+    def exclusive_locks(self) -> List[str]:
+        """Named locks held for the whole scan, e.g. a capture interface"""
+        return []
+
+    def grant(self, granted: Dict[str, float]) -> None:
+        """Adapt the scan to the resources actually granted"""
+        pass
+
+    def set_event_sink(self, sink: Optional[Callable[[str, str, Dict[str, Any]], None]]) -> None:
+        """Register a callback receiving (scanner, event type, data) live events"""
+        self.event_sink = sink
+
+    def emit_event(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Publish a live event if a sink is registered"""
+        if self.event_sink:
+            self.event_sink(self.__class__.__name__, event_type, data)
+
+    def set_checkpoints(self, checkpoints: Dict[str, Any],
+                        sink: Optional[Callable[[str, str, Any], None]]) -> None:
+        """Restore the checkpoints of an interrupted run and register a callback saving new ones"""
+        self.checkpoints = dict(checkpoints)
+        self.checkpoint_sink = sink
+
+    def save_checkpoint(self, key: str, data: Any) -> None:
+        """Record a unit of finished work so that a resumed scan can skip it"""
+        self.checkpoints[key] = data
+        if self.checkpoint_sink:
+            self.checkpoint_sink(self.__class__.__name__, key, data)
+
+    def report_progress(self, percent: float, task: Optional[str] = None) -> None:
+        """Record progress (0-100, never decreasing) and publish it as a live event"""
+        percent = max(self.progress, min(percent, 100.0))
+        if percent - self.progress < 0.1 and percent < 100.0:
+            return
+        self.progress = percent
+        self.emit_event("progress", {"percent": round(percent, 1), "task": task})
+
     def update_status(self, status: str) -> None:
         """Update scan status"""
         self.results["status"] = status
+        self.emit_event("status", {"status": status})
+        if status == "completed":
+            self.report_progress(100.0)
 
     def add_error(self, error: str) -> None:
         """Add error to results"""
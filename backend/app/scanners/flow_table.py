@@ -0,0 +1,65 @@
+import heapq
+from typing import Dict, Any, List, Optional
+
+# Drapeaux TCP, du bit de poids faible au bit de poids fort
+TCP_FLAGS = ["FIN", "SYN", "RST", "PSH", "ACK", "URG", "ECE", "CWR"]
+
+def flag_names(flags: int) -> List[str]:
+    """Noms des drapeaux TCP présents dans un masque"""
+    return [name for bit, name in enumerate(TCP_FLAGS) if flags & (1 << bit)]
+
+def flow_record(key: tuple, values: list) -> Dict[str, Any]:
+    """Représentation d'un flux dans les rapports"""
+    protocol, src, sport, dst, dport = key
+    first, last, packets, length, flags = values
+    return {
+        "protocol": protocol,
+        "source": {"ip": src, "port": sport},
+        "destination": {"ip": dst, "port": dport},
+        "first_seen": first,
+        "last_seen": last,
+        "packets": packets,
+        "bytes": length,
+        "tcp_flags": flag_names(flags)
+    }
+
+class FlowTable:
+    """Table de flux unidirectionnels indexés par 5-tuple.
+
+    Chaque paquet met à jour son flux (premier/dernier paquet, nombre de
+    paquets et d'octets, drapeaux TCP vus) : la taille de la table dépend du
+    nombre de flux, pas du nombre de paquets.
+    """
+
+    def __init__(self):
+        # (protocole, ip source, port source, ip destination, port destination)
+        #   -> [premier, dernier, paquets, octets, drapeaux]
+        self.flows = {}
+
+    def __len__(self) -> int:
+        return len(self.flows)
+
+    def add(self, timestamp: float, protocol: str, src: str, sport: str, dst: str, dport: str,
+            length: int, flags: int = 0) -> None:
+        """Ajoute un paquet au flux correspondant"""
+        key = (protocol, src, sport, dst, dport)
+        flow = self.flows.get(key)
+        if flow is None:
+            self.flows[key] = [timestamp, timestamp, 1, length, flags]
+            return
+        if timestamp < flow[0]:
+            flow[0] = timestamp
+        if timestamp > flow[1]:
+            flow[1] = timestamp
+        flow[2] += 1
+        flow[3] += length
+        flow[4] |= flags
+
+    def to_list(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Flux triés par volume décroissant, au format des rapports"""
+        sort_key = lambda item: (-item[1][3], item[0])
+        if limit is None:
+            ordered = sorted(self.flows.items(), key=sort_key)
+        else:
+            ordered = heapq.nsmallest(limit, self.flows.items(), key=sort_key)
+        return [flow_record(key, values) for key, values in ordered]
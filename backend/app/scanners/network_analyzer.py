@@ -1,138 +1,527 @@
 import asyncio
+import glob
+import ipaddress
 import json
-from typing import Dict, Any
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse
 import subprocess
 import os
 from datetime import datetime
-from .base_scanner import BaseScanner
+from .base_scanner import BaseScanner, terminate_process
+from .flow_table import FlowTable
+from .pcap_stats import analyze_pcap
+from .sketches import TrafficSketch
+
+# Mémoire réservée par processus tshark (Mo)
+TSHARK_MEMORY_MB = 256
+
+# Champs extraits par tshark en mode streaming (-T fields), dans l'ordre des colonnes
+STREAM_FIELDS = [
+    'frame.time_epoch',
+    'ip.proto',
+    'ip.src',
+    'tcp.srcport',
+    'udp.srcport',
+    'ip.dst',
+    'tcp.dstport',
+    'udp.dstport',
+    'frame.len',
+    'tcp.flags'
+]
+
+def target_host(target: str) -> str:
+    """Hôte d'une cible : adresse, réseau ou nom, sans le schéma ni le chemin d'une URL"""
+    return (urlparse(target).hostname or "") if "://" in target else target.strip()
+
+def build_display_filter(target: str) -> Optional[str]:
+    """Filtre d'affichage tshark (-Y) sur l'adresse ou le réseau de la cible.
+
+    ip.addr n'accepte ni nom d'hôte ni URL : pour ces cibles, pas de filtre.
+    """
+    try:
+        network = ipaddress.ip_network(target_host(target), strict=False)
+    except ValueError:
+        return None
+    field = "ip.addr" if network.version == 4 else "ipv6.addr"
+    return f"{field} == {network.network_address if network.num_addresses == 1 else network}"
+
+def build_capture_filter(target: str, ports: Optional[str] = None) -> str:
+    """Construit un filtre de capture BPF à partir de la cible et des ports.
+
+    Le filtre est appliqué par le noyau : le trafic sans rapport avec la
+    cible n'est jamais écrit sur disque.
+    """
+    clauses = []
+
+    host = target_host(target)
+    if host:
+        try:
+            network = ipaddress.ip_network(host, strict=False)
+            if network.num_addresses == 1:
+                clauses.append(f"host {network.network_address}")
+            else:
+                clauses.append(f"net {network}")
+        except ValueError:
+            if re.fullmatch(r"[A-Za-z0-9.-]+", host):
+                clauses.append(f"host {host}")
+
+    if ports and re.fullmatch(r"[\d,\- ]+", str(ports)):
+        port_clauses = []
+        for part in str(ports).replace(" ", "").split(","):
+            if not part:
+                continue
+            if "-" in part:
+                port_clauses.append(f"portrange {part}")
+            else:
+                port_clauses.append(f"port {part}")
+        if port_clauses:
+            clauses.append("(" + " or ".join(port_clauses) + ")")
+
+    return " and ".join(clauses)
 
 class NetworkAnalyzer(BaseScanner):
     def __init__(self, target: str, options: Dict[str, Any] = None):
         super().__init__(target, options)
         self.interface = options.get('interface', 'eth0')
         self.duration = options.get('duration', 60)  # en secondes
-        self.pcap_file = options.get('pcap_file', f'/tmp/capture_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pcap')
+        # Fichier propre à chaque scan, supprimé en fin de scan même en cas d'annulation
+        self.pcap_file = options.get('pcap_file') or os.path.join(
+            tempfile.gettempdir(), f'capture_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{uuid.uuid4().hex[:8]}.pcap'
+        )
+        # Délai par défaut : durée de capture plus le temps d'analyse
+        self.timeout = options.get('timeout', self.duration + 300)
+        # stream : lecture ligne à ligne de tshark ; json : ancien mode -T json ;
+        # numpy : décodage du pcap dans le processus (pcap_stats)
+        self.analysis_mode = options.get('analysis_mode', 'stream')
+        # Fichier pcap existant à analyser sans capture (analyse hors ligne)
+        self.input_pcap = options.get('input_pcap')
+        self.stats_interval = options.get('stats_interval', 1.0)  # en secondes
+        # Période minimale entre deux publications des compteurs en direct
+        self.counters_interval = options.get('counters_interval', 2.0)  # en secondes
+        self.last_counters = 0.0
+        self.capture_filter = options.get('capture_filter') or build_capture_filter(target, options.get('ports'))
+        # Mode pipeline : capture en tampon circulaire, chaque fichier terminé
+        # est analysé pendant que la capture continue
+        self.pipelined = options.get('pipelined', False)
+        self.ring_duration = options.get('ring_duration', 10)  # en secondes
+        self.ring_filesize = options.get('ring_filesize')  # en ko
+        self.analysis_concurrency = options.get('analysis_concurrency', 2)
+        # Les rapports contiennent les flux ; les paquets bruts seulement sur demande
+        self.max_flows = options.get('max_flows', 10000)
+        self.include_packets = options.get('include_packets', False)
+        self.max_packets = options.get('max_packets', 1000)
+        # exact : dictionnaires complets ; sketch : résumés en mémoire constante
+        # pour les longues captures (modes stream, json et pipeline)
+        self.stats_mode = options.get('stats_mode', 'exact')
+        self.sketch = None
+        if self.stats_mode == 'sketch':
+            self.sketch = TrafficSketch(options.get('sketch_top_k', 100), self.stats_interval)
 
-    async def scan(self) -> Dict[str, Any]:
+    def resources(self) -> Dict[str, float]:
+        # Capture et analyse tournent en parallèle (plusieurs analyses en mode pipeline)
+        processes = 1 if self.input_pcap else 1 + (self.analysis_concurrency if self.pipelined else 1)
+        return {"tshark": 1, "cpu": processes, "memory": processes * TSHARK_MEMORY_MB}
+
+    def exclusive_locks(self) -> List[str]:
+        # Deux captures simultanées d'une interface doublent la charge et perdent des paquets
+        return [] if self.input_pcap else [f"interface:{self.interface}"]
+
+    def empty_summary(self) -> Dict[str, Any]:
+        return {
+            "total_packets": 0,
+            "protocols": {},
+            "ports": {
+                "source": {},
+                "destination": {}
+            }
+        }
+
+    def count_packet(self, summary: Dict[str, Any], protocol: str, src_port: str, dst_port: str) -> None:
+        """Met à jour les compteurs du résumé pour un paquet"""
+        summary["total_packets"] += 1
+        if protocol:
+            summary["protocols"][protocol] = summary["protocols"].get(protocol, 0) + 1
+        if src_port:
+            summary["ports"]["source"][src_port] = summary["ports"]["source"].get(src_port, 0) + 1
+        if dst_port:
+            summary["ports"]["destination"][dst_port] = summary["ports"]["destination"].get(dst_port, 0) + 1
+
+    def report_capture_progress(self, started: float) -> None:
+        """Avancement de la capture (90 % du total, le reste pour l'analyse)"""
+        elapsed = time.monotonic() - started
+        self.report_progress(90 * min(elapsed / self.duration, 1.0) if self.duration else 0, "capture")
+
+    def emit_counters(self, summary: Dict[str, Any]) -> None:
+        """Publie les compteurs courants, au plus une fois par counters_interval"""
+        now = time.monotonic()
+        if now - self.last_counters < self.counters_interval:
+            return
+        self.last_counters = now
+        protocols = self.sketch.protocols if self.sketch is not None else summary["protocols"]
+        self.emit_event("counters", {
+            "total_packets": summary["total_packets"],
+            "protocols": dict(protocols)
+        })
+
+    def record_packet(self, summary: Dict[str, Any], flows: FlowTable, packets: List[Dict[str, Any]],
+                      packet_info: Dict[str, Any], epoch: str, flags: str) -> None:
+        """Comptabilise un paquet : compteurs, table de flux et paquets bruts plafonnés"""
+        if self.sketch is not None:
+            self.sketch.add(
+                float(epoch or 0),
+                packet_info["protocol"],
+                packet_info["source"]["ip"],
+                packet_info["source"]["port"],
+                packet_info["destination"]["ip"],
+                packet_info["destination"]["port"],
+                int(packet_info["length"] or 0)
+            )
+            summary["total_packets"] += 1
+            if self.include_packets and len(packets) < self.max_packets:
+                packets.append(packet_info)
+            return
+
+        self.count_packet(
+            summary,
+            packet_info["protocol"],
+            packet_info["source"]["port"],
+            packet_info["destination"]["port"]
+        )
+        flows.add(
+            float(epoch or 0),
+            packet_info["protocol"],
+            packet_info["source"]["ip"],
+            packet_info["source"]["port"],
+            packet_info["destination"]["ip"],
+            packet_info["destination"]["port"],
+            int(packet_info["length"] or 0),
+            int(flags, 16) if flags else 0
+        )
+        if self.include_packets and len(packets) < self.max_packets:
+            packets.append(packet_info)
+
+    def build_results(self, summary: Dict[str, Any], flows: FlowTable, packets: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Résultats stockés dans le rapport : résumé et flux, paquets en option"""
+        if self.sketch is not None:
+            analysis_results = self.sketch.to_dict(self.max_flows)
+        else:
+            summary["total_flows"] = len(flows)
+            analysis_results = {
+                "summary": summary,
+                "flows": flows.to_list(self.max_flows)
+            }
+        if self.include_packets:
+            analysis_results["packets"] = packets
+        return analysis_results
+
+    def capture_command(self, output: str) -> List[str]:
+        """Commande tshark de capture, avec le filtre BPF de la cible"""
+        capture_cmd = [
+            'tshark',
+            '-i', self.interface,
+            '-w', output,
+            '-a', f'duration:{self.duration}'
+        ]
+        if self.capture_filter:
+            capture_cmd.extend(['-f', self.capture_filter])
+        return capture_cmd
+
+    def display_filter(self) -> Optional[str]:
+        """Filtre -Y de l'analyse : inutile sur une capture déjà filtrée par le noyau"""
+        if self.capture_filter and not self.input_pcap:
+            return None
+        return build_display_filter(self.target)
+
+    async def analyze_stream(self, pcap_file: str, summary: Dict[str, Any],
+                             flows: FlowTable, packets: List[Dict[str, Any]]) -> None:
+        """Analyse une capture en lisant la sortie tshark ligne par ligne.
+
+        Seuls les compteurs et la table de flux sont conservés : la mémoire
+        ne dépend pas du nombre de paquets de la capture.
+        """
+        analysis_cmd = [
+            'tshark',
+            '-r', pcap_file,
+            '-T', 'fields',
+            '-E', 'separator=/t',
+            '-E', 'occurrence=f'
+        ]
+        display_filter = self.display_filter()
+        if display_filter:
+            analysis_cmd.extend(['-Y', display_filter])
+        for field in STREAM_FIELDS:
+            analysis_cmd.extend(['-e', field])
+
+        analysis_process = await asyncio.create_subprocess_exec(
+            *analysis_cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+        try:
+            await self.read_stream(analysis_process, summary, flows, packets)
+        finally:
+            await terminate_process(analysis_process)
+
+    async def read_stream(self, analysis_process: asyncio.subprocess.Process, summary: Dict[str, Any],
+                          flows: FlowTable, packets: List[Dict[str, Any]]) -> None:
+        """Comptabilise les lignes -T fields d'un processus tshark"""
+        stderr_task = asyncio.create_task(analysis_process.stderr.read())
+
+        async for line in analysis_process.stdout:
+            columns = line.decode(errors="replace").rstrip("\n").split("\t")
+            if len(columns) != len(STREAM_FIELDS):
+                continue
+            epoch, protocol, src, tcp_src, udp_src, dst, tcp_dst, udp_dst, length, flags = columns
+            packet_info = {
+                "timestamp": epoch,
+                "protocol": protocol,
+                "source": {"ip": src, "port": tcp_src or udp_src},
+                "destination": {"ip": dst, "port": tcp_dst or udp_dst},
+                "length": length
+            }
+            self.record_packet(summary, flows, packets, packet_info, epoch, flags)
+            if summary["total_packets"] % 1000 == 0:
+                self.emit_counters(summary)
+
+        stderr = await stderr_task
+        await analysis_process.wait()
+
+        if analysis_process.returncode != 0:
+            raise RuntimeError(f"Analysis error: {stderr.decode()}")
+
+    async def analyze_json(self) -> Dict[str, Any]:
+        """Analyse la capture via la sortie -T json complète de tshark"""
+        analysis_cmd = [
+            'tshark',
+            '-r', self.pcap_file,
+            '-T', 'json'
+        ]
+        display_filter = self.display_filter()
+        if display_filter:
+            analysis_cmd.extend(['-Y', display_filter])
+
+        analysis_process = await asyncio.create_subprocess_exec(
+            *analysis_cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+
+        try:
+            stdout, stderr = await analysis_process.communicate()
+        finally:
+            await terminate_process(analysis_process)
+
+        if analysis_process.returncode != 0:
+            raise RuntimeError(f"Analysis error: {stderr.decode()}")
+
+        # Parser les résultats
+        packets = json.loads(stdout)
+
+        # Formater les résultats
+        summary = self.empty_summary()
+        flows = FlowTable()
+        raw_packets = []
+
+        for packet in packets:
+            try:
+                packet_data = packet.get("_source", {}).get("layers", {})
+
+                # Extraire les informations du paquet
+                packet_info = {
+                    "timestamp": packet_data.get("frame", {}).get("frame.time", ""),
+                    "protocol": packet_data.get("ip", {}).get("ip.proto", ""),
+                    "source": {
+                        "ip": packet_data.get("ip", {}).get("ip.src", ""),
+                        "port": packet_data.get("tcp", {}).get("tcp.srcport", "") or
+                               packet_data.get("udp", {}).get("udp.srcport", "")
+                    },
+                    "destination": {
+                        "ip": packet_data.get("ip", {}).get("ip.dst", ""),
+                        "port": packet_data.get("tcp", {}).get("tcp.dstport", "") or
+                               packet_data.get("udp", {}).get("udp.dstport", "")
+                    },
+                    "length": packet_data.get("frame", {}).get("frame.len", "")
+                }
+
+                # Mettre à jour les statistiques
+                self.record_packet(
+                    summary, flows, raw_packets, packet_info,
+                    packet_data.get("frame", {}).get("frame.time_epoch", ""),
+                    packet_data.get("tcp", {}).get("tcp.flags", "")
+                )
+
+            except Exception as e:
+                self.add_error(f"Error processing packet: {str(e)}")
+                continue
+
+        return self.build_results(summary, flows, raw_packets)
+
+    async def scan_pipelined(self) -> Dict[str, Any]:
+        """Capture en tampon circulaire et analyse chaque fichier dès sa rotation.
+
+        Les statistiques partielles sont disponibles dans self.results pendant
+        la capture ; la durée totale est celle de la capture plus l'analyse du
+        dernier fichier seulement.
+        """
+        capture_dir = tempfile.mkdtemp(prefix="capture_")
+        capture_cmd = self.capture_command(os.path.join(capture_dir, "capture.pcap"))
+        capture_cmd.extend(['-b', f'duration:{self.ring_duration}'])
+        if self.ring_filesize:
+            capture_cmd.extend(['-b', f'filesize:{self.ring_filesize}'])
+
+        summary = self.empty_summary()
+        flows = FlowTable()
+        raw_packets = []
+        analysis_results = {"summary": summary, "chunks": 0, "partial": True}
+        self.results["results"] = analysis_results
+        semaphore = asyncio.Semaphore(self.analysis_concurrency)
+        scheduled = set()
+        tasks = []
+
+        async def analyze_chunk(chunk: str) -> None:
+            async with semaphore:
+                try:
+                    await self.analyze_stream(chunk, summary, flows, raw_packets)
+                    analysis_results["chunks"] += 1
+                    self.emit_counters(summary)
+                except Exception as e:
+                    self.add_error(f"Error analyzing {os.path.basename(chunk)}: {str(e)}")
+                finally:
+                    os.remove(chunk)
+
+        def schedule(chunks: List[str]) -> None:
+            for chunk in chunks:
+                if chunk not in scheduled:
+                    scheduled.add(chunk)
+                    tasks.append(asyncio.create_task(analyze_chunk(chunk)))
+
+        capture_process = None
         try:
-            self.update_status("running")
-            
-            # Commande pour capturer le trafic
-            capture_cmd = [
-                'tshark',
-                '-i', self.interface,
-                '-w', self.pcap_file,
-                '-a', f'duration:{self.duration}'
-            ]
-            
-            # Exécuter la capture
             capture_process = await asyncio.create_subprocess_exec(
                 *capture_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True
             )
-            
-            await capture_process.communicate()
-            
+            stderr_task = asyncio.create_task(capture_process.stderr.read())
+
+            capture_started = time.monotonic()
+            while capture_process.returncode is None:
+                try:
+                    await asyncio.wait_for(capture_process.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
+                self.report_capture_progress(capture_started)
+                # Tous les fichiers sauf le plus récent sont complets
+                schedule(sorted(glob.glob(os.path.join(capture_dir, "capture_*")))[:-1])
+
+            stderr = await stderr_task
+            schedule(sorted(glob.glob(os.path.join(capture_dir, "capture_*"))))
+            await asyncio.gather(*tasks)
+
+            if not scheduled:
+                raise RuntimeError(f"Failed to create capture file: {stderr.decode()}")
+
+            chunks = analysis_results["chunks"]
+            analysis_results = self.build_results(summary, flows, raw_packets)
+            analysis_results["chunks"] = chunks
+            analysis_results["partial"] = False
+            self.results["results"] = analysis_results
+            return analysis_results
+        finally:
+            if capture_process is not None:
+                await terminate_process(capture_process)
+            # Annulation : arrêter les analyses en cours avant de supprimer leurs fichiers
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            shutil.rmtree(capture_dir, ignore_errors=True)
+
+    async def scan(self) -> Dict[str, Any]:
+        try:
+            return await self.run_capture()
+        finally:
+            # Nettoyer le fichier de capture, y compris après annulation (jamais le fichier fourni)
+            if not self.input_pcap and os.path.exists(self.pcap_file):
+                os.remove(self.pcap_file)
+
+    async def run_capture(self) -> Dict[str, Any]:
+        try:
+            self.update_status("running")
+
+            if self.pipelined:
+                try:
+                    await self.scan_pipelined()
+                    self.update_status("completed")
+                except RuntimeError as e:
+                    self.add_error(str(e))
+                    self.update_status("failed")
+                return self.results
+
+            if self.input_pcap:
+                self.pcap_file = self.input_pcap
+            else:
+                # Exécuter la capture
+                capture_process = await asyncio.create_subprocess_exec(
+                    *self.capture_command(self.pcap_file),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    start_new_session=True
+                )
+
+                capture_started = time.monotonic()
+                capture = asyncio.create_task(capture_process.communicate())
+                try:
+                    while not capture.done():
+                        await asyncio.wait([capture], timeout=1)
+                        self.report_capture_progress(capture_started)
+                finally:
+                    await terminate_process(capture_process)
+                    capture.cancel()
+
             if not os.path.exists(self.pcap_file):
                 self.add_error("Failed to create capture file")
                 self.update_status("failed")
                 return self.results
 
             # Analyser le fichier de capture
-            analysis_cmd = [
-                'tshark',
-                '-r', self.pcap_file,
-                '-T', 'json',
-                '-Y', f'ip.addr == {self.target}'
-            ]
-            
-            analysis_process = await asyncio.create_subprocess_exec(
-                *analysis_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await analysis_process.communicate()
-            
-            if analysis_process.returncode != 0:
-                self.add_error(f"Analysis error: {stderr.decode()}")
+            try:
+                if self.analysis_mode == 'json':
+                    analysis_results = await self.analyze_json()
+                elif self.analysis_mode == 'numpy':
+                    # Décodage vectorisé, hors de la boucle d'événements
+                    loop = asyncio.get_running_loop()
+                    analysis_results = await loop.run_in_executor(
+                        None, analyze_pcap, self.pcap_file, self.target,
+                        self.stats_interval, 10, self.max_flows
+                    )
+                else:
+                    summary = self.empty_summary()
+                    flows = FlowTable()
+                    raw_packets = []
+                    await self.analyze_stream(self.pcap_file, summary, flows, raw_packets)
+                    analysis_results = self.build_results(summary, flows, raw_packets)
+            except RuntimeError as e:
+                self.add_error(str(e))
                 self.update_status("failed")
                 return self.results
-
-            try:
-                # Parser les résultats
-                packets = json.loads(stdout)
-                
-                # Formater les résultats
-                analysis_results = {
-                    "summary": {
-                        "total_packets": len(packets),
-                        "protocols": {},
-                        "ports": {
-                            "source": {},
-                            "destination": {}
-                        }
-                    },
-                    "packets": []
-                }
-
-                for packet in packets:
-                    try:
-                        packet_data = packet.get("_source", {}).get("layers", {})
-                        
-                        # Extraire les informations du paquet
-                        packet_info = {
-                            "timestamp": packet_data.get("frame", {}).get("frame.time", ""),
-                            "protocol": packet_data.get("ip", {}).get("ip.proto", ""),
-                            "source": {
-                                "ip": packet_data.get("ip", {}).get("ip.src", ""),
-                                "port": packet_data.get("tcp", {}).get("tcp.srcport", "") or 
-                                       packet_data.get("udp", {}).get("udp.srcport", "")
-                            },
-                            "destination": {
-                                "ip": packet_data.get("ip", {}).get("ip.dst", ""),
-                                "port": packet_data.get("tcp", {}).get("tcp.dstport", "") or 
-                                       packet_data.get("udp", {}).get("udp.dstport", "")
-                            },
-                            "length": packet_data.get("frame", {}).get("frame.len", "")
-                        }
-
-                        # Mettre à jour les statistiques
-                        protocol = packet_info["protocol"]
-                        if protocol:
-                            analysis_results["summary"]["protocols"][protocol] = \
-                                analysis_results["summary"]["protocols"].get(protocol, 0) + 1
-
-                        src_port = packet_info["source"]["port"]
-                        if src_port:
-                            analysis_results["summary"]["ports"]["source"][src_port] = \
-                                analysis_results["summary"]["ports"]["source"].get(src_port, 0) + 1
-
-                        dst_port = packet_info["destination"]["port"]
-                        if dst_port:
-                            analysis_results["summary"]["ports"]["destination"][dst_port] = \
-                                analysis_results["summary"]["ports"]["destination"].get(dst_port, 0) + 1
-
-                        analysis_results["packets"].append(packet_info)
-
-                    except Exception as e:
-                        self.add_error(f"Error processing packet: {str(e)}")
-                        continue
-
-                self.results["results"] = analysis_results
-                self.update_status("completed")
-
-                # Nettoyer le fichier de capture
-                if os.path.exists(self.pcap_file):
-                    os.remove(self.pcap_file)
-
             except Exception as e:
                 self.add_error(f"Error parsing capture results: {str(e)}")
                 self.update_status("failed")
+                return self.results
+
+            self.results["results"] = analysis_results
+            self.update_status("completed")
 
         except Exception as e:
             self.add_error(f"Analysis error: {str(e)}")
             self.update_status("failed")
 
-        return self.results 
\ No newline at end of file
+        return self.results
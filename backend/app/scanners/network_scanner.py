@@ -1,8 +1,232 @@
 import asyncio
+import hashlib
+import ipaddress
 import json
-from typing import Dict, Any
+import os
+import re
+from typing import Dict, Any, AsyncIterator, Callable, Iterable, List, Optional
 import subprocess
-from .base_scanner import BaseScanner
+import tempfile
+import time
+from datetime import datetime, timedelta
+from xml.etree import ElementTree
+from .base_scanner import BaseScanner, terminate_process
+from .port_prescan import OCTET_RANGE, TcpConnectScanner, expand_hosts, parse_ports
+from .scan_diff import diff_hosts, host_sort_key, merge_rescanned, open_services, summarize_hosts
+
+# Taille des blocs lus sur la sortie XML de nmap
+READ_CHUNK_SIZE = 64 * 1024
+
+# Mémoire réservée par processus nmap (Mo)
+NMAP_MEMORY_MB = 128
+
+# Poids des phases d'un processus nmap dans son avancement, dans leur ordre d'exécution
+NMAP_PHASES = [
+    ("discovery", 5),
+    ("ports", 60),
+    ("services", 20),
+    ("scripts", 15)
+]
+
+class NmapError(Exception):
+    """Erreur d'exécution ou de parsing d'un processus nmap"""
+
+def parse_host(host: ElementTree.Element) -> Dict[str, Any]:
+    """Convertit un élément <host> de nmap en dictionnaire"""
+    host_data = {
+        "ip": host.find("address").get("addr"),
+        "status": host.find("status").get("state"),
+        "ports": []
+    }
+
+    for port in host.findall(".//port"):
+        service = port.find("service")
+        port_data = {
+            "number": port.get("portid"),
+            "protocol": port.get("protocol"),
+            "state": port.find("state").get("state"),
+            "service": {
+                "name": service.get("name") if service is not None else None,
+                "product": service.get("product") if service is not None else None,
+                "version": service.get("version") if service is not None else None
+            }
+        }
+        host_data["ports"].append(port_data)
+
+    return host_data
+
+def nmap_phase(task: str) -> Optional[str]:
+    """Phase correspondant à une tâche nmap (taskbegin/taskprogress/taskend)"""
+    if "Ping" in task:
+        return "discovery"
+    if task.startswith("Service scan"):
+        return "services"
+    if "NSE" in task or "Script" in task:
+        return "scripts"
+    if task.endswith("Scan"):
+        return "ports"
+    return None
+
+class NmapProgress:
+    """Avancement d'un processus nmap d'après ses éléments taskprogress.
+
+    nmap ne donne que le pourcentage de la tâche en cours : chaque phase
+    attendue (selon les options) reçoit un poids, et le début d'une phase
+    termine les précédentes.
+    """
+
+    def __init__(self, arguments: List[str]):
+        expected = {"ports"}
+        if '-Pn' not in arguments:
+            expected.add("discovery")
+        if '-sV' in arguments or '-A' in arguments:
+            expected.add("services")
+        if '-sC' in arguments or '--script' in arguments or '-A' in arguments:
+            expected.add("scripts")
+        self.phases = [(phase, weight) for phase, weight in NMAP_PHASES if phase in expected]
+        self.done = {phase: 0.0 for phase, _ in self.phases}
+
+    def update(self, tag: str, attributes: Dict[str, str]) -> Optional[float]:
+        """Prend en compte un élément de tâche ; retourne la fraction accomplie"""
+        phase = nmap_phase(attributes.get("task", ""))
+        if phase not in self.done:
+            return None
+        for previous, _ in self.phases:
+            if previous == phase:
+                break
+            self.done[previous] = 1.0
+        if tag == "taskend":
+            self.done[phase] = 1.0
+        elif tag == "taskprogress":
+            self.done[phase] = max(self.done[phase], float(attributes.get("percent", 0)) / 100)
+        total = sum(weight for _, weight in self.phases)
+        return sum(self.done[phase] * weight for phase, weight in self.phases) / total
+
+async def iter_nmap_hosts(stream: asyncio.StreamReader,
+                          on_task: Optional[Callable[[str, Dict[str, str]], None]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Parse la sortie XML de nmap au fil de l'eau et émet chaque hôte terminé.
+
+    Les éléments déjà traités sont retirés de l'arbre : la mémoire utilisée
+    reste de l'ordre d'un hôte, quelle que soit la taille du scan. Les
+    éléments de suivi (taskbegin, taskprogress, taskend) sont transmis à
+    on_task.
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root = None
+
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        parser.feed(chunk)
+
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+            elif elem.tag == "host":
+                yield parse_host(elem)
+                # Libérer les éléments terminés (hôtes, scaninfo, hosthint...)
+                root.clear()
+            elif elem.tag in ("taskbegin", "taskprogress", "taskend") and on_task:
+                on_task(elem.tag, elem.attrib)
+
+    parser.close()
+
+def split_targets(target: str, chunk_size: int) -> List[List[str]]:
+    """Découpe une cible nmap en blocs d'au plus chunk_size adresses.
+
+    Les réseaux CIDR et les plages sur le dernier octet sont découpés ; les
+    adresses isolées et les noms d'hôtes sont regroupés par blocs. Les
+    spécifications que nmap est seul à comprendre restent entières.
+    """
+    shards = []
+    singles = []
+
+    for token in re.split(r"[\s,]+", target.strip()):
+        if not token:
+            continue
+        range_match = OCTET_RANGE.match(token)
+        if range_match:
+            prefix, first, last = range_match.group(1), int(range_match.group(2)), int(range_match.group(3))
+            for start in range(first, last + 1, chunk_size):
+                end = min(start + chunk_size - 1, last)
+                shards.append([f"{prefix}{start}-{end}" if end > start else f"{prefix}{start}"])
+            continue
+        if "/" in token:
+            try:
+                network = ipaddress.ip_network(token, strict=False)
+            except ValueError:
+                shards.append([token])
+                continue
+            # Taille de bloc arrondie à la puissance de deux inférieure
+            host_bits = max(chunk_size.bit_length() - 1, 0)
+            new_prefix = max(network.max_prefixlen - host_bits, network.prefixlen)
+            shards.extend([str(subnet)] for subnet in network.subnets(new_prefix=new_prefix))
+            continue
+        singles.append(token)
+
+    for start in range(0, len(singles), chunk_size):
+        shards.append(singles[start:start + chunk_size])
+
+    return shards
+
+def split_ports(ports: str, chunks: int) -> List[str]:
+    """Découpe une spécification de ports numérique en chunks plages contiguës.
+
+    Les spécifications avec protocole (T:, U:) ou noms de services ne sont
+    pas découpées.
+    """
+    if chunks <= 1:
+        return [ports]
+    try:
+        numbers = parse_ports(ports)
+    except ValueError:
+        return [ports]
+
+    size = -(-len(numbers) // chunks)
+    result = []
+    for start in range(0, len(numbers), size):
+        block = numbers[start:start + size]
+        # Recompacter le bloc en plages a-b
+        ranges = []
+        range_start = previous = block[0]
+        for number in block[1:]:
+            if number != previous + 1:
+                ranges.append(f"{range_start}-{previous}" if previous > range_start else str(range_start))
+                range_start = number
+            previous = number
+        ranges.append(f"{range_start}-{previous}" if previous > range_start else str(range_start))
+        result.append(",".join(ranges))
+    return result
+
+def merge_hosts(partials: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Fusionne les hôtes de plusieurs exécutions nmap de façon déterministe.
+
+    Un hôte vu par plusieurs blocs est fusionné en un seul ; pour un même
+    (protocole, port) la première occurrence ouverte l'emporte.
+    """
+    merged = {}
+    for hosts in partials:
+        for host_data in hosts:
+            entry = merged.setdefault(host_data["ip"], {
+                "ip": host_data["ip"],
+                "status": host_data["status"],
+                "ports": {}
+            })
+            if host_data["status"] == "up":
+                entry["status"] = "up"
+            for port in host_data["ports"]:
+                key = (port["protocol"], int(port["number"]))
+                current = entry["ports"].get(key)
+                if current is None or (current["state"] != "open" and port["state"] == "open"):
+                    entry["ports"][key] = port
+
+    result = []
+    for entry in sorted(merged.values(), key=host_sort_key):
+        entry["ports"] = [entry["ports"][key] for key in sorted(entry["ports"])]
+        result.append(entry)
+    return result
 
 class NetworkScanner(BaseScanner):
     def __init__(self, target: str, options: Dict[str, Any] = None):
@@ -10,87 +234,466 @@ class NetworkScanner(BaseScanner):
         self.scan_type = options.get('scan_type', 'quick')
         self.ports = options.get('ports', '1-1000')
         self.scripts = options.get('scripts', [])
+        # Mode parallèle : plusieurs processus nmap sur des blocs de cibles/ports
+        self.sharding = options.get('sharding', False)
+        self.shard_hosts = options.get('shard_hosts', 256)
+        self.shard_ports = options.get('shard_ports')
+        self.shard_concurrency = options.get('shard_concurrency', os.cpu_count() or 1)
+        # Découpage en ports indépendant des ressources accordées : les blocs
+        # restent identiques d'une exécution à l'autre (reprise après arrêt)
+        self.port_split = self.shard_concurrency
+        # Type "fast" : découverte des ports par connexions TCP, puis nmap
+        # uniquement sur les ports ouverts
+        self.prescan_concurrency = options.get('prescan_concurrency', 500)
+        self.prescan_timeout = options.get('prescan_timeout', 1.0)
+        self.prescan_host_rate = options.get('prescan_host_rate')
+        # Mode deux phases : découverte des ports ouverts, puis -sV et scripts
+        # NSE uniquement sur les couples (hôte, port) ouverts
+        self.two_phase = options.get('two_phase', False)
+        # Mode incrémental : découverte rapide, puis -sV/-sC uniquement sur les
+        # hôtes dont les ports ouverts ont changé depuis la référence (baseline,
+        # état complet du dernier rapport de la cible, fourni par le worker)
+        self.incremental = options.get('incremental', False)
+        self.baseline = options.get('baseline')
+        self.baseline_max_age = options.get('baseline_max_age', 7 * 24 * 3600)  # en secondes
+        # Fréquence des éléments taskprogress de nmap (suivi de l'avancement)
+        self.stats_every = options.get('stats_every', '5s')
+        # Étape en cours (début, part de l'avancement total) et avancement de ses processus nmap
+        self.stage = (0.0, 1.0)
+        self.stage_runs = [0.0]
+
+    def parallel_runs(self) -> int:
+        """Processus nmap lancés en même temps au plus"""
+        if self.sharding or self.two_phase or self.incremental or self.scan_type == 'fast':
+            return max(int(self.shard_concurrency), 1)
+        return 1
+
+    def resources(self) -> Dict[str, float]:
+        runs = self.parallel_runs()
+        return {"nmap": runs, "cpu": runs, "memory": runs * NMAP_MEMORY_MB}
+
+    def grant(self, granted: Dict[str, float]) -> None:
+        # Pas plus de processus nmap parallèles que d'emplacements obtenus
+        self.shard_concurrency = max(1, min(self.parallel_runs(), int(granted.get("nmap", 1))))
+
+    def begin_stage(self, start: float, span: float, runs: int = 1) -> None:
+        """Démarre une étape couvrant [start, start + span] de l'avancement"""
+        self.stage = (start, span)
+        self.stage_runs = [0.0] * max(runs, 1)
+        self.report_progress(100 * start)
+
+    def run_progress(self, index: int, fraction: float, task: Optional[str] = None) -> None:
+        """Avancement du processus nmap index de l'étape en cours"""
+        self.stage_runs[index] = fraction
+        start, span = self.stage
+        self.report_progress(100 * (start + span * sum(self.stage_runs) / len(self.stage_runs)), task)
+
+    def add_host(self, scan_results: Dict[str, Any], host_data: Dict[str, Any]) -> None:
+        """Ajoute un hôte aux résultats et met à jour le résumé"""
+        scan_results["hosts"].append(host_data)
+        scan_results["summary"]["total_hosts"] += 1
+        if host_data["status"] == "up":
+            scan_results["summary"]["up_hosts"] += 1
+        scan_results["summary"]["open_ports"] += sum(
+            1 for port in host_data["ports"] if port["state"] == "open"
+        )
+        self.emit_event("host", host_data)
+
+    def nmap_arguments(self) -> List[str]:
+        """Options nmap selon le type de scan et les scripts demandés"""
+        arguments = {
+            'quick': '-sV -T4',
+            'full': '-sV -sC -T4',
+            'vulnerability': '-sV -sC --script vuln -T4',
+            'custom': '-sV -sC -T4',
+            'fast': '-sV -sC -T4 -Pn'
+        }.get(self.scan_type, '-sV -T4').split()
+        if self.scripts:
+            # Les scripts demandés remplacent ceux du profil (-sC, --script)
+            if '--script' in arguments:
+                index = arguments.index('--script')
+                del arguments[index:index + 2]
+            arguments = [argument for argument in arguments if argument != '-sC']
+            scripts = self.scripts if isinstance(self.scripts, str) else ",".join(self.scripts)
+            arguments.extend(['--script', scripts])
+        return arguments
+
+    @staticmethod
+    def run_key(stage: str, targets: List[str], ports: str, arguments: List[str]) -> str:
+        """Identifiant stable d'un processus nmap, pour les points de reprise"""
+        digest = hashlib.sha1(json.dumps([targets, ports, arguments]).encode()).hexdigest()[:16]
+        return f"{stage}:{digest}"
+
+    async def run_nmap(self, targets: List[str], ports: str, arguments: List[str],
+                       on_host: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       run_index: int = 0, stage: str = "scan") -> List[Dict[str, Any]]:
+        """Exécute un processus nmap et retourne ses hôtes, parsés au fil de l'eau.
+
+        Chaque hôte, puis le processus terminé, est enregistré comme point de
+        reprise : après un arrêt du worker, un processus terminé n'est pas
+        relancé et un processus interrompu exclut les hôtes déjà obtenus.
+        """
+        key = self.run_key(stage, targets, ports, arguments)
+        finished = self.checkpoints.get(f"{key}:done")
+        resumed = [data for name, data in self.checkpoints.items() if name.startswith(f"{key}:host:")]
+        if finished is not None:
+            resumed, targets = finished["hosts"], []
+        for host_data in resumed:
+            if on_host:
+                on_host(host_data)
+        if not targets:
+            self.run_progress(run_index, 1.0)
+            return list(resumed)
+
+        cmd = ['nmap', *arguments, '--stats-every', self.stats_every, '-p', ports, '-oX', '-', *targets]
+        exclude_file = None
+        if resumed:
+            with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+                f.write("\n".join(host_data["ip"] for host_data in resumed))
+                exclude_file = f.name
+            cmd[1:1] = ['--excludefile', exclude_file]
+        progress = NmapProgress(arguments)
+
+        def on_task(tag: str, attributes: Dict[str, str]) -> None:
+            fraction = progress.update(tag, attributes)
+            if fraction is not None:
+                self.run_progress(run_index, fraction, attributes.get("task"))
+
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+        stderr_task = asyncio.create_task(process.stderr.read())
+
+        hosts = list(resumed)
+        try:
+            try:
+                async for host_data in iter_nmap_hosts(process.stdout, on_task):
+                    hosts.append(host_data)
+                    self.save_checkpoint(f"{key}:host:{host_data['ip']}", host_data)
+                    if on_host:
+                        on_host(host_data)
+            except Exception as e:
+                raise NmapError(f"Error parsing nmap results: {str(e)}")
+
+            stderr = await stderr_task
+            await process.wait()
+        finally:
+            # Erreur, délai dépassé ou annulation : ne laisser aucun processus nmap
+            await terminate_process(process)
+            stderr_task.cancel()
+            if exclude_file:
+                os.remove(exclude_file)
+
+        if process.returncode != 0:
+            raise NmapError(f"Nmap error: {stderr.decode()}")
+
+        self.save_checkpoint(f"{key}:done", {"hosts": hosts})
+        self.run_progress(run_index, 1.0)
+        return hosts
+
+    async def scan_sharded(self, arguments: List[str], start: float = 0.0, span: float = 1.0,
+                           stage: str = "scan",
+                           on_host: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """Répartit le scan sur des processus nmap concurrents puis fusionne.
+
+        Les hôtes d'un bloc de cibles sont fusionnés et transmis à on_host dès
+        que tous ses blocs de ports sont terminés, sans attendre les autres
+        blocs.
+        """
+        target_shards = split_targets(self.target, self.shard_hosts)
+        if self.shard_ports is None:
+            # Une seule cible : paralléliser sur les ports
+            port_chunks = self.port_split if len(target_shards) == 1 else 1
+        else:
+            port_chunks = self.shard_ports
+        shards = [(block, targets, ports) for block, targets in enumerate(target_shards)
+                  for ports in split_ports(self.ports, port_chunks)]
+
+        semaphore = asyncio.Semaphore(self.shard_concurrency)
+        self.begin_stage(start, span, len(shards))
+
+        async def run_shard(index: int, targets: List[str], ports: str) -> tuple:
+            async with semaphore:
+                try:
+                    return index, await self.run_nmap(targets, ports, arguments, run_index=index, stage=stage)
+                except Exception as e:
+                    return index, e
+
+        # Blocs de ports restant à terminer, et résultats obtenus, par bloc de cibles
+        remaining = {}
+        for block, _, _ in shards:
+            remaining[block] = remaining.get(block, 0) + 1
+        partials = {}
+        failed = []
+        emitted = set()
+        tasks = [asyncio.ensure_future(run_shard(index, targets, ports))
+                 for index, (_, targets, ports) in enumerate(shards)]
+        try:
+            for next_shard in asyncio.as_completed(tasks):
+                index, result = await next_shard
+                block = shards[index][0]
+                remaining[block] -= 1
+                if isinstance(result, Exception):
+                    failed.append(result)
+                    self.add_error(str(result))
+                else:
+                    partials.setdefault(block, []).append(result)
+                if remaining[block] or not on_host:
+                    continue
+                for host_data in merge_hosts(partials.get(block, [])):
+                    # Une adresse présente dans deux blocs n'est transmise qu'une fois
+                    if host_data["ip"] not in emitted:
+                        emitted.add(host_data["ip"])
+                        on_host(host_data)
+        finally:
+            # Erreur ou annulation : arrêter les processus nmap encore en cours
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if failed and len(failed) == len(shards):
+            raise NmapError("All nmap shards failed")
+
+        return merge_hosts(hosts for block in sorted(partials) for hosts in partials[block])
+
+    async def probe_services(self, open_ports: Dict[str, List[int]], arguments: List[str],
+                             start: float = 0.0, span: float = 1.0) -> List[Dict[str, Any]]:
+        """Lance nmap sur les seuls ports ouverts de chaque hôte.
+
+        Les hôtes ayant le même ensemble de ports sont regroupés par blocs de
+        shard_hosts dans une même invocation ; les invocations s'exécutent en
+        parallèle, dans la limite de shard_concurrency.
+        """
+        groups = {}
+        for host, ports in open_ports.items():
+            if ports:
+                groups.setdefault(tuple(ports), []).append(host)
+
+        batches = []
+        for ports, hosts in groups.items():
+            port_spec = ",".join(str(port) for port in ports)
+            for start in range(0, len(hosts), self.shard_hosts):
+                batches.append((hosts[start:start + self.shard_hosts], port_spec))
+
+        semaphore = asyncio.Semaphore(self.shard_concurrency)
+        self.begin_stage(start, span, len(batches))
+
+        async def run_batch(index: int, hosts: List[str], ports: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self.run_nmap(hosts, ports, arguments, run_index=index, stage="probe")
+
+        partials = await asyncio.gather(
+            *[run_batch(index, hosts, ports) for index, (hosts, ports) in enumerate(batches)],
+            return_exceptions=True
+        )
+        for error in (p for p in partials if isinstance(p, Exception)):
+            self.add_error(str(error))
+        return merge_hosts(p for p in partials if not isinstance(p, Exception))
+
+    def add_probed_hosts(self, scan_results: Dict[str, Any], discovered: List[Dict[str, Any]],
+                         probed: List[Dict[str, Any]]) -> None:
+        """Fusionne les hôtes détaillés par nmap avec ceux de la découverte.
+
+        Les ports détaillés l'emportent ; les hôtes découverts sans port
+        ouvert (ou dont la détection a échoué) restent dans les résultats.
+        """
+        for host_data in merge_hosts([probed, discovered]):
+            self.add_host(scan_results, host_data)
+
+    async def scan_fast(self, scan_results: Dict[str, Any]) -> None:
+        """Pré-scan TCP connect asyncio, puis détection de services nmap"""
+        started = time.monotonic()
+        prescanner = TcpConnectScanner(
+            concurrency=self.prescan_concurrency,
+            timeout=self.prescan_timeout,
+            host_rate=self.prescan_host_rate
+        )
+        self.begin_stage(0.0, 0.4)
+        checkpoint = self.checkpoints.get("prescan")
+        if checkpoint is not None:
+            discovered, probes = checkpoint["discovered"], checkpoint["probes"]
+        else:
+            discovered = await prescanner.scan(expand_hosts(self.target), parse_ports(self.ports))
+            probes = prescanner.probes
+            self.save_checkpoint("prescan", {"discovered": discovered, "probes": probes})
+        scan_results["prescan"] = {
+            "probes": probes,
+            "open_ports": sum(len(host["open_ports"]) for host in discovered.values())
+        }
+        discovery_time = time.monotonic() - started
+
+        probed = await self.probe_services(
+            {host: data["open_ports"] for host, data in discovered.items()},
+            self.nmap_arguments(), start=0.4, span=0.6
+        )
+        scan_results["timing"] = {
+            "discovery": round(discovery_time, 3),
+            "services": round(time.monotonic() - started - discovery_time, 3)
+        }
+
+        self.add_probed_hosts(scan_results, [
+            {
+                "ip": host,
+                "status": data["status"],
+                "ports": [
+                    {"number": str(port), "protocol": "tcp", "state": "open",
+                     "service": {"name": None, "product": None, "version": None}}
+                    for port in data["open_ports"]
+                ]
+            }
+            for host, data in discovered.items()
+        ], probed)
+
+    async def discover(self, span: float) -> List[Dict[str, Any]]:
+        """Découverte rapide des ports ouverts (sans -sV ni scripts)"""
+        discovery_arguments = ['-T4', '--open']
+        if self.sharding:
+            return await self.scan_sharded(discovery_arguments, start=0.0, span=span, stage="discovery")
+        self.begin_stage(0.0, span)
+        return await self.run_nmap(self.target.split(), self.ports, discovery_arguments, stage="discovery")
+
+    def probe_arguments(self) -> List[str]:
+        """Options de la détection sur ports connus : les hôtes sont déjà découverts"""
+        arguments = self.nmap_arguments()
+        if '-Pn' not in arguments:
+            arguments.append('-Pn')
+        return arguments
+
+    @staticmethod
+    def open_tcp_ports(hosts: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+        return {
+            host_data["ip"]: sorted(int(port["number"]) for port in host_data["ports"]
+                                    if port["state"] == "open" and port["protocol"] == "tcp")
+            for host_data in hosts
+        }
+
+    async def scan_two_phase(self, scan_results: Dict[str, Any]) -> None:
+        """Découverte des ports ouverts, puis -sV et scripts sur ces seuls ports"""
+        started = time.monotonic()
+        discovered = await self.discover(0.5)
+        discovery_time = time.monotonic() - started
+
+        probed = await self.probe_services(self.open_tcp_ports(discovered), self.probe_arguments(), start=0.5, span=0.5)
+
+        scan_results["timing"] = {
+            "discovery": round(discovery_time, 3),
+            "scripts": round(time.monotonic() - started - discovery_time, 3)
+        }
+        self.add_probed_hosts(scan_results, discovered, probed)
+
+    def stale(self, host_data: Dict[str, Any]) -> bool:
+        """Vrai si la dernière détection de services de l'hôte est trop ancienne"""
+        probed_at = host_data.get("probed_at") or self.baseline.get("timestamp")
+        try:
+            return datetime.utcnow() - datetime.fromisoformat(probed_at) > timedelta(seconds=self.baseline_max_age)
+        except (TypeError, ValueError):
+            return True
+
+    async def scan_incremental(self, scan_results: Dict[str, Any]) -> None:
+        """Scan différentiel par rapport à la référence.
+
+        Seuls les hôtes nouveaux, dont l'ensemble de ports ouverts a changé ou
+        dont la référence est périmée repassent par -sV/-sC. Les résultats ne
+        contiennent que ces hôtes, l'écart (delta) et les adresses des autres
+        hôtes actifs (unchanged) ; l'état complet se
+        reconstruit à partir de la référence (voir scan_diff.apply_delta).
+        """
+        started = time.monotonic()
+        ports = set(parse_ports(self.ports))
+        baseline_hosts = {host["ip"]: host for host in self.baseline["hosts"]}
+        discovered = await self.discover(0.3)
+        discovery_time = time.monotonic() - started
+
+        current = {}
+        to_probe = {}
+        for ip, open_ports in self.open_tcp_ports(discovered).items():
+            previous = baseline_hosts.get(ip)
+            unchanged = (
+                previous is not None
+                and set(open_services(previous, ports, "tcp")) == {("tcp", port) for port in open_ports}
+                and not self.stale(previous)
+            )
+            if unchanged:
+                current[ip] = previous
+            elif open_ports:
+                to_probe[ip] = open_ports
+
+        probed = await self.probe_services(to_probe, self.probe_arguments(), start=0.3, span=0.7)
+        probed_at = datetime.utcnow().isoformat()
+        rescanned = merge_hosts([probed, [host for host in discovered if host["ip"] in to_probe]])
+        for host_data in rescanned:
+            host_data["probed_at"] = probed_at
+            # Le rapport garde l'hôte tel que sondé ; l'état complet conserve
+            # ses ports UDP et hors plage connus par la référence
+            current[host_data["ip"]] = merge_rescanned(baseline_hosts.get(host_data["ip"]), host_data, ports)
+            self.add_host(scan_results, host_data)
+
+        full_state = sorted(current.values(), key=host_sort_key)
+        scan_results["mode"] = "incremental"
+        # Plage re-scannée, pour reconstruire l'état complet (scan_diff.apply_delta)
+        scan_results["port_range"] = self.ports
+        scan_results["baseline"] = {
+            "report_id": self.baseline.get("report_id"),
+            "timestamp": self.baseline.get("timestamp")
+        }
+        scan_results["delta"] = diff_hosts(self.baseline["hosts"], full_state, ports)
+        scan_results["unchanged_hosts"] = len(current) - len(rescanned)
+        # Hôtes vus actifs par la découverte mais non sondés à nouveau (inventaire)
+        probed_ips = {host_data["ip"] for host_data in rescanned}
+        scan_results["unchanged"] = [host["ip"] for host in full_state if host["ip"] not in probed_ips]
+        # Résumé de l'état complet, pas des seuls hôtes sondés
+        scan_results["summary"] = summarize_hosts(full_state)
+        scan_results["timing"] = {
+            "discovery": round(discovery_time, 3),
+            "scripts": round(time.monotonic() - started - discovery_time, 3)
+        }
 
     async def scan(self) -> Dict[str, Any]:
         try:
             self.update_status("running")
-            
-            # Définir les options nmap selon le type de scan
-            nmap_options = {
-                'quick': '-sV -T4',
-                'full': '-sV -sC -T4',
-                'vulnerability': '-sV -sC --script vuln -T4',
-                'custom': '-sV -sC -T4'
-            }.get(self.scan_type, '-sV -T4')
-
-            # Construire la commande nmap
-            cmd = ['nmap', nmap_options, '-p', self.ports, '-oX', '-', self.target]
-            
-            # Exécuter nmap
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                self.add_error(f"Nmap error: {stderr.decode()}")
-                self.update_status("failed")
-                return self.results
-
-            # Parser les résultats XML de nmap
-            try:
-                from xml.etree import ElementTree
-                root = ElementTree.fromstring(stdout)
-                
-                # Extraire les informations importantes
-                scan_results = {
-                    "hosts": [],
-                    "summary": {
-                        "total_hosts": 0,
-                        "up_hosts": 0,
-                        "open_ports": 0
-                    }
+
+            # Les hôtes sont ajoutés au fur et à mesure de la sortie de nmap
+            scan_results = {
+                "hosts": [],
+                "summary": {
+                    "total_hosts": 0,
+                    "up_hosts": 0,
+                    "open_ports": 0
                 }
+            }
+            self.results["results"] = scan_results
 
-                for host in root.findall(".//host"):
-                    host_data = {
-                        "ip": host.find("address").get("addr"),
-                        "status": host.find("status").get("state"),
-                        "ports": []
-                    }
-
-                    for port in host.findall(".//port"):
-                        port_data = {
-                            "number": port.get("portid"),
-                            "protocol": port.get("protocol"),
-                            "state": port.find("state").get("state"),
-                            "service": {
-                                "name": port.find("service").get("name"),
-                                "product": port.find("service").get("product"),
-                                "version": port.find("service").get("version")
-                            }
-                        }
-                        host_data["ports"].append(port_data)
-                        if port_data["state"] == "open":
-                            scan_results["summary"]["open_ports"] += 1
-
-                    scan_results["hosts"].append(host_data)
-                    scan_results["summary"]["total_hosts"] += 1
-                    if host_data["status"] == "up":
-                        scan_results["summary"]["up_hosts"] += 1
-
-                self.results["results"] = scan_results
-                self.update_status("completed")
+            if self.incremental and self.baseline:
+                await self.scan_incremental(scan_results)
+            elif self.scan_type == 'fast':
+                await self.scan_fast(scan_results)
+            elif self.two_phase or self.incremental:
+                # Premier scan incrémental d'une cible : état complet en deux phases
+                await self.scan_two_phase(scan_results)
+            elif self.sharding:
+                hosts = await self.scan_sharded(
+                    self.nmap_arguments(),
+                    on_host=lambda host_data: self.add_host(scan_results, host_data)
+                )
+                # Résultat final identique quel que soit l'ordre de fin des blocs
+                scan_results["hosts"] = hosts
+                scan_results["summary"] = summarize_hosts(hosts)
+            else:
+                await self.run_nmap(
+                    self.target.split(), self.ports, self.nmap_arguments(),
+                    on_host=lambda host_data: self.add_host(scan_results, host_data)
+                )
 
-            except Exception as e:
-                self.add_error(f"Error parsing nmap results: {str(e)}")
-                self.update_status("failed")
+            self.update_status("completed")
 
+        except NmapError as e:
+            self.add_error(str(e))
+            self.update_status("failed")
         except Exception as e:
             self.add_error(f"Scan error: {str(e)}")
             self.update_status("failed")
 
-        return self.results 
\ No newline at end of file
+        return self.results
@@ -0,0 +1,270 @@
+import ipaddress
+import os
+import struct
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from .flow_table import flow_record
+
+# Nombre magique du fichier pcap -> (boutisme, résolution des horodatages)
+PCAP_MAGIC = {
+    0xa1b2c3d4: ('<', 1e-6),
+    0xd4c3b2a1: ('>', 1e-6),
+    0xa1b23c4d: ('<', 1e-9),
+    0x4d3cb2a1: ('>', 1e-9)
+}
+
+# Position de l'en-tête IP selon le type de lien (None : Ethernet, à décoder)
+LINKTYPE_IP_OFFSET = {
+    1: None,   # Ethernet
+    101: 0,    # IP brut
+    113: 16,   # Linux cooked capture (SLL)
+    228: 0     # IPv4 brut
+}
+
+GLOBAL_HEADER_SIZE = 24
+RECORD_HEADER_SIZE = 16
+
+# Classes au plus de l'histogramme temporel : au-delà, l'intervalle est
+# doublé (un horodatage aberrant ne peut pas faire allouer des millions de classes)
+MAX_TIME_BUCKETS = 4096
+
+# Un paquet décodé : champs à position fixe Ethernet/IPv4/TCP/UDP
+PACKET_DTYPE = np.dtype([
+    ('ts', 'f8'),
+    ('length', 'u4'),
+    ('is_ip', '?'),
+    ('proto', 'u1'),
+    ('src', 'u4'),
+    ('dst', 'u4'),
+    ('sport', 'u2'),
+    ('dport', 'u2'),
+    ('flags', 'u1')
+])
+
+def _byte(data: np.ndarray, index: np.ndarray) -> np.ndarray:
+    # Les lectures au-delà de la fin du fichier sont bornées, puis masquées par l'appelant
+    return data[np.minimum(index, len(data) - 1)]
+
+def _be16(data: np.ndarray, index: np.ndarray) -> np.ndarray:
+    return (_byte(data, index).astype(np.uint32) << 8) | _byte(data, index + 1)
+
+def _be32(data: np.ndarray, index: np.ndarray) -> np.ndarray:
+    return (_be16(data, index) << 16) | _be16(data, index + 2)
+
+def read_pcap(path: str) -> np.ndarray:
+    """Décode un fichier pcap en tableau structuré PACKET_DTYPE.
+
+    Le fichier est projeté en mémoire ; seul le parcours des en-têtes
+    d'enregistrement (longueurs variables) est séquentiel, les champs des
+    paquets sont extraits en bloc par indexation vectorisée.
+    """
+    # Un fichier vide ne peut pas être projeté en mémoire
+    if os.path.getsize(path) < GLOBAL_HEADER_SIZE:
+        return np.zeros(0, dtype=PACKET_DTYPE)
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+
+    magic = struct.unpack_from('<I', data, 0)[0]
+    if magic not in PCAP_MAGIC:
+        raise ValueError("Unsupported capture format (pcapng is not supported)")
+    endian, resolution = PCAP_MAGIC[magic]
+    linktype = struct.unpack_from(f'{endian}I', data, 20)[0] & 0x0fffffff
+    if linktype not in LINKTYPE_IP_OFFSET:
+        raise ValueError(f"Unsupported link type: {linktype}")
+
+    # Position de chaque enregistrement
+    offsets = []
+    position = GLOBAL_HEADER_SIZE
+    size = len(data)
+    length_format = struct.Struct(f'{endian}I')
+    while position + RECORD_HEADER_SIZE <= size:
+        offsets.append(position)
+        position += RECORD_HEADER_SIZE + length_format.unpack_from(data, position + 8)[0]
+    offsets = np.asarray(offsets, dtype=np.int64)
+
+    packets = np.zeros(len(offsets), dtype=PACKET_DTYPE)
+    if not len(offsets):
+        return packets
+
+    # En-têtes d'enregistrement : ts_sec, ts_frac, incl_len, orig_len
+    headers = data[offsets[:, None] + np.arange(RECORD_HEADER_SIZE)]
+    headers = np.ascontiguousarray(headers).view(f'{endian}u4').reshape(-1, 4)
+    packets['ts'] = headers[:, 0] + headers[:, 1] * resolution
+    packets['length'] = headers[:, 3]
+    captured = headers[:, 2].astype(np.int64)
+    start = offsets + RECORD_HEADER_SIZE
+
+    ip_offset = LINKTYPE_IP_OFFSET[linktype]
+    if ip_offset is None:
+        ethertype = _be16(data, start + 12)
+        vlan = ethertype == 0x8100
+        ethertype = np.where(vlan, _be16(data, start + 16), ethertype)
+        l3 = np.where(vlan, 18, 14)
+        is_ip = ethertype == 0x0800
+    else:
+        l3 = np.full(len(offsets), ip_offset)
+        is_ip = np.ones(len(offsets), dtype=bool)
+
+    is_ip &= captured >= l3 + 20
+    l3_index = np.where(is_ip, start + l3, 0)
+    is_ip &= (_byte(data, l3_index) >> 4) == 4
+    packets['is_ip'] = is_ip
+
+    ihl = (_byte(data, l3_index) & 0x0f).astype(np.int64) * 4
+    proto = np.where(is_ip, _byte(data, l3_index + 9), 0)
+    packets['proto'] = proto
+    packets['src'] = np.where(is_ip, _be32(data, l3_index + 12), 0)
+    packets['dst'] = np.where(is_ip, _be32(data, l3_index + 16), 0)
+
+    # Ports et drapeaux TCP, uniquement pour les premiers fragments complets
+    fragment = _be16(data, l3_index + 6) & 0x1fff
+    has_ports = is_ip & ((proto == 6) | (proto == 17)) & (fragment == 0) & (captured >= l3 + ihl + 4)
+    l4_index = np.where(has_ports, l3_index + ihl, 0)
+    packets['sport'] = np.where(has_ports, _be16(data, l4_index), 0)
+    packets['dport'] = np.where(has_ports, _be16(data, l4_index + 2), 0)
+    has_flags = has_ports & (proto == 6) & (captured >= l3 + ihl + 14)
+    packets['flags'] = np.where(has_flags, _byte(data, np.where(has_flags, l4_index + 13, 0)), 0)
+
+    return packets
+
+def _counts(values: np.ndarray) -> Dict[str, int]:
+    keys, counts = np.unique(values, return_counts=True)
+    return {str(int(key)): int(count) for key, count in zip(keys, counts)}
+
+def _ip(value) -> str:
+    return str(ipaddress.IPv4Address(int(value)))
+
+def compute_flows(packets: np.ndarray, limit: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+    """Agrège les paquets par 5-tuple (tri puis réductions par segment).
+
+    Retourne le nombre total de flux et les limit plus volumineux, au
+    format de FlowTable.to_list ; seuls ceux-ci sont convertis en objets
+    Python.
+    """
+    if not len(packets):
+        return 0, []
+
+    order = np.lexsort((packets['dport'], packets['sport'], packets['dst'], packets['src'], packets['proto']))
+    flows = packets[order]
+    changed = np.zeros(len(flows), dtype=bool)
+    changed[0] = True
+    for field in ('proto', 'src', 'sport', 'dst', 'dport'):
+        changed[1:] |= flows[field][1:] != flows[field][:-1]
+    starts = np.flatnonzero(changed)
+
+    byte_counts = np.add.reduceat(flows['length'].astype(np.int64), starts)
+    selected = np.argsort(-byte_counts, kind='stable')[:limit]
+    first_seen = np.minimum.reduceat(flows['ts'], starts)[selected]
+    last_seen = np.maximum.reduceat(flows['ts'], starts)[selected]
+    packet_counts = np.diff(np.append(starts, len(flows)))[selected]
+    flags = np.bitwise_or.reduceat(flows['flags'], starts)[selected]
+    keys = flows[starts[selected]]
+
+    records = []
+    for index, key in enumerate(keys):
+        proto = int(key['proto'])
+        with_ports = proto in (6, 17)
+        records.append(flow_record(
+            (
+                str(proto),
+                _ip(key['src']),
+                str(int(key['sport'])) if with_ports else "",
+                _ip(key['dst']),
+                str(int(key['dport'])) if with_ports else ""
+            ),
+            [
+                float(first_seen[index]),
+                float(last_seen[index]),
+                int(packet_counts[index]),
+                int(byte_counts[selected[index]]),
+                int(flags[index])
+            ]
+        ))
+    return len(starts), records
+
+def compute_statistics(packets: np.ndarray, target: Optional[str] = None,
+                       interval: float = 1.0, top: int = 10, max_flows: Optional[int] = None) -> Dict[str, Any]:
+    """Statistiques de trafic vectorisées sur un tableau PACKET_DTYPE.
+
+    Le résumé reprend la forme de l'analyse tshark (protocoles, ports source
+    et destination) et ajoute les principaux émetteurs, le volume par
+    intervalle de temps et les temps inter-arrivées.
+    """
+    packets = packets[packets['is_ip']]
+
+    if target:
+        try:
+            network = ipaddress.ip_network(target, strict=False)
+            if network.version == 4:
+                first = int(network.network_address)
+                last = int(network.broadcast_address)
+                in_src = (packets['src'] >= first) & (packets['src'] <= last)
+                in_dst = (packets['dst'] >= first) & (packets['dst'] <= last)
+                packets = packets[in_src | in_dst]
+        except ValueError:
+            pass
+
+    with_ports = packets[(packets['proto'] == 6) | (packets['proto'] == 17)]
+    lengths = packets['length'].astype(np.float64)
+
+    summary = {
+        "total_packets": int(len(packets)),
+        "total_bytes": int(lengths.sum()),
+        "protocols": _counts(packets['proto']),
+        "ports": {
+            "source": _counts(with_ports['sport']),
+            "destination": _counts(with_ports['dport'])
+        }
+    }
+
+    # Principaux émetteurs, par volume
+    talkers = []
+    if len(packets):
+        addresses, inverse, packet_counts = np.unique(packets['src'], return_inverse=True, return_counts=True)
+        byte_counts = np.bincount(inverse, weights=lengths)
+        for index in np.argsort(-byte_counts, kind='stable')[:top]:
+            talkers.append({
+                "ip": _ip(addresses[index]),
+                "packets": int(packet_counts[index]),
+                "bytes": int(byte_counts[index])
+            })
+
+    # Volume par intervalle et temps inter-arrivées
+    timestamps = np.sort(packets['ts'])
+    bytes_over_time = []
+    inter_arrival = {}
+    if len(timestamps):
+        while (timestamps[-1] - timestamps[0]) // interval >= MAX_TIME_BUCKETS:
+            interval *= 2
+        buckets = ((packets['ts'] - timestamps[0]) // interval).astype(np.int64)
+        bytes_over_time = [int(value) for value in np.bincount(buckets, weights=lengths)]
+    if len(timestamps) > 1:
+        gaps = np.diff(timestamps)
+        inter_arrival = {
+            "mean": float(gaps.mean()),
+            "std": float(gaps.std()),
+            "min": float(gaps.min()),
+            "max": float(gaps.max()),
+            "p50": float(np.percentile(gaps, 50)),
+            "p99": float(np.percentile(gaps, 99))
+        }
+
+    summary["total_flows"], flows = compute_flows(packets, max_flows)
+
+    return {
+        "summary": summary,
+        "flows": flows,
+        "top_talkers": talkers,
+        "bytes_over_time": {
+            "start": float(timestamps[0]) if len(timestamps) else None,
+            "interval": interval,
+            "bytes": bytes_over_time
+        },
+        "inter_arrival": inter_arrival
+    }
+
+def analyze_pcap(path: str, target: Optional[str] = None, interval: float = 1.0,
+                 top: int = 10, max_flows: Optional[int] = None) -> Dict[str, Any]:
+    """Lit un fichier pcap local et retourne ses statistiques de trafic"""
+    return compute_statistics(read_pcap(path), target, interval, top, max_flows)
@@ -0,0 +1,163 @@
+import asyncio
+import ipaddress
+import itertools
+import re
+import time
+from typing import Dict, Any, Iterable, List, Optional
+
+# Plage sur le dernier octet, ex: 192.168.1.10-200
+OCTET_RANGE = re.compile(r"^(\d+\.\d+\.\d+\.)(\d+)-(\d+)$")
+
+def expand_hosts(target: str) -> List[str]:
+    """Liste des hôtes d'une cible (CIDR, plage sur le dernier octet, noms)"""
+    hosts = []
+    for token in re.split(r"[\s,]+", target.strip()):
+        if not token:
+            continue
+        range_match = OCTET_RANGE.match(token)
+        if range_match:
+            prefix, first, last = range_match.group(1), int(range_match.group(2)), int(range_match.group(3))
+            hosts.extend(f"{prefix}{octet}" for octet in range(first, last + 1))
+            continue
+        if "/" in token:
+            network = ipaddress.ip_network(token, strict=False)
+            hosts.extend(str(host) for host in (network.hosts() if network.num_addresses > 2 else network))
+            continue
+        hosts.append(token)
+    return hosts
+
+def count_hosts(target: str) -> int:
+    """Nombre d'hôtes d'une cible, sans les énumérer"""
+    count = 0
+    for token in re.split(r"[\s,]+", target.strip()):
+        if not token:
+            continue
+        range_match = OCTET_RANGE.match(token)
+        if range_match:
+            count += max(int(range_match.group(3)) - int(range_match.group(2)) + 1, 0)
+        elif "/" in token:
+            try:
+                network = ipaddress.ip_network(token, strict=False)
+            except ValueError:
+                count += 1
+                continue
+            count += network.num_addresses - 2 if network.num_addresses > 2 else network.num_addresses
+        else:
+            count += 1
+    return count
+
+def parse_ports(ports: str) -> List[int]:
+    """Ports d'une spécification numérique nmap (ex: 22,80,1000-2000)"""
+    spec = "1-65535" if ports.strip() == "-" else ports.replace(" ", "")
+    if not re.fullmatch(r"[\d,\-]+", spec):
+        raise ValueError(f"Unsupported port specification: {ports}")
+
+    numbers = set()
+    for part in spec.split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            numbers.update(range(int(first or 1), int(last or 65535) + 1))
+        else:
+            numbers.add(int(part))
+    return sorted(numbers)
+
+class HostState:
+    """Estimation du RTT (RFC 6298) et limitation de débit pour un hôte"""
+
+    def __init__(self, timeout: float, min_timeout: float, max_timeout: float, rate: Optional[float]):
+        self.srtt = None
+        self.rttvar = None
+        self.initial_timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self.up = False
+
+    @property
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return self.initial_timeout
+        return min(max(self.srtt + 4 * self.rttvar, self.min_timeout), self.max_timeout)
+
+    def observe(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    async def wait_turn(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(self.next_slot, now)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class TcpConnectScanner:
+    """Découverte rapide des ports ouverts par connexions TCP asyncio.
+
+    Le nombre de connexions simultanées est borné par concurrency, le délai
+    d'attente s'adapte au RTT mesuré de chaque hôte et host_rate limite le
+    nombre de tentatives par seconde et par hôte.
+    """
+
+    def __init__(self, concurrency: int = 500, timeout: float = 1.0, min_timeout: float = 0.1,
+                 max_timeout: float = 3.0, host_rate: Optional[float] = None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.host_rate = host_rate
+        self.probes = 0
+
+    async def probe(self, host: str, port: int, state: HostState) -> Optional[bool]:
+        """True si le port est ouvert, False s'il est fermé, None sans réponse"""
+        await state.wait_turn()
+        started = time.monotonic()
+        self.probes += 1
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=state.timeout)
+        except ConnectionRefusedError:
+            state.observe(time.monotonic() - started)
+            return False
+        except (asyncio.TimeoutError, OSError):
+            return None
+
+        state.observe(time.monotonic() - started)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+        return True
+
+    async def scan(self, hosts: Iterable[str], ports: Iterable[int]) -> Dict[str, Dict[str, Any]]:
+        """Retourne, par hôte ayant répondu, son état et ses ports ouverts"""
+        hosts = list(hosts)
+        states = {
+            host: HostState(self.timeout, self.min_timeout, self.max_timeout, self.host_rate)
+            for host in hosts
+        }
+        open_ports = {host: [] for host in hosts}
+        # Les ports sont entrelacés entre hôtes pour répartir la charge
+        probes = ((host, port) for port, host in itertools.product(ports, hosts))
+
+        async def worker() -> None:
+            for host, port in probes:
+                result = await self.probe(host, port, states[host])
+                if result is not None:
+                    states[host].up = True
+                if result:
+                    open_ports[host].append(port)
+
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+
+        return {
+            host: {"status": "up", "open_ports": sorted(open_ports[host])}
+            for host in hosts if states[host].up
+        }
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+def default_memory_budget() -> int:
+    """Trois quarts de la mémoire physique, en Mo"""
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 0.75) >> 20
+    except (ValueError, OSError, AttributeError):
+        return 4096
+
+# Outils lancés simultanément par l'ensemble des workers
+SCAN_MAX_NMAP = int(os.getenv("SCAN_MAX_NMAP", str(os.cpu_count() or 1)))
+SCAN_MAX_ZAP = int(os.getenv("SCAN_MAX_ZAP", "2"))
+SCAN_MAX_TSHARK = int(os.getenv("SCAN_MAX_TSHARK", "2"))
+# Budget partagé par tous les outils d'une machine : cœurs et mémoire (Mo)
+SCAN_CPU_BUDGET = float(os.getenv("SCAN_CPU_BUDGET", str(os.cpu_count() or 1)))
+SCAN_MEMORY_BUDGET_MB = float(os.getenv("SCAN_MEMORY_BUDGET_MB", str(default_memory_budget())))
+
+class Reservation:
+    """Demande de ressources en attente"""
+
+    def __init__(self, needs: Dict[str, float], locks: List[str], priority: int, sequence: int):
+        self.needs = needs
+        self.locks = locks
+        self.priority = priority
+        self.sequence = sequence
+        self.future = asyncio.get_running_loop().create_future()
+
+    @property
+    def order(self):
+        return -self.priority, self.sequence
+
+class ResourceGovernor:
+    """Limite les processus de scan lancés par les workers.
+
+    Chaque scanner réserve avant de démarrer des emplacements de son outil
+    (nmap, zap, tshark), sa part du budget CPU et mémoire et, pour une
+    capture, le verrou de son interface. Les demandes sont servies par
+    priorité puis par ordre d'arrivée ; une demande plus récente ne passe
+    devant que si elle ne consomme rien de ce qu'attend une demande plus
+    ancienne, pour qu'un gros scan ZAP ne soit pas affamé par des nmap.
+
+    Cette file est propre au processus. Avec shared (réservations en base,
+    voir app.resource_leases), une demande accordée ici attend en plus que
+    les autres workers lui laissent la place : les emplacements d'outils
+    sont alors comptés sur tous les workers, le budget CPU et mémoire et
+    les interfaces sur ceux de la même machine.
+    """
+
+    def __init__(self, capacity: Optional[Dict[str, float]] = None, shared: Optional[Any] = None):
+        self.capacity = capacity or {
+            "nmap": SCAN_MAX_NMAP,
+            "zap": SCAN_MAX_ZAP,
+            "tshark": SCAN_MAX_TSHARK,
+            "cpu": SCAN_CPU_BUDGET,
+            "memory": SCAN_MEMORY_BUDGET_MB
+        }
+        self.used = {resource: 0.0 for resource in self.capacity}
+        self.held_locks = set()
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.shared = shared
+        self.shared_waiting = 0
+
+    @property
+    def saturated(self) -> bool:
+        """Vrai si des scanners attendent déjà des ressources"""
+        return bool(self.waiters) or self.shared_waiting > 0
+
+    def clamp(self, needs: Dict[str, float]) -> Dict[str, float]:
+        # Une demande supérieure au budget s'exécute seule plutôt que jamais
+        return {
+            resource: min(amount, self.capacity[resource])
+            for resource, amount in needs.items()
+            if resource in self.capacity and amount > 0
+        }
+
+    def dispatch(self) -> None:
+        """Accorde les demandes en attente qui peuvent l'être"""
+        # Demandes annulées pendant l'attente
+        self.waiters = [waiter for waiter in self.waiters if not waiter.future.done()]
+        available = {resource: self.capacity[resource] - self.used[resource] for resource in self.capacity}
+        blocked_locks = set(self.held_locks)
+        for waiter in sorted(self.waiters, key=lambda waiter: waiter.order):
+            waiting_lock = blocked_locks.intersection(waiter.locks)
+            blocked_locks.update(waiter.locks)
+            if waiting_lock:
+                # En attente d'un verrou : ne retient pas le budget des suivantes
+                continue
+            if all(available[resource] >= amount for resource, amount in waiter.needs.items()):
+                self.waiters.remove(waiter)
+                for resource, amount in waiter.needs.items():
+                    self.used[resource] += amount
+                self.held_locks.update(waiter.locks)
+                waiter.future.set_result(None)
+            # Accordée ou non, la demande garde sa part face aux suivantes
+            for resource, amount in waiter.needs.items():
+                available[resource] -= amount
+
+    def release(self, needs: Dict[str, float], locks: Iterable[str]) -> None:
+        for resource, amount in needs.items():
+            self.used[resource] -= amount
+        self.held_locks.difference_update(locks)
+        self.dispatch()
+
+    @asynccontextmanager
+    async def reserve(self, needs: Dict[str, float], locks: Iterable[str] = (), priority: int = 0,
+                      on_wait: Optional[Callable[[Dict[str, float], List[str]], None]] = None):
+        """Attend les ressources demandées et les rend à la sortie.
+
+        Retourne les quantités accordées (bornées par la capacité) ;
+        on_wait est appelé si la demande ne peut pas être servie tout de suite.
+        """
+        waiter = Reservation(self.clamp(needs), list(locks), priority, next(self.sequence))
+        self.waiters.append(waiter)
+        self.dispatch()
+        waited = not waiter.future.done()
+        if waited:
+            if on_wait:
+                on_wait(waiter.needs, waiter.locks)
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.cancelled():
+                    if waiter in self.waiters:
+                        self.waiters.remove(waiter)
+                    self.dispatch()
+                else:
+                    # Accordée au moment de l'annulation : rendre aussitôt
+                    self.release(waiter.needs, waiter.locks)
+                raise
+        lease_id = None
+        try:
+            if self.shared is not None:
+                lease_id = await self.acquire_shared(waiter, None if waited else on_wait)
+            yield waiter.needs
+        finally:
+            if lease_id is not None:
+                await self.shared.release(lease_id)
+            self.release(waiter.needs, waiter.locks)
+
+    async def acquire_shared(self, waiter: Reservation,
+                             on_wait: Optional[Callable[[Dict[str, float], List[str]], None]]) -> int:
+        """Réservation commune aux workers, une fois la demande accordée dans ce processus"""
+        lease_id = await self.shared.try_acquire(waiter.needs, waiter.locks)
+        if lease_id is not None:
+            return lease_id
+        if on_wait:
+            on_wait(waiter.needs, waiter.locks)
+        self.shared_waiting += 1
+        try:
+            return await self.shared.acquire(waiter.needs, waiter.locks)
+        finally:
+            self.shared_waiting -= 1
+
+    async def renew(self) -> None:
+        """Prolonge les réservations communes des scanners en cours"""
+        if self.shared is not None:
+            await self.shared.renew()
+
+_governor = None
+
+def get_resource_governor() -> ResourceGovernor:
+    """Gouverneur partagé par les scans du processus"""
+    global _governor
+    if _governor is None:
+        _governor = ResourceGovernor()
+    return _governor
@@ -0,0 +1,98 @@
+import ipaddress
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .port_prescan import parse_ports
+
+def host_sort_key(host_data: Dict[str, Any]):
+    """Clé de tri stable : adresses IP dans l'ordre numérique, puis noms"""
+    try:
+        address = ipaddress.ip_address(host_data["ip"])
+        return (0, address.version, int(address), "")
+    except ValueError:
+        return (1, 0, 0, host_data["ip"])
+
+def open_services(host_data: Dict[str, Any], ports: Optional[Set[int]] = None,
+                  protocol: Optional[str] = None) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    """Ports ouverts d'un hôte, indexés par (protocole, port), restreints à ports et protocol si donnés"""
+    return {
+        (port["protocol"], int(port["number"])): port
+        for port in host_data.get("ports", [])
+        if port["state"] == "open"
+        and (ports is None or int(port["number"]) in ports)
+        and (protocol is None or port["protocol"] == protocol)
+    }
+
+def service_signature(port: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    service = port.get("service") or {}
+    return service.get("name"), service.get("product"), service.get("version")
+
+def port_entry(ip: str, key: Tuple[str, int], port: Dict[str, Any]) -> Dict[str, Any]:
+    protocol, number = key
+    return {"ip": ip, "protocol": protocol, "port": number, "service": port.get("service")}
+
+def diff_hosts(baseline: Iterable[Dict[str, Any]], current: Iterable[Dict[str, Any]],
+               ports: Optional[Set[int]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Écart entre deux états complets : hôtes et services apparus, fermés ou modifiés.
+
+    Seuls les ports ouverts comptent ; ports limite la comparaison à la
+    plage scannée, pour qu'un port hors plage ne passe pas pour fermé.
+    """
+    before = {host["ip"]: open_services(host, ports) for host in baseline}
+    after = {host["ip"]: open_services(host, ports) for host in current}
+    delta = {"new_hosts": [], "gone_hosts": [], "opened": [], "closed": [], "changed": []}
+
+    for ip in sorted(set(before) | set(after), key=lambda ip: host_sort_key({"ip": ip})):
+        old, new = before.get(ip, {}), after.get(ip, {})
+        if new and not old:
+            delta["new_hosts"].append(ip)
+        elif old and not new:
+            delta["gone_hosts"].append(ip)
+        for key in sorted(set(new) - set(old)):
+            delta["opened"].append(port_entry(ip, key, new[key]))
+        for key in sorted(set(old) - set(new)):
+            delta["closed"].append(port_entry(ip, key, old[key]))
+        for key in sorted(set(old) & set(new)):
+            if service_signature(old[key]) != service_signature(new[key]):
+                delta["changed"].append({
+                    **port_entry(ip, key, new[key]),
+                    "previous_service": old[key].get("service")
+                })
+    return delta
+
+def merge_rescanned(previous: Optional[Dict[str, Any]], host_data: Dict[str, Any],
+                    ports: Optional[Set[int]]) -> Dict[str, Any]:
+    """Hôte sondé à nouveau : seuls ses ports TCP de la plage ports sont remplacés.
+
+    Les ports UDP ou hors plage restent ceux de previous ; sans plage connue
+    (rapport antérieur), l'hôte est remplacé en entier.
+    """
+    if previous is None or ports is None:
+        return host_data
+    kept = [port for port in previous.get("ports", [])
+            if port["protocol"] != "tcp" or int(port["number"]) not in ports]
+    merged = sorted(kept + host_data.get("ports", []), key=lambda port: (port["protocol"], int(port["number"])))
+    return {**host_data, "ports": merged}
+
+def apply_delta(hosts: List[Dict[str, Any]], results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """État complet après un scan incrémental, à partir de l'état de sa référence.
+
+    Les hôtes disparus sont retirés, les ports re-scannés des hôtes sondés à
+    nouveau remplacent ceux de la référence (voir merge_rescanned) ; les
+    autres hôtes sont repris tels quels.
+    """
+    ports = set(parse_ports(results["port_range"])) if results.get("port_range") else None
+    merged = {host["ip"]: host for host in hosts}
+    for ip in results.get("delta", {}).get("gone_hosts", []):
+        merged.pop(ip, None)
+    for host in results.get("hosts", []):
+        merged[host["ip"]] = merge_rescanned(merged.get(host["ip"]), host, ports)
+    return sorted(merged.values(), key=host_sort_key)
+
+def summarize_hosts(hosts: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    summary = {"total_hosts": 0, "up_hosts": 0, "open_ports": 0}
+    for host in hosts:
+        summary["total_hosts"] += 1
+        if host["status"] == "up":
+            summary["up_hosts"] += 1
+        summary["open_ports"] += sum(1 for port in host["ports"] if port["state"] == "open")
+    return summary
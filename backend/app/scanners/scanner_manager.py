@@ -1,18 +1,60 @@
 import asyncio
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional
 import json
 from datetime import datetime
 import os
+import time
 
 from .network_scanner import NetworkScanner
 from .vulnerability_scanner import VulnerabilityScanner
 from .network_analyzer import NetworkAnalyzer
+from .resource_governor import ResourceGovernor
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Délai d'un scanner ou d'une tâche écoulé"""
+
+async def wait_with_deadline(awaitable, timeout: float) -> Any:
+    """Comme asyncio.wait_for, mais seule l'expiration du délai lève DeadlineExceeded.
+
+    Un TimeoutError levé par l'attente elle-même (requête HTTP, lecture d'un
+    sous-processus) est transmis tel quel, sans être pris pour le délai.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        task.cancel()
+        await asyncio.wait({task})
+        raise
+    if not done:
+        task.cancel()
+        await asyncio.wait({task})
+        raise DeadlineExceeded(f"Timed out after {timeout} s")
+    return task.result()
 
 class ScannerManager:
+    # Scanners lancés pour chaque type de scan exposé par l'API
+    SCAN_PROFILES = {
+        "full": [
+            ("network", {"scan_type": "full"}),
+            ("vulnerability", {"scan_type": "full"}),
+            ("network_analysis", {"duration": 300})
+        ],
+        "network": [("network", {"scan_type": "full"})],
+        "fast": [("network", {"scan_type": "fast"})],
+        "vulnerability": [("vulnerability", {"scan_type": "full"})],
+        "network_analysis": [("network_analysis", {"duration": 300})]
+    }
+
     def __init__(self, target: str, options: Dict[str, Any] = None):
         self.target = target
         self.options = options or {}
         self.scanners = []
+        # Sans gouverneur (usage hors worker), les scanners démarrent aussitôt
+        self.governor = None
+        self.priority = 0
+        # Résultats déjà obtenus par une exécution interrompue, par scanner
+        self.finished = {}
         self.results = {
             "target": target,
             "timestamp": datetime.utcnow().isoformat(),
@@ -33,27 +75,99 @@ class ScannerManager:
         else:
             raise ValueError(f"Unknown scanner type: {scanner_type}")
 
-    async def run_all(self) -> Dict[str, Any]:
-        """Exécute tous les scanners en parallèle"""
+    def set_event_sink(self, sink: Callable[[str, str, Dict[str, Any]], None]) -> None:
+        """Transmet les événements en direct de tous les scanners à sink"""
+        for scanner in self.scanners:
+            scanner.set_event_sink(sink)
+
+    def set_governor(self, governor: ResourceGovernor, priority: int = 0) -> None:
+        """Fait passer chaque scanner par governor avant de lancer ses processus"""
+        self.governor = governor
+        self.priority = priority
+
+    def set_checkpoints(self, checkpoints: Dict[str, Dict[str, Any]],
+                        sink: Callable[[str, str, Any], None]) -> None:
+        """Restaure les points de reprise de chaque scanner et transmet les nouveaux à sink"""
+        for scanner in self.scanners:
+            scanner.set_checkpoints(checkpoints.get(scanner.__class__.__name__, {}), sink)
+
+    def resume(self, finished: Dict[str, Dict[str, Any]]) -> None:
+        """Reprend les résultats des scanners terminés avant l'interruption, sans les relancer"""
+        self.finished = dict(finished)
+
+    async def run_scanner(self, scanner) -> tuple:
+        """Réserve les ressources du scanner auprès du gouverneur, puis l'exécute"""
+        if self.governor is None:
+            return await self.execute_scanner(scanner)
+
+        def on_wait(needs: Dict[str, float], locks: List[str]) -> None:
+            scanner.update_status("queued")
+            scanner.emit_event("waiting", {"resources": needs, "locks": locks})
+
+        # L'attente des ressources ne compte pas dans le délai du scanner
+        waited = time.monotonic()
+        async with self.governor.reserve(scanner.resources(), scanner.exclusive_locks(),
+                                         self.priority, on_wait) as granted:
+            scanner.grant(granted)
+            scanner.emit_event("resources", {"granted": granted, "waited": round(time.monotonic() - waited, 3)})
+            return await self.execute_scanner(scanner)
+
+    @staticmethod
+    async def execute_scanner(scanner) -> tuple:
+        """Exécute un scanner dans son délai ; une exception devient un résultat en échec"""
+        try:
+            return scanner, await wait_with_deadline(scanner.scan(), scanner.timeout)
+        except DeadlineExceeded:
+            # Les résultats partiels du scanner sont conservés
+            scanner.add_error(f"Scanner timed out after {scanner.timeout} s")
+            scanner.update_status("failed")
+            return scanner, scanner.results
+        except Exception as e:
+            return scanner, {"status": "failed", "error": str(e) or repr(e)}
+
+    async def run_all(self, on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Exécute tous les scanners en parallèle.
+
+        on_result(nom du scanner, résultat) est appelé dès qu'un scanner se
+        termine, sans attendre les autres.
+        """
+        pending = [scanner for scanner in self.scanners if scanner.__class__.__name__ not in self.finished]
+        self.results["results"].update(self.finished)
+        tasks = [asyncio.ensure_future(self.run_scanner(scanner)) for scanner in pending]
         try:
             self.results["status"] = "running"
             
-            # Exécuter tous les scanners en parallèle
-            tasks = [scanner.scan() for scanner in self.scanners]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Traiter les résultats
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    self.results["results"][self.scanners[i].__class__.__name__] = {
-                        "status": "failed",
-                        "error": str(result)
-                    }
-                else:
-                    self.results["results"][self.scanners[i].__class__.__name__] = result
+            # Exécuter tous les scanners en parallèle, traiter les résultats dans l'ordre d'arrivée
+            for next_result in asyncio.as_completed(tasks):
+                scanner, result = await next_result
+                name = scanner.__class__.__name__
+                self.results["results"][name] = result
+                if on_result:
+                    on_result(name, result)
             
             self.results["status"] = "completed"
             
+        except asyncio.CancelledError:
+            # Arrêt demandé ou délai de la tâche dépassé : arrêter les scanners
+            # (processus, fichiers temporaires) et garder leurs résultats partiels
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for scanner, task in zip(pending, tasks):
+                name = scanner.__class__.__name__
+                if name in self.results["results"]:
+                    continue
+                if task.cancelled():
+                    scanner.update_status("cancelled")
+                    result = scanner.results
+                else:
+                    _, result = task.result()
+                self.results["results"][name] = result
+                if on_result:
+                    on_result(name, result)
+            self.results["status"] = "cancelled"
+            raise
+
         except Exception as e:
             self.results["status"] = "failed"
             self.results["error"] = str(e)
@@ -69,6 +183,17 @@ class ScannerManager:
         """Convertit les résultats en chaîne JSON"""
         return json.dumps(self.results, indent=2)
 
+    @staticmethod
+    def from_scan_type(target: str, scan_type: str, options: Dict[str, Any] = None) -> 'ScannerManager':
+        """Crée un gestionnaire configuré selon un type de scan de l'API"""
+        if scan_type not in ScannerManager.SCAN_PROFILES:
+            raise ValueError(f"Unknown scan type: {scan_type}")
+
+        manager = ScannerManager(target, options)
+        for scanner_type, scanner_options in ScannerManager.SCAN_PROFILES[scan_type]:
+            manager.add_scanner(scanner_type, scanner_options)
+        return manager
+
     @staticmethod
     def create_default_scan(target: str) -> 'ScannerManager':
         """Crée un scan par défaut avec tous les scanners"""
@@ -90,4 +215,20 @@ class ScannerManager:
             "duration": 300  # 5 minutes
         })
         
-        return manager 
\ No newline at end of file
+        return manager
+
+def summarize_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Résumé d'un rapport pour les listes : statut et compteurs de chaque scanner.
+
+    Seules les valeurs simples du résumé de chaque scanner sont gardées
+    (et la répartition des alertes par risque) : le résumé reste petit quelle
+    que soit la taille des résultats.
+    """
+    scanners = {}
+    for name, result in (results.get("results") or {}).items():
+        summary = ((result or {}).get("results") or {}).get("summary") or {}
+        counts = {key: value for key, value in summary.items() if isinstance(value, (int, float, str))}
+        if isinstance(summary.get("risk_levels"), dict):
+            counts["risk_levels"] = summary["risk_levels"]
+        scanners[name] = {"status": (result or {}).get("status"), **counts}
+    return {"status": results.get("status"), "scanners": scanners}
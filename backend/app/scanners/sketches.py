@@ -0,0 +1,265 @@
+import heapq
+import math
+from typing import Dict, Any, Hashable, List, Optional
+
+MASK64 = (1 << 64) - 1
+
+def hash64(key: Hashable, seed: int = 0) -> int:
+    """Hachage 64 bits bien réparti (finaliseur splitmix64 sur hash())"""
+    value = (hash(key) + seed * 0x9e3779b97f4a7c15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94d049bb133111eb) & MASK64
+    return value ^ (value >> 31)
+
+class CountMinSketch:
+    """Estimation de fréquences en mémoire fixe (width x depth compteurs).
+
+    L'estimation n'est jamais inférieure à la valeur exacte et la dépasse
+    d'au plus e/width * N (N : total ajouté) avec une probabilité d'au
+    moins 1 - exp(-depth).
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def indexes(self, key: Hashable) -> List[int]:
+        # Double hachage : une seule fonction de hachage pour toutes les lignes
+        value = hash64(key)
+        low, high = value & 0xffffffff, value >> 32
+        return [(low + row * high) % self.width for row in range(self.depth)]
+
+    def add(self, key: Hashable, count: int = 1) -> None:
+        self.total += count
+        for row, index in zip(self.rows, self.indexes(key)):
+            row[index] += count
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[index] for row, index in zip(self.rows, self.indexes(key)))
+
+    def error_bound(self) -> Dict[str, float]:
+        return {
+            "max_overestimate": math.e / self.width * self.total,
+            "confidence": 1 - math.exp(-self.depth)
+        }
+
+class SpaceSaving:
+    """Éléments les plus fréquents (top-K) avec au plus capacity compteurs.
+
+    Tout élément de fréquence supérieure à N / capacity est présent ; le
+    compte d'un élément est surestimé d'au plus son champ error, lui-même
+    borné par N / capacity.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # Tas des minimums, mis à jour paresseusement (les comptes ne font que croître)
+        self.heap = []
+
+    def add(self, key: Hashable, count: int = 1) -> None:
+        self.total += count
+        if key in self.counts:
+            self.counts[key] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+            heapq.heappush(self.heap, (count, key))
+            return
+
+        # Remplacer l'élément de plus petit compte
+        while True:
+            minimum, victim = heapq.heappop(self.heap)
+            if self.counts[victim] == minimum:
+                break
+            heapq.heappush(self.heap, (self.counts[victim], victim))
+        del self.counts[victim]
+        del self.errors[victim]
+        self.counts[key] = minimum + count
+        self.errors[key] = minimum
+        heapq.heappush(self.heap, (minimum + count, key))
+
+    def top(self, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        ordered = sorted(self.counts.items(), key=lambda item: (-item[1], str(item[0])))
+        return [
+            {"key": key, "count": count, "error": self.errors[key]}
+            for key, count in ordered[:k]
+        ]
+
+    def error_bound(self) -> Dict[str, float]:
+        return {"max_overestimate": self.total / self.capacity}
+
+class HyperLogLog:
+    """Estimation du nombre d'éléments distincts sur 2^precision registres.
+
+    Erreur type relative : 1.04 / sqrt(2^precision), soit ~1.6 % pour la
+    précision par défaut (4096 registres d'un octet).
+    """
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, key: Hashable) -> None:
+        value = hash64(key)
+        index = value >> (64 - self.precision)
+        remaining = (value << self.precision) & MASK64
+        # Position du premier bit à 1 dans les bits restants
+        rank = 64 - remaining.bit_length() + 1 if remaining else 64 - self.precision + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Correction pour les petites cardinalités (comptage linéaire)
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def error_bound(self) -> Dict[str, float]:
+        return {"relative_standard_error": 1.04 / math.sqrt(self.size)}
+
+class TimeHistogram:
+    """Histogramme temporel à nombre de classes fixe.
+
+    Lorsque la capture dépasse la plage couverte, les classes voisines sont
+    fusionnées deux à deux et leur largeur double : la mémoire reste
+    constante quelle que soit la durée.
+    """
+
+    def __init__(self, interval: float = 1.0, buckets: int = 512):
+        self.interval = interval
+        self.buckets = buckets
+        self.start = None
+        self.packets = [0] * buckets
+        self.bytes = [0] * buckets
+
+    def used(self) -> int:
+        """Nombre de classes jusqu'à la dernière non vide"""
+        return max((i + 1 for i, value in enumerate(self.packets) if value), default=0)
+
+    def merge(self) -> None:
+        """Fusionne les classes deux à deux : même origine, largeur doublée"""
+        self.packets = [self.packets[i] + self.packets[i + 1] for i in range(0, self.buckets, 2)] + [0] * (self.buckets // 2)
+        self.bytes = [self.bytes[i] + self.bytes[i + 1] for i in range(0, self.buckets, 2)] + [0] * (self.buckets // 2)
+        self.interval *= 2
+
+    def add(self, timestamp: float, length: int) -> None:
+        if self.start is None:
+            self.start = timestamp
+        if timestamp < self.start:
+            # Paquet antérieur à l'origine (fichiers du tampon circulaire analysés
+            # en parallèle) : l'origine recule d'un nombre entier de classes
+            shift = math.ceil((self.start - timestamp) / self.interval)
+            while shift + self.used() > self.buckets:
+                self.merge()
+                shift = math.ceil((self.start - timestamp) / self.interval)
+            self.start -= shift * self.interval
+            self.packets = ([0] * shift + self.packets)[:self.buckets]
+            self.bytes = ([0] * shift + self.bytes)[:self.buckets]
+        index = max(int((timestamp - self.start) // self.interval), 0)
+        while index >= self.buckets:
+            self.merge()
+            index = int((timestamp - self.start) // self.interval)
+        self.packets[index] += 1
+        self.bytes[index] += length
+
+    def to_dict(self) -> Dict[str, Any]:
+        used = self.used()
+        return {
+            "start": self.start,
+            "interval": self.interval,
+            "packets": self.packets[:used],
+            "bytes": self.bytes[:used]
+        }
+
+class TrafficSketch:
+    """Statistiques de trafic en mémoire constante pour les longues captures.
+
+    Remplace les dictionnaires exacts (ports, émetteurs) par des résumés de
+    taille fixe ; les bornes d'erreur sont publiées avec les résultats.
+    """
+
+    def __init__(self, top_k: int = 100, interval: float = 1.0):
+        self.top_k = top_k
+        self.total_packets = 0
+        self.total_bytes = 0
+        self.protocols = {}  # au plus 256 valeurs
+        self.source_ports = SpaceSaving(top_k)
+        self.destination_ports = SpaceSaving(top_k)
+        self.talkers = SpaceSaving(top_k)  # par octets émis
+        self.talker_packets = CountMinSketch()
+        self.flows = SpaceSaving(top_k)  # par octets
+        self.unique_sources = HyperLogLog()
+        self.unique_ports = HyperLogLog()
+        self.timeline = TimeHistogram(interval)
+
+    def add(self, timestamp: float, protocol: str, src: str, sport: str,
+            dst: str, dport: str, length: int) -> None:
+        self.total_packets += 1
+        self.total_bytes += length
+        if protocol:
+            self.protocols[protocol] = self.protocols.get(protocol, 0) + 1
+        if sport:
+            self.source_ports.add(sport)
+            self.unique_ports.add(sport)
+        if dport:
+            self.destination_ports.add(dport)
+            self.unique_ports.add(dport)
+        if src:
+            self.talkers.add(src, length)
+            self.talker_packets.add(src)
+            self.unique_sources.add(src)
+        self.flows.add((protocol, src, sport, dst, dport), length)
+        self.timeline.add(timestamp, length)
+
+    def to_dict(self, max_flows: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "summary": {
+                "total_packets": self.total_packets,
+                "total_bytes": self.total_bytes,
+                "protocols": self.protocols,
+                "ports": {
+                    "source": {item["key"]: item["count"] for item in self.source_ports.top()},
+                    "destination": {item["key"]: item["count"] for item in self.destination_ports.top()}
+                },
+                "unique_sources": self.unique_sources.count(),
+                "unique_ports": self.unique_ports.count()
+            },
+            "top_talkers": [
+                {
+                    "ip": item["key"],
+                    "bytes": item["count"],
+                    "packets": self.talker_packets.estimate(item["key"]),
+                    "error": item["error"]
+                }
+                for item in self.talkers.top()
+            ],
+            "flows": [
+                {
+                    "protocol": protocol,
+                    "source": {"ip": src, "port": sport},
+                    "destination": {"ip": dst, "port": dport},
+                    "bytes": item["count"],
+                    "error": item["error"]
+                }
+                for item in self.flows.top(max_flows)
+                for protocol, src, sport, dst, dport in [item["key"]]
+            ],
+            "timeline": self.timeline.to_dict(),
+            "error_bounds": {
+                "ports": self.destination_ports.error_bound(),
+                "talkers": self.talkers.error_bound(),
+                "talker_packets": self.talker_packets.error_bound(),
+                "flows": self.flows.error_bound(),
+                "cardinality": self.unique_sources.error_bound()
+            }
+        }
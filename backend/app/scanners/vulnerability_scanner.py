@@ -1,20 +1,94 @@
 import asyncio
 import json
-from typing import Dict, Any
+from typing import Dict, Any, List
 import subprocess
 import os
-from .base_scanner import BaseScanner
+import tempfile
+from .base_scanner import BaseScanner, terminate_process
+from .zap_pool import ZapLease, get_zap_pool
+from .zap_report import AlertAggregator, alert_risk, summarize_report
+
+# Mémoire réservée par un zap.sh lancé en mode cli (JVM), en Mo
+ZAP_CLI_MEMORY_MB = 1536
+
+# Nombre d'alertes lues par appel à core/view/alerts
+ALERTS_PAGE_SIZE = 500
 
 class VulnerabilityScanner(BaseScanner):
     def __init__(self, target: str, options: Dict[str, Any] = None):
         super().__init__(target, options)
         self.scan_type = options.get('scan_type', 'quick')
         self.zap_path = options.get('zap_path', '/zap/zap.sh')
-        self.report_path = options.get('report_path', '/tmp/zap-report.json')
+        # Rapport propre à chaque scan : deux jobs ne partagent jamais le même fichier
+        self.report_dir = options.get('report_dir', tempfile.gettempdir())
+        self.report_path = None
+        self.max_instances = options.get('max_instances', 20)  # URLs/preuves gardées par alerte
+        # pool : démons ZAP persistants pilotés par l'API ; cli : un zap.sh par scan
+        self.zap_mode = options.get('zap_mode', 'pool')
+        self.poll_interval = options.get('poll_interval', 2)  # en secondes
+
+    def resources(self) -> Dict[str, float]:
+        if self.zap_mode == 'cli':
+            return {"zap": 1, "cpu": 2, "memory": ZAP_CLI_MEMORY_MB}
+        # Démon du pool déjà démarré : seule sa charge compte
+        return {"zap": 1, "cpu": 1}
+
+    async def wait_for(self, lease: ZapLease, component: str, scan_id: str,
+                       start: float = 0.0, span: float = 1.0) -> None:
+        """Attend la fin d'un scan spider/ascan, qui couvre [start, start + span] de l'avancement"""
+        while True:
+            status = await lease.call(component, "view", "status", scanId=scan_id)
+            percent = int(status.get("status", 0))
+            self.report_progress(100 * start + span * percent, component)
+            if percent >= 100:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def scan_with_pool(self) -> Dict[str, Any]:
+        """Scan via un démon ZAP du pool : spider, scan actif, puis alertes"""
+        async with get_zap_pool().lease(self.target) as lease:
+            spider = await lease.call("spider", "action", "scan", url=self.target, contextName=lease.context_name)
+            # Part de l'avancement : exploration, scan actif éventuel, puis analyse passive
+            if self.scan_type == 'quick':
+                await self.wait_for(lease, "spider", spider["scan"], 0.0, 0.8)
+            else:
+                await self.wait_for(lease, "spider", spider["scan"], 0.0, 0.3)
+                active = await lease.call("ascan", "action", "scan", url=self.target, contextId=lease.context_id)
+                await self.wait_for(lease, "ascan", active["scan"], 0.3, 0.6)
+
+            # Attendre la fin de l'analyse passive
+            while int((await lease.call("pscan", "view", "recordsToScan")).get("recordsToScan", 0)) > 0:
+                await asyncio.sleep(self.poll_interval)
+
+            aggregator = AlertAggregator(self.max_instances)
+            start = 0
+            while True:
+                page = await lease.call(
+                    "core", "view", "alerts",
+                    baseurl=self.target, start=start, count=ALERTS_PAGE_SIZE
+                )
+                alerts = page.get("alerts", [])
+                for alert in alerts:
+                    if aggregator.add(alert):
+                        self.emit_event("alert", {
+                            "name": alert.get("name") or alert.get("alert"),
+                            "risk": alert_risk(alert),
+                            "url": alert.get("url")
+                        })
+                start += len(alerts)
+                if len(alerts) < ALERTS_PAGE_SIZE:
+                    break
+
+        return aggregator.to_dict()
 
     async def scan(self) -> Dict[str, Any]:
         try:
             self.update_status("running")
+
+            if self.zap_mode == 'pool':
+                self.results["results"] = await self.scan_with_pool()
+                self.update_status("completed")
+                return self.results
             
             # Définir les options ZAP selon le type de scan
             zap_options = {
@@ -24,6 +98,9 @@ class VulnerabilityScanner(BaseScanner):
                 'custom': '--custom-scan'
             }.get(self.scan_type, '--quick-scan')
 
+            fd, self.report_path = tempfile.mkstemp(prefix='zap-report-', suffix='.json', dir=self.report_dir)
+            os.close(fd)
+
             # Construire la commande ZAP
             cmd = [
                 self.zap_path,
@@ -38,56 +115,29 @@ class VulnerabilityScanner(BaseScanner):
             process = await asyncio.create_subprocess_exec(
                 *cmd,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True
             )
             
-            stdout, stderr = await process.communicate()
+            try:
+                stdout, stderr = await process.communicate()
+            finally:
+                # zap.sh lance une JVM : arrêter tout le groupe de processus
+                await terminate_process(process)
             
             if process.returncode != 0:
                 self.add_error(f"ZAP error: {stderr.decode()}")
                 self.update_status("failed")
                 return self.results
 
-            # Lire et parser le rapport JSON
+            # Lire le rapport JSON en continu, hors de la boucle d'événements
             try:
-                with open(self.report_path, 'r') as f:
-                    zap_results = json.load(f)
-
-                # Formater les résultats
-                scan_results = {
-                    "summary": {
-                        "total_alerts": len(zap_results.get("alerts", [])),
-                        "risk_levels": {
-                            "high": 0,
-                            "medium": 0,
-                            "low": 0,
-                            "informational": 0
-                        }
-                    },
-                    "alerts": []
-                }
-
-                for alert in zap_results.get("alerts", []):
-                    risk = alert.get("risk", "informational").lower()
-                    scan_results["summary"]["risk_levels"][risk] += 1
-                    
-                    alert_data = {
-                        "name": alert.get("name"),
-                        "risk": risk,
-                        "description": alert.get("description"),
-                        "solution": alert.get("solution"),
-                        "url": alert.get("url"),
-                        "evidence": alert.get("evidence")
-                    }
-                    scan_results["alerts"].append(alert_data)
-
-                self.results["results"] = scan_results
+                loop = asyncio.get_running_loop()
+                self.results["results"] = await loop.run_in_executor(
+                    None, summarize_report, self.report_path, self.max_instances
+                )
                 self.update_status("completed")
 
-                # Nettoyer le fichier de rapport
-                if os.path.exists(self.report_path):
-                    os.remove(self.report_path)
-
             except Exception as e:
                 self.add_error(f"Error parsing ZAP results: {str(e)}")
                 self.update_status("failed")
@@ -96,4 +146,9 @@ class VulnerabilityScanner(BaseScanner):
             self.add_error(f"Scan error: {str(e)}")
             self.update_status("failed")
 
+        finally:
+            # Nettoyer le fichier de rapport
+            if self.report_path and os.path.exists(self.report_path):
+                os.remove(self.report_path)
+
         return self.results 
\ No newline at end of file
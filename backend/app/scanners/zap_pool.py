@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import re
+import secrets
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+import aiohttp
+
+from .base_scanner import terminate_process
+
+logger = logging.getLogger(__name__)
+
+# Démons ZAP existants (ex: http://zap:8080), séparés par des virgules ;
+# à défaut, le pool lance ZAP_POOL_SIZE démons locaux
+ZAP_API_URLS = os.getenv("ZAP_API_URLS", "")
+ZAP_POOL_SIZE = int(os.getenv("ZAP_POOL_SIZE", "2"))
+ZAP_API_KEY = os.getenv("ZAP_API_KEY", "")
+ZAP_BASE_PORT = int(os.getenv("ZAP_BASE_PORT", "8090"))
+
+class ZapPoolError(Exception):
+    """Aucun démon ZAP disponible ou réponse invalide de l'API"""
+
+class ZapDaemon:
+    """Un démon ZAP piloté par son API JSON"""
+
+    def __init__(self, base_url: str, api_key: str = "", process: Optional[asyncio.subprocess.Process] = None,
+                 command: Optional[List[str]] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.process = process
+        self.command = command  # commande de (re)lancement pour les démons gérés par le pool
+
+    async def call(self, session: aiohttp.ClientSession, component: str, kind: str, name: str,
+                   timeout: float = 30, **params) -> Dict[str, Any]:
+        """Appelle /JSON/<component>/<view|action>/<name>/"""
+        if self.api_key:
+            params["apikey"] = self.api_key
+        url = f"{self.base_url}/JSON/{component}/{kind}/{name}/"
+        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            data = await response.json(content_type=None)
+            if response.status != 200:
+                raise ZapPoolError(f"ZAP API error on {component}/{name}: {data}")
+            return data
+
+    async def healthy(self, session: aiohttp.ClientSession) -> bool:
+        try:
+            await self.call(session, "core", "view", "version", timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def start(self, session: aiohttp.ClientSession, startup_timeout: float = 180) -> None:
+        """Lance le démon et attend que son API réponde"""
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True
+        )
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + startup_timeout
+        while loop.time() < deadline:
+            if self.process.returncode is not None:
+                raise ZapPoolError(f"ZAP daemon exited with code {self.process.returncode}")
+            if await self.healthy(session):
+                return
+            await asyncio.sleep(2)
+        raise ZapPoolError(f"ZAP daemon {self.base_url} did not start in time")
+
+    async def stop(self) -> None:
+        if self.process:
+            # zap.sh n'est qu'un lanceur : la JVM est dans le même groupe de processus
+            await terminate_process(self.process, grace=30)
+
+class ZapLease:
+    """Démon prêté pour un scan, isolé dans son propre contexte ZAP"""
+
+    def __init__(self, daemon: ZapDaemon, session: aiohttp.ClientSession, context_name: str, context_id: str):
+        self.daemon = daemon
+        self.session = session
+        self.context_name = context_name
+        self.context_id = context_id
+
+    async def call(self, component: str, kind: str, name: str, **params) -> Dict[str, Any]:
+        return await self.daemon.call(self.session, component, kind, name, **params)
+
+class ZapPool:
+    """Pool de démons ZAP démarrés une fois et réutilisés entre les scans.
+
+    Un démon n'est prêté qu'à un scan à la fois (lease) ; son état de santé
+    est vérifié avant chaque prêt, et sa session est réinitialisée à son
+    retour pour que les alertes d'un scan ne fuient pas dans le suivant.
+    """
+
+    def __init__(self, urls: Optional[List[str]] = None, size: int = ZAP_POOL_SIZE,
+                 zap_path: str = '/zap/zap.sh', api_key: str = ZAP_API_KEY, base_port: int = ZAP_BASE_PORT):
+        self.urls = urls or []
+        self.size = len(self.urls) if self.urls else size
+        self.zap_path = zap_path
+        self.api_key = api_key or (secrets.token_hex(16) if not self.urls else "")
+        self.base_port = base_port
+        self.daemons = []
+        self.available = asyncio.Queue()
+        self.session = None
+        self.started = False
+        self.lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        async with self.lock:
+            if self.started:
+                return
+            self.session = aiohttp.ClientSession()
+            try:
+                if self.urls:
+                    self.daemons = [ZapDaemon(url, self.api_key) for url in self.urls]
+                else:
+                    for index in range(self.size):
+                        port = self.base_port + index
+                        daemon = ZapDaemon(f"http://127.0.0.1:{port}", self.api_key, command=[
+                            self.zap_path, '-daemon',
+                            '-host', '127.0.0.1',
+                            '-port', str(port),
+                            '-config', f'api.key={self.api_key}'
+                        ])
+                        self.daemons.append(daemon)
+                    results = await asyncio.gather(*[daemon.start(self.session) for daemon in self.daemons],
+                                                   return_exceptions=True)
+                    errors = [result for result in results if isinstance(result, BaseException)]
+                    if errors:
+                        raise errors[0]
+            except BaseException:
+                # Démarrage partiel : arrêter les démons lancés, le prochain appel repart de zéro
+                await asyncio.gather(*[daemon.stop() for daemon in self.daemons], return_exceptions=True)
+                await self.session.close()
+                self.session = None
+                self.daemons = []
+                raise
+            for daemon in self.daemons:
+                self.available.put_nowait(daemon)
+            self.started = True
+            logger.info(f"Pool ZAP prêt ({len(self.daemons)} démons)")
+
+    async def acquire(self, attempts: int = 3) -> ZapDaemon:
+        """Attend un démon libre et en bonne santé"""
+        for _ in range(attempts * max(self.size, 1)):
+            daemon = await self.available.get()
+            try:
+                if await daemon.healthy(self.session):
+                    return daemon
+                logger.warning(f"Démon ZAP {daemon.base_url} indisponible")
+                if daemon.command:
+                    try:
+                        await daemon.stop()
+                        await daemon.start(self.session)
+                        return daemon
+                    except ZapPoolError as e:
+                        logger.error(f"Redémarrage impossible: {str(e)}")
+            except BaseException:
+                # Annulation ou erreur inattendue (binaire ZAP absent...) : le
+                # démon reste dans le pool, sinon acquire finirait par attendre indéfiniment
+                self.available.put_nowait(daemon)
+                raise
+            self.available.put_nowait(daemon)
+            await asyncio.sleep(1)
+        raise ZapPoolError("No healthy ZAP daemon available")
+
+    async def release(self, daemon: ZapDaemon) -> None:
+        try:
+            # Nouvelle session : alertes, historique et arbre du site sont vidés
+            await daemon.call(self.session, "core", "action", "newSession", overwrite="true")
+        except Exception as e:
+            logger.warning(f"Réinitialisation de {daemon.base_url} impossible: {str(e)}")
+        self.available.put_nowait(daemon)
+
+    @asynccontextmanager
+    async def lease(self, target: str):
+        """Prête un démon pour scanner target dans un contexte dédié"""
+        await self.start()
+        daemon = await self.acquire()
+        context_name = f"scan-{uuid.uuid4().hex}"
+        try:
+            created = await daemon.call(self.session, "context", "action", "newContext", contextName=context_name)
+            await daemon.call(
+                self.session, "context", "action", "includeInContext",
+                contextName=context_name, regex=re.escape(target.rstrip("/")) + ".*"
+            )
+            yield ZapLease(daemon, self.session, context_name, created.get("contextId"))
+        finally:
+            # Scan annulé ou en erreur : arrêter l'exploration et le scan actif en cours
+            for component in ("spider", "ascan"):
+                try:
+                    await daemon.call(self.session, component, "action", "stopAllScans")
+                except Exception:
+                    pass
+            try:
+                await daemon.call(self.session, "context", "action", "removeContext", contextName=context_name)
+            except Exception:
+                pass
+            await self.release(daemon)
+
+    async def close(self) -> None:
+        for daemon in self.daemons:
+            await daemon.stop()
+        if self.session:
+            await self.session.close()
+        self.started = False
+
+_pool = None
+
+def get_zap_pool() -> ZapPool:
+    """Pool ZAP partagé par les scans du processus"""
+    global _pool
+    if _pool is None:
+        urls = [url.strip() for url in ZAP_API_URLS.split(",") if url.strip()]
+        _pool = ZapPool(urls=urls)
+    return _pool
+
+async def close_zap_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -0,0 +1,133 @@
+import json
+import re
+from typing import Dict, Any, Iterator, Optional
+
+READ_CHUNK_SIZE = 1 << 16
+
+# Clé "alerts" ouvrant un tableau ; hors des chaînes JSON les guillemets ne
+# sont jamais échappés, la clé ne peut donc pas correspondre à une valeur
+ALERTS_KEY = re.compile(r'"alerts"\s*:\s*\[')
+ARRAY_SEPARATOR = re.compile(r'[\s,]*')
+
+def iter_report_alerts(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Alertes d'un rapport ZAP JSON, lues par blocs sans charger le fichier.
+
+    Tous les tableaux "alerts" du document sont parcourus (rapport à plat
+    ou par site) ; seule l'alerte en cours de décodage est gardée en mémoire.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    in_alerts = False
+    eof = False
+
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            if in_alerts:
+                position = ARRAY_SEPARATOR.match(buffer, position).end()
+                if position < len(buffer) and buffer[position] == "]":
+                    in_alerts = False
+                    position += 1
+                    continue
+                if position < len(buffer):
+                    try:
+                        alert, end = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    else:
+                        position = end
+                        yield alert
+                        continue
+            else:
+                match = ALERTS_KEY.search(buffer, position)
+                if match:
+                    in_alerts = True
+                    position = match.end()
+                    continue
+                # Garder la fin du bloc : la clé peut être coupée en deux
+                position = max(position, len(buffer) - 64)
+
+            if eof:
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+def alert_risk(alert: Dict[str, Any]) -> str:
+    """Niveau de risque d'une alerte (API : risk, rapport : riskdesc)"""
+    risk = alert.get("risk") or (alert.get("riskdesc") or "informational").split(" ")[0]
+    return risk.lower()
+
+class AlertAggregator:
+    """Regroupe les alertes par (plugin, risque).
+
+    Description et solution ne sont conservées qu'une fois par groupe ; les
+    URLs et preuves concernées sont limitées à max_instances entrées, le
+    nombre total d'occurrences restant exact.
+    """
+
+    def __init__(self, max_instances: int = 20):
+        self.max_instances = max_instances
+        self.total = 0
+        self.risk_levels = {
+            "high": 0,
+            "medium": 0,
+            "low": 0,
+            "informational": 0
+        }
+        self.groups = {}
+
+    def add(self, alert: Dict[str, Any]) -> bool:
+        """Ajoute une alerte ; True si elle ouvre un nouveau groupe"""
+        risk = alert_risk(alert)
+        name = alert.get("name") or alert.get("alert")
+        plugin = alert.get("pluginId") or alert.get("pluginid") or name
+        # Les rapports regroupent déjà les occurrences dans "instances"
+        instances = alert.get("instances") or [{"uri": alert.get("url"), "evidence": alert.get("evidence")}]
+
+        group = self.groups.get((plugin, risk))
+        created = group is None
+        if created:
+            group = self.groups[(plugin, risk)] = {
+                "plugin_id": plugin,
+                "name": name,
+                "risk": risk,
+                "description": alert.get("description") or alert.get("desc"),
+                "solution": alert.get("solution"),
+                "count": 0,
+                "urls": [],
+                "evidence": []
+            }
+
+        for instance in instances:
+            self.total += 1
+            self.risk_levels[risk] = self.risk_levels.get(risk, 0) + 1
+            group["count"] += 1
+            url = instance.get("uri") or instance.get("url")
+            if url and len(group["urls"]) < self.max_instances and url not in group["urls"]:
+                group["urls"].append(url)
+            evidence = instance.get("evidence")
+            if evidence and len(group["evidence"]) < self.max_instances and evidence not in group["evidence"]:
+                group["evidence"].append(evidence)
+        return created
+
+    def to_dict(self) -> Dict[str, Any]:
+        order = {risk: index for index, risk in enumerate(["high", "medium", "low", "informational"])}
+        alerts = sorted(self.groups.values(), key=lambda group: (order.get(group["risk"], len(order)), -group["count"]))
+        return {
+            "summary": {
+                "total_alerts": self.total,
+                "unique_alerts": len(alerts),
+                "risk_levels": self.risk_levels
+            },
+            "alerts": alerts
+        }
+
+def summarize_report(path: str, max_instances: int = 20, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """Lit un rapport ZAP en continu et retourne les alertes regroupées"""
+    aggregator = AlertAggregator(max_instances)
+    for alert in iter_report_alerts(path, chunk_size or READ_CHUNK_SIZE):
+        aggregator.add(alert)
+    return aggregator.to_dict()
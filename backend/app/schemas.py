@@ -35,20 +35,55 @@ class ReportCreate(ReportBase):
     pass
 
 class Report(ReportBase):
+    # Absent de la ligne quand le corps est dans le stockage de blobs (results_ref)
+    results: Optional[dict] = None
     id: int
+    status: Optional[str]
+    summary: Optional[dict]
     created_at: datetime
     owner_id: int
 
     class Config:
         orm_mode = True
 
+class ReportSummary(BaseModel):
+    """Rapport dans une liste, sans ses résultats"""
+    id: int
+    title: str
+    description: Optional[str]
+    scan_type: str
+    target: str
+    status: Optional[str]
+    summary: Optional[dict]
+    created_at: datetime
+    owner_id: int
+
+    class Config:
+        orm_mode = True
+
+class ReportPage(BaseModel):
+    items: List[ReportSummary]
+    next_cursor: Optional[str]
+
 class ScanJobBase(BaseModel):
     scan_type: str
     target: str
     parameters: dict
 
 class ScanJobCreate(ScanJobBase):
-    pass
+    priority: int = 0
+    force: bool = False  # ignorer le cache et les exécutions identiques en cours
+    max_age: Optional[float] = None  # âge maximal (secondes) d'un résultat réutilisé
+
+class ScanSection(BaseModel):
+    scanner: str
+    status: str
+    started_at: datetime
+    completed_at: Optional[datetime]
+    results: Optional[dict]
+
+    class Config:
+        orm_mode = True
 
 class ScanJob(ScanJobBase):
     id: int
@@ -57,6 +92,95 @@ class ScanJob(ScanJobBase):
     completed_at: Optional[datetime]
     owner_id: int
     report_id: Optional[int]
+    progress: Optional[float]
+    cancel_requested: Optional[bool]
+    eta: Optional[datetime]
+    estimated_duration: Optional[float]
+    priority: Optional[int]
+    queued_at: Optional[datetime]
+    queue_position: Optional[int]
+    wait_time: Optional[float]
+    cache_status: Optional[str]
+    source_job_id: Optional[int]
 
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
+
+class ScanJobSummary(BaseModel):
+    """Tâche dans une liste, sans ses paramètres ni ses sections"""
+    id: int
+    scan_type: str
+    target: str
+    status: str
+    progress: Optional[float]
+    priority: Optional[int]
+    started_at: datetime
+    completed_at: Optional[datetime]
+    eta: Optional[datetime]
+    queue_position: Optional[int]
+    wait_time: Optional[float]
+    cache_status: Optional[str]
+    source_job_id: Optional[int]
+    report_id: Optional[int]
+
+    class Config:
+        orm_mode = True
+
+class ScanJobPage(BaseModel):
+    items: List[ScanJobSummary]
+    next_cursor: Optional[str]
+
+class InventoryHost(BaseModel):
+    id: int
+    address: str
+    status: str
+    first_seen: datetime
+    last_seen: datetime
+    report_id: Optional[int]
+    open_ports: List[int] = []
+
+    class Config:
+        orm_mode = True
+
+class InventoryHostPage(BaseModel):
+    items: List[InventoryHost]
+    next_cursor: Optional[str]
+
+class InventoryService(BaseModel):
+    id: int
+    address: str
+    protocol: str
+    port: int
+    state: str
+    name: Optional[str]
+    product: Optional[str]
+    version: Optional[str]
+    first_seen: datetime
+    last_seen: datetime
+    report_id: Optional[int]
+
+    class Config:
+        orm_mode = True
+
+class InventoryServicePage(BaseModel):
+    items: List[InventoryService]
+    next_cursor: Optional[str]
+
+class InventoryFinding(BaseModel):
+    id: int
+    target: str
+    plugin_id: str
+    name: Optional[str]
+    risk: str
+    count: int
+    url: Optional[str]
+    first_seen: datetime
+    last_seen: datetime
+    report_id: Optional[int]
+
+    class Config:
+        orm_mode = True
+
+class InventoryFindingPage(BaseModel):
+    items: List[InventoryFinding]
+    next_cursor: Optional[str]
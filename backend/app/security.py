@@ -1,26 +1,40 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+import asyncio
 import os
 import logging
+import threading
+import time
 
 from . import models, schemas
-from .database import get_db
+from .database import get_async_db
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Calculs bcrypt simultanés (chacun occupe un cœur 100 à 300 ms)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Durée de vie (secondes) et taille du cache des utilisateurs authentifiés
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024"))
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# bcrypt libère le GIL : des threads suffisent, hors de la boucle d'événements
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 def verify_password(plain_password, hashed_password):
     try:
@@ -32,14 +46,20 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, username: str, password: str):
+async def in_password_pool(function: Callable[..., Any], *args) -> Any:
+    """Exécute un calcul bcrypt (verify_password, get_password_hash) dans le pool dédié"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, function, *args)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     try:
         logger.info(f"Tentative d'authentification pour l'utilisateur: {username}")
-        user = db.query(models.User).filter(models.User.username == username).first()
+        result = await db.execute(select(models.User).filter(models.User.username == username))
+        user = result.scalars().first()
         if not user:
             logger.warning(f"Utilisateur non trouvé: {username}")
             return False
-        if not verify_password(password, user.hashed_password):
+        if not await in_password_pool(verify_password, password, user.hashed_password):
             logger.warning(f"Mot de passe incorrect pour l'utilisateur: {username}")
             return False
         logger.info(f"Authentification réussie pour l'utilisateur: {username}")
@@ -65,27 +85,111 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
             detail="Could not create access token"
         )
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Contenu d'un JWT valide, HTTPException 401 sinon"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
+            raise credentials_exception()
     except JWTError as e:
         logger.error(f"Erreur JWT: {str(e)}")
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+        raise credentials_exception()
+    return payload
+
+def get_user(db: Session, username: str):
+    """Utilisateur détaché de la session, partageable entre requêtes"""
+    user = db.query(models.User).filter(models.User.username == username).first()
+    if user is None:
+        raise credentials_exception()
+    db.expunge(user)
+    return user
+
+def get_user_from_token(db: Session, token: str):
+    """Utilisateur correspondant à un JWT, HTTPException 401 sinon"""
+    return get_user(db, decode_token(token)["sub"])
+
+class PrincipalCache:
+    """Utilisateurs authentifiés, par token, pour une durée limitée.
+
+    Évite le décodage du JWT et la requête users à chaque requête. Une
+    entrée expire après AUTH_CACHE_TTL secondes (ou avec le token) et
+    disparaît dès que ce processus modifie l'utilisateur (désactivation,
+    rôle, mot de passe) ; une modification faite par un autre processus
+    est prise en compte au plus tard après AUTH_CACHE_TTL secondes.
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, models.User]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[models.User]:
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[token]
+                return None
+            self.entries.move_to_end(token)
+            return entry[1]
+
+    def put(self, token: str, user: models.User, expires_at: float) -> None:
+        """expires_at : expiration du token (timestamp Unix)"""
+        ttl = min(self.ttl, expires_at - time.time())
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[token] = (time.monotonic() + ttl, user)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self.lock:
+            for token in [token for token, (_, user) in self.entries.items() if user.id == user_id]:
+                del self.entries[token]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+principal_cache = PrincipalCache()
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def forget_user(mapper, connection, target: models.User) -> None:
+    principal_cache.invalidate_user(target.id)
+
+@event.listens_for(Session, "do_orm_execute")
+def forget_users(orm_execute_state) -> None:
+    # UPDATE/DELETE en masse (query.update()) : pas d'événement par objet
+    mapper = orm_execute_state.bind_mapper
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and mapper is not None and mapper.class_ is models.User:
+        principal_cache.clear()
+
+async def resolve_user(db: AsyncSession, token: str) -> models.User:
+    """Utilisateur d'un JWT, sans accès à la base si le token est en cache"""
+    user = principal_cache.get(token)
     if user is None:
-        raise credentials_exception
+        payload = decode_token(token)
+        user = await db.run_sync(get_user, payload["sub"])
+        principal_cache.put(token, user, payload.get("exp", 0))
     return user
 
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await resolve_user(db, token)
+
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user
@@ -0,0 +1,348 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .baseline import load_baseline
+from .blob_store import get_blob_store
+from .checkpoints import CheckpointWriter, clear_checkpoints, load_checkpoints
+from .database import AsyncSessionLocal, JobSession, async_engine, upgrade_schema
+from .events import ScanEventWriter, purge_events
+from .inventory import index_job
+from .job_queue import SCAN_JOB_TIMEOUT, ScanJobQueue, parse_job_timeout
+from .progress import JobProgress, predict_duration, record_duration
+from .resource_leases import SharedResources
+from .scan_cache import ScanCache
+from .scanners.resource_governor import get_resource_governor
+from .scanners.scanner_manager import DeadlineExceeded, ScannerManager, summarize_results, wait_with_deadline
+from .scanners.zap_pool import close_zap_pool
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de scans exécutés simultanément par ce processus
+SCAN_WORKER_CONCURRENCY = int(os.getenv("SCAN_WORKER_CONCURRENCY", "4"))
+# Délai entre deux consultations de la file lorsqu'elle est vide (secondes)
+SCAN_WORKER_POLL_INTERVAL = float(os.getenv("SCAN_WORKER_POLL_INTERVAL", "2"))
+# Intervalle des signes de vie du worker sur ses tâches en cours (secondes)
+SCAN_HEARTBEAT_INTERVAL = float(os.getenv("SCAN_HEARTBEAT_INTERVAL", "15"))
+# Tâche "running" sans signe de vie depuis ce délai : worker considéré arrêté (secondes)
+SCAN_JOB_STALE_AFTER = float(os.getenv("SCAN_JOB_STALE_AFTER", "120"))
+# Réclamations d'une tâche avant de la déclarer échouée
+SCAN_JOB_MAX_ATTEMPTS = int(os.getenv("SCAN_JOB_MAX_ATTEMPTS", "3"))
+
+def finish_scan(db: Session, scan_job: models.ScanJob, results: Dict[str, Any], status: str,
+                results_ref: Optional[str]) -> int:
+    """Crée le rapport d'une tâche terminée ; chaque tâche rattachée en reçoit une copie.
+
+    Le rapport garde la référence des résultats dans le stockage de blobs
+    et leur résumé ; sans référence (stockage indisponible), les résultats
+    restent dans la ligne.
+    """
+    report = models.Report(
+        title=f"Scan Report - {scan_job.target}",
+        description=f"Scan type: {scan_job.scan_type}",
+        scan_type=scan_job.scan_type,
+        target=scan_job.target,
+        status=status,
+        summary=summarize_results(results),
+        results_ref=results_ref,
+        results=None if results_ref else results,
+        owner_id=scan_job.owner_id
+    )
+    db.add(report)
+    db.commit()
+
+    # Les résultats partiels d'un scan arrêté restent dans son rapport
+    queue = ScanJobQueue(db)
+    clear_checkpoints(db, scan_job.id)
+    queue.complete(scan_job.id, report.id, status)
+    # Demandes identiques rattachées à cette exécution : chacune son rapport
+    for follower in queue.followers(scan_job.id):
+        queue.complete(follower.id, queue.copy_report(report, follower.owner_id).id, status)
+    return report.id
+
+async def store_results(results: Dict[str, Any]) -> Optional[str]:
+    """Écrit le corps d'un rapport dans le stockage de blobs, hors de la boucle d'événements"""
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, get_blob_store().put_json, results)
+    except (OSError, ValueError) as e:
+        logger.error(f"Stockage des résultats impossible, conservés dans le rapport: {str(e)}")
+        return None
+
+async def run_scan(scan_id: int) -> None:
+    """Exécute une tâche de scan réclamée et enregistre son rapport"""
+    # Session propre à la tâche, partagée par ses callbacks (voir JobSession)
+    async with JobSession() as db:
+        await execute_scan(db, scan_id)
+
+async def execute_scan(db: JobSession, scan_id: int) -> None:
+    # Événements en direct, lus par l'API pour /scan/{id}/events
+    events = ScanEventWriter(scan_id)
+    events.start()
+    # Blocs et hôtes terminés, pour reprendre la tâche si le worker s'arrête
+    checkpoints = CheckpointWriter(scan_id)
+    checkpoints.start()
+    started = time.monotonic()
+    status = None
+    try:
+        scan_job = await db.call(lambda session: session.query(models.ScanJob).get(scan_id))
+        resumed = (scan_job.attempts or 0) > 1
+        events.publish("status", {"status": "running", "resumed": resumed, "attempt": scan_job.attempts})
+        options = scan_job.parameters or {}
+        if options.get("incremental"):
+            # Scan différentiel : état complet de la cible d'après les rapports précédents
+            options = {**options, "baseline": await db.call(load_baseline, scan_job.owner_id, scan_job.target)}
+        manager = ScannerManager.from_scan_type(scan_job.target, scan_job.scan_type, options)
+        scanners = [scanner.__class__.__name__ for scanner in manager.scanners]
+        # Tâche reprise : scanners déjà terminés et points de reprise des autres
+        finished = {}
+        if resumed:
+            sections = await db.call(lambda session: ScanJobQueue(session).sections(scan_id))
+            # Une section "cancelled" a été interrompue par l'arrêt du worker, pas terminée
+            finished = {
+                name: section.results for name, section in sections.items()
+                if section.status in ("completed", "failed") and section.results is not None
+            }
+            logger.info(f"Reprise du scan {scan_id} (tentative {scan_job.attempts}, "
+                        f"scanners terminés : {', '.join(finished) or 'aucun'})")
+
+        def on_progress(percent: float, eta) -> None:
+            db.schedule(lambda session: ScanJobQueue(session).set_progress(scan_id, percent, eta))
+            events.publish("progress", {"percent": percent, "eta": eta.isoformat() if eta else None})
+
+        # Avancement global, estimé d'abord d'après la durée des scans comparables
+        progress = JobProgress(
+            scanners,
+            scan_job.estimated_duration or await db.call(
+                predict_duration, scan_job.scan_type, scan_job.target, scan_job.parameters
+            ),
+            on_progress
+        )
+        for name in finished:
+            progress.update(name, 100.0)
+
+        queued_at = scan_job.queued_at or scan_job.started_at
+        wait_recorded = False
+
+        def on_event(scanner: str, event_type: str, data: dict) -> None:
+            nonlocal wait_recorded
+            events.publish(event_type, data, scanner)
+            if event_type == "progress":
+                progress.update(scanner, data["percent"])
+            elif event_type == "resources" and not wait_recorded:
+                # Attente visible sur la tâche : file, puis ressources du premier scanner
+                wait_recorded = True
+                wait = (datetime.utcnow() - queued_at).total_seconds()
+                db.schedule(lambda session: ScanJobQueue(session).set_wait(scan_id, wait))
+
+        manager.set_event_sink(on_event)
+        manager.set_checkpoints(await db.call(load_checkpoints, scan_id) if resumed else {}, checkpoints.save)
+        manager.resume(finished)
+        # Emplacements nmap/ZAP/tshark, CPU, mémoire et interfaces partagés par les scans du worker
+        manager.set_governor(get_resource_governor(), scan_job.priority or 0)
+        await db.call(lambda session: ScanJobQueue(session).start_sections(scan_id, scanners))
+
+        def on_result(scanner: str, result: dict) -> None:
+            db.schedule(lambda session: ScanJobQueue(session).save_section(scan_id, scanner, result))
+            events.publish("section", {"status": result.get("status")}, scanner)
+            progress.update(scanner, 100.0)
+
+        # Exécuter le scan ; chaque scanner est enregistré dès qu'il se termine
+        try:
+            job_timeout = parse_job_timeout(scan_job.parameters)
+        except ValueError:
+            # Tâche mise en file avant la validation de job_timeout par l'API
+            job_timeout = SCAN_JOB_TIMEOUT
+        status = "completed"
+        try:
+            results = await wait_with_deadline(manager.run_all(on_result=on_result), job_timeout)
+        except DeadlineExceeded:
+            logger.warning(f"Scan {scan_id} interrompu après {job_timeout} s")
+            results = manager.results
+            results["error"] = f"Scan timed out after {job_timeout} s"
+            status = "failed"
+        except asyncio.CancelledError:
+            if not await db.call(lambda session: ScanJobQueue(session).cancel_requested([scan_id])):
+                # Arrêt du worker : la tâche retourne en file et sera reprise
+                # depuis ses points de reprise par le prochain worker
+                await asyncio.shield(db.call(lambda session: ScanJobQueue(session).release(scan_id)))
+                status = None
+                raise
+            logger.info(f"Scan {scan_id} arrêté à la demande de l'utilisateur")
+            results = manager.results
+            status = "cancelled"
+
+        # Points de reprise en attente écrits avant d'être supprimés avec la tâche
+        await checkpoints.close()
+        report_id = await db.call(finish_scan, scan_job, results, status, await store_results(results))
+        events.publish("status", {"status": status, "report_id": report_id})
+        # Hôtes, services et alertes du rapport dans l'inventaire de chaque demandeur
+        await asyncio.get_running_loop().run_in_executor(None, index_job, scan_id, results)
+
+        # Seuls les scans entièrement réussis alimentent l'historique des durées et le cache ;
+        # la durée d'une tâche reprise ne couvre qu'une partie du travail
+        if status == "completed" and all(result.get("status") == "completed" for result in results["results"].values()):
+            if not resumed:
+                await db.call(record_duration, scan_job.scan_type, scan_job.target, scan_job.parameters,
+                              time.monotonic() - started)
+            if scan_job.cache_key:
+                await db.call(lambda session: ScanCache(session).store(scan_job.cache_key, scan_id))
+        logger.info(f"Scan {scan_id} terminé (rapport {report_id})")
+
+    except Exception as e:
+        logger.error(f"Scan error ({scan_id}): {str(e)}")
+        await db.call(lambda session: ScanJobQueue(session).fail(scan_id))
+        events.publish("status", {"status": "failed", "error": str(e)})
+        status = "failed"
+    finally:
+        await events.close()
+        await checkpoints.close()
+        if status == "failed":
+            await db.call(clear_checkpoints, scan_id)
+
+class ScanWorker:
+    """Pool de scans borné qui consomme la file scan_jobs"""
+
+    def __init__(self, concurrency: int = SCAN_WORKER_CONCURRENCY,
+                 poll_interval: float = SCAN_WORKER_POLL_INTERVAL, worker_id: str = None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.running = {}  # identifiant de tâche -> asyncio.Task
+        self.cancelling = set()
+
+    @staticmethod
+    async def queue_call(function, *args):
+        """Opération de file sur une session courte, sans bloquer les scans en cours"""
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(lambda session: function(ScanJobQueue(session), *args))
+
+    async def claim_next(self):
+        """Réclame la prochaine tâche en attente, None si la file est vide"""
+        return await self.queue_call(ScanJobQueue.claim, self.worker_id)
+
+    async def cancel_requested(self, job_ids):
+        return await self.queue_call(ScanJobQueue.cancel_requested, job_ids)
+
+    async def watch_cancellations(self) -> None:
+        """Annule les tâches en cours dont l'arrêt a été demandé via l'API"""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self.running:
+                continue
+            try:
+                job_ids = await self.cancel_requested(list(self.running))
+            except Exception as e:
+                logger.error(f"Erreur lors de la lecture des demandes d'arrêt: {str(e)}")
+                continue
+            for job_id in job_ids:
+                task = self.running.get(job_id)
+                if task and job_id not in self.cancelling:
+                    logger.info(f"Arrêt du scan {job_id} demandé")
+                    self.cancelling.add(job_id)
+                    task.cancel()
+
+    async def requeue_stale(self) -> None:
+        """Remet en file les tâches abandonnées par un worker arrêté"""
+        def requeue(queue: ScanJobQueue) -> None:
+            outcome = queue.requeue_stale(SCAN_JOB_STALE_AFTER, SCAN_JOB_MAX_ATTEMPTS)
+            for job_id in outcome["failed"] + outcome["cancelled"]:
+                clear_checkpoints(queue.db, job_id)
+        await self.queue_call(requeue)
+
+    async def purge_events(self) -> None:
+        """Supprime les événements des tâches terminées après leur délai de conservation"""
+        await self.queue_call(lambda queue: purge_events(queue.db))
+
+    async def heartbeat(self, job_ids) -> None:
+        await self.queue_call(ScanJobQueue.heartbeat, job_ids)
+
+    async def keep_alive(self) -> None:
+        """Signale les tâches en cours, prolonge leurs réservations, reprend les tâches abandonnées et purge scan_events"""
+        while True:
+            await asyncio.sleep(SCAN_HEARTBEAT_INTERVAL)
+            try:
+                if self.running:
+                    await self.heartbeat(list(self.running))
+                await get_resource_governor().renew()
+                await self.requeue_stale()
+                await self.purge_events()
+            except Exception as e:
+                logger.error(f"Erreur lors du suivi des tâches en cours: {str(e)}")
+
+    def forget(self, job_id: int) -> None:
+        self.running.pop(job_id, None)
+        self.cancelling.discard(job_id)
+
+    async def run(self) -> None:
+        """Boucle principale : réclame des tâches tant qu'un emplacement est libre"""
+        logger.info(f"Worker {self.worker_id} démarré (concurrence: {self.concurrency})")
+        slots = asyncio.Semaphore(self.concurrency)
+        governor = get_resource_governor()
+        # Limites comptées sur tous les workers (table resource_leases)
+        governor.shared = SharedResources(self.worker_id, governor.capacity)
+        try:
+            await self.requeue_stale()
+        except Exception as e:
+            logger.error(f"Erreur lors de la reprise des tâches abandonnées: {str(e)}")
+        watcher = asyncio.create_task(self.watch_cancellations())
+        keeper = asyncio.create_task(self.keep_alive())
+
+        try:
+            while True:
+                await slots.acquire()
+                if governor.saturated:
+                    # Des scanners attendent déjà des ressources : laisser les tâches
+                    # en file, où priorité et partage équitable s'appliquent encore
+                    slots.release()
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                try:
+                    scan_id = await self.claim_next()
+                except Exception as e:
+                    logger.error(f"Erreur lors de la lecture de la file: {str(e)}")
+                    scan_id = None
+
+                if scan_id is None:
+                    slots.release()
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+
+                task = asyncio.create_task(run_scan(scan_id))
+                self.running[scan_id] = task
+                task.add_done_callback(lambda _, scan_id=scan_id: self.forget(scan_id))
+                task.add_done_callback(lambda _: slots.release())
+        finally:
+            watcher.cancel()
+            keeper.cancel()
+            # Arrêt du worker : les tâches en cours retournent en file avant
+            # que la connexion à la base ne soit fermée
+            for task in self.running.values():
+                task.cancel()
+            await asyncio.gather(*self.running.values(), return_exceptions=True)
+
+async def serve() -> None:
+    try:
+        await ScanWorker().run()
+    finally:
+        # Arrêter les démons ZAP lancés par le pool
+        await close_zap_pool()
+        # Fermer les connexions du moteur asynchrone (threads aiosqlite)
+        await async_engine.dispose()
+
+def main():
+    upgrade_schema()
+    asyncio.run(serve())
+
+if __name__ == "__main__":
+    main()
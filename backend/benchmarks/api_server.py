@@ -0,0 +1,72 @@
+"""API lancée sous uvicorn pour les benchmarks de charge.
+
+Le serveur tourne dans un processus séparé, sur une base SQLite jetable,
+à partir du répertoire backend donné : celui de ce dépôt, ou celui d'une
+copie de travail antérieure à une optimisation pour obtenir les mesures
+« avant ».
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+import aiohttp
+from jose import jwt
+
+LATENCY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_latency")
+SECRET_KEY = "benchmark-secret"
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def token(username: str) -> str:
+    return jwt.encode({"sub": username, "exp": time.time() + 3600}, SECRET_KEY, algorithm="HS256")
+
+def percentiles(values: List[float]) -> str:
+    values = sorted(values)
+    at = lambda p: values[min(len(values) - 1, int(len(values) * p))]
+    return f"n={len(values):6d} p50={at(.5):7.1f} ms  p99={at(.99):7.1f} ms  max={values[-1]:7.1f} ms"
+
+@contextmanager
+def api_server(backend: str, directory: str, setup: str, latency: Dict[str, float]) -> Iterator[str]:
+    """Prépare la base avec le code setup puis lance l'API ; retourne son URL"""
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'api.db')}",
+        "BLOB_STORE_PATH": os.path.join(directory, "blobs"),
+        "SECRET_KEY": SECRET_KEY,
+        "PYTHONPATH": backend
+    }
+    subprocess.run([sys.executable, "-c", setup], env=env, cwd=backend, check=True)
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**env, "PYTHONPATH": backend + os.pathsep + LATENCY_PATH,
+             **{name: str(value) for name, value in latency.items()}},
+        cwd=backend, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(wait_ready(f"http://127.0.0.1:{port}"))
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        server.wait()
+
+async def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url + "/") as response:
+                    await response.read()
+                    return
+            except aiohttp.ClientError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
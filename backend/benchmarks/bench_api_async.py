@@ -0,0 +1,92 @@
+"""Charge de l'API avec une base lente : routes synchrones (avant) ou asynchrones (après).
+
+Un utilisateur a 200 tâches en file, un autre quelques tâches terminées.
+4 clients lisent en boucle une tâche du premier (rang dans la file :
+requête lente), 24 clients lisent les tâches et résultats du second. Chaque
+instruction SQL attend --latency-ms (aller-retour réseau simulé, voir
+db_latency/sitecustomize.py) et la requête du rang --slow-ms de plus.
+
+Mesures « avant » : --before pointe vers le backend d'une copie de travail
+antérieure au passage aux sessions asynchrones, par exemple
+
+    git worktree add /tmp/tee-before "$(git log --format=%h -1 --grep='^\\[user-021\\]')^"
+    cd backend && python benchmarks/bench_api_async.py --before /tmp/tee-before/backend
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp
+
+from api_server import api_server, percentiles, token
+
+SETUP = """
+from app import models
+from app.database import Base, SessionLocal, engine
+Base.metadata.create_all(bind=engine)
+db = SessionLocal()
+db.add_all([models.User(username="heavy", email="heavy@example.com", hashed_password="x"),
+            models.User(username="light", email="light@example.com", hashed_password="x")])
+db.commit()
+db.bulk_insert_mappings(models.ScanJob, [
+    dict(scan_type="network", target=f"10.0.{i // 256}.{i % 256}", parameters={"ports": "1-1000"},
+         status="pending", owner_id=1, progress=0.0) for i in range(200)])
+db.bulk_insert_mappings(models.ScanJob, [
+    dict(scan_type="network", target="10.1.0.1", parameters={}, status="completed", owner_id=2, progress=100.0)
+    for i in range(5)])
+db.commit()
+db.add(models.ScanSection(scan_job_id=201, scanner="NetworkScanner", status="completed",
+                          results={"status": "completed", "results": {"hosts": [{"ip": "10.1.0.1"}] * 20}}))
+db.commit()
+"""
+
+async def load(url: str, duration: float) -> dict:
+    latencies = {"heavy": [], "light": []}
+    stop = time.monotonic() + duration
+
+    async def client(session, kind: str, path: str, username: str) -> None:
+        headers = {"Authorization": f"Bearer {token(username)}"}
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            async with session.get(url + path, headers=headers) as response:
+                await response.read()
+                assert response.status == 200, response.status
+            latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(
+            *[client(session, "heavy", "/api/v1/scan/1", "heavy") for _ in range(4)],
+            *[client(session, "light", "/api/v1/scan/201", "light") for _ in range(16)],
+            *[client(session, "light", "/api/v1/scan/201/results", "light") for _ in range(8)]
+        )
+    return latencies
+
+def run(label: str, backend: str, args) -> None:
+    latency = {"DB_LATENCY_MS": args.latency_ms, "DB_SLOW_MS": args.slow_ms}
+    with tempfile.TemporaryDirectory() as directory:
+        with api_server(backend, directory, SETUP, latency) as url:
+            latencies = asyncio.run(load(url, args.duration))
+    for kind, values in latencies.items():
+        print(f"{label:<7} {kind:<6} {len(values) / args.duration:7.1f} req/s  {percentiles(values)}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--before", help="répertoire backend d'une version antérieure")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=1)
+    parser.add_argument("--slow-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    print(f"{args.duration:g} s, {args.latency_ms:g} ms par instruction, rang dans la file +{args.slow_ms:g} ms")
+    if args.before:
+        run("before", os.path.abspath(args.before), args)
+    run("after", BACKEND, args)
+
+if __name__ == "__main__":
+    main()
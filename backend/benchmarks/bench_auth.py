@@ -0,0 +1,104 @@
+"""Authentification : bcrypt sur la boucle et utilisateur relu à chaque appel (avant), ou pool de hachage et cache (après).
+
+Deux phases de --duration secondes sur une base SQLite jetable :
+- 8 clients se connectent en boucle (POST /token) pendant qu'une sonde
+  interroge GET / : la latence de la sonde montre si bcrypt bloque l'API ;
+- 16 clients appellent GET /users/me/ avec un jeton valide.
+
+Mesures « avant » : --before pointe vers le backend d'une copie de travail
+antérieure à la mise en cache, par exemple
+
+    git worktree add /tmp/tee-before "$(git log --format=%h -1 --grep='^\\[user-022\\]')^"
+    cd backend && python benchmarks/bench_auth.py --before /tmp/tee-before/backend
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp
+
+from api_server import api_server, percentiles
+
+USERS = 8
+
+SETUP = f"""
+from passlib.context import CryptContext
+from app import models
+from app.database import Base, SessionLocal, engine
+Base.metadata.create_all(bind=engine)
+hashed = CryptContext(schemes=["bcrypt"]).hash("password")
+db = SessionLocal()
+db.add_all([models.User(username=f"user{{i}}", email=f"user{{i}}@example.com", hashed_password=hashed)
+            for i in range({USERS})])
+db.commit()
+"""
+
+async def login(session, url: str, index: int) -> str:
+    async with session.post(url + "/token", data={"username": f"user{index}", "password": "password"}) as response:
+        assert response.status == 200, response.status
+        return (await response.json())["access_token"]
+
+async def load(url: str, duration: float) -> dict:
+    latencies = {"login": [], "probe": [], "me": []}
+
+    async def timed(kind: str, request) -> None:
+        started = time.perf_counter()
+        await request
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    async with aiohttp.ClientSession() as session:
+        async def get(path: str, headers=None) -> None:
+            async with session.get(url + path, headers=headers) as response:
+                await response.read()
+                assert response.status == 200, response.status
+
+        stop = time.monotonic() + duration
+
+        async def login_loop(index: int) -> None:
+            while time.monotonic() < stop:
+                await timed("login", login(session, url, index))
+
+        async def probe_loop() -> None:
+            while time.monotonic() < stop:
+                await timed("probe", get("/"))
+                await asyncio.sleep(0.02)
+
+        await asyncio.gather(*[login_loop(index) for index in range(USERS)], probe_loop())
+
+        tokens = [await login(session, url, index) for index in range(USERS)]
+        stop = time.monotonic() + duration
+
+        async def me_loop(index: int) -> None:
+            headers = {"Authorization": f"Bearer {tokens[index % USERS]}"}
+            while time.monotonic() < stop:
+                await timed("me", get("/users/me/", headers))
+
+        await asyncio.gather(*[me_loop(index) for index in range(16)])
+    return latencies
+
+def run(label: str, backend: str, duration: float) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        with api_server(backend, directory, SETUP, {}) as url:
+            latencies = asyncio.run(load(url, duration))
+    for kind, values in latencies.items():
+        rate = f"{len(values) / duration:7.1f} req/s" if kind != "probe" else " " * 13
+        print(f"{label:<7} {kind:<6} {rate}  {percentiles(values)}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--before", help="répertoire backend d'une version antérieure")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    if args.before:
+        run("before", os.path.abspath(args.before), args.duration)
+    run("after", BACKEND, args.duration)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Inventaire : parcours du JSON d'un rapport (avant) ou requêtes indexées sur hosts/services (après).
+
+Un rapport synthétique de --hosts hôtes, 3 ports ouverts chacun, est
+enregistré dans l'inventaire d'une base SQLite jetable (temps d'ingestion),
+puis chaque question est posée à l'API (moyenne sur --repeat appels) et,
+pour comparaison, en relisant le JSON du rapport.
+
+    cd backend && python benchmarks/bench_inventory.py --hosts 30000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp
+
+from api_server import api_server, token
+
+SETUP = """
+import json, random, time
+from app import models
+from app.database import Base, SessionLocal, engine
+from app.inventory import InventoryWriter
+Base.metadata.create_all(bind=engine)
+
+rnd = random.Random(1)
+products = [("ssh", "OpenSSH", ["5.3", "7.4", "8.0", "8.2p1", "8.9p1", "9.3"]),
+            ("http", "nginx", ["1.14.0", "1.18.0", "1.24.0"]),
+            ("ms-wbt-server", None, [None]),
+            ("http", "Apache httpd", ["2.4.41", "2.4.57"])]
+hosts = []
+for i in range({hosts}):
+    ports = []
+    for number in rnd.sample([22, 80, 443, 3389, 8080, 8443], 3):
+        name, product, versions = rnd.choice(products)
+        ports.append({{"number": str(number), "protocol": "tcp", "state": "open",
+                      "service": {{"name": name, "product": product, "version": rnd.choice(versions)}}}})
+    hosts.append({{"ip": f"10.{{i // 65536}}.{{i // 256 % 256}}.{{i % 256}}", "status": "up", "ports": ports}})
+results = {{"results": {{"NetworkScanner": {{"status": "completed", "timestamp": "2026-01-01T00:00:00",
+                                           "results": {{"hosts": hosts}}}}}}}}
+
+db = SessionLocal()
+db.add(models.User(username="bench", email="bench@example.com", hashed_password="x"))
+db.commit()
+report = models.Report(title="bench", scan_type="full", target="10.0.0.0/8", owner_id=1)
+db.add(report)
+db.commit()
+started = time.perf_counter()
+InventoryWriter(db, report).record(results)
+print(f"ingestion ({hosts} hôtes)          {{time.perf_counter() - started:8.2f}} s")
+
+document = json.dumps(results)
+started = time.perf_counter()
+body = json.loads(document)
+matches = [host["ip"] for host in body["results"]["NetworkScanner"]["results"]["hosts"]
+           for port in host["ports"] if port["number"] == "3389"]
+print(f"JSON du rapport, port 3389         {{(time.perf_counter() - started) * 1000:8.1f}} ms ({{len(matches)}} ports)")
+"""
+
+QUERIES = [
+    "/api/v1/inventory/services?port=3389",
+    "/api/v1/inventory/services?product=OpenSSH&version_below=8",
+    "/api/v1/inventory/hosts?port=3389",
+    "/api/v1/inventory/hosts?product=OpenSSH&version_below=8"
+]
+
+async def query(url: str, repeat: int) -> None:
+    headers = {"Authorization": f"Bearer {token('bench')}"}
+    async with aiohttp.ClientSession() as session:
+        for path in QUERIES:
+            async def get() -> int:
+                async with session.get(url + path, headers=headers) as response:
+                    assert response.status == 200, response.status
+                    return len((await response.json())["items"])
+
+            await get()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                items = await get()
+            print(f"{path:<60} {(time.perf_counter() - started) / repeat * 1000:7.1f} ms ({items} lignes)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=30000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        with api_server(BACKEND, directory, SETUP.format(hosts=args.hosts), {}) as url:
+            asyncio.run(query(url, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Parsing de la sortie XML de nmap : document complet (avant) ou au fil de l'eau (après).
+
+Sortie nmap synthétique de --hosts hôtes ayant chacun --ports ports ouverts,
+lue par blocs comme le pipe de nmap. Mesure la durée totale, le délai avant
+le premier hôte disponible et le pic mémoire (tracemalloc, hors tampon
+d'entrée).
+
+    cd backend && python benchmarks/bench_nmap_stream.py --hosts 20000
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+import tracemalloc
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scanners.network_scanner import READ_CHUNK_SIZE, iter_nmap_hosts
+
+def synthetic_nmap_xml(hosts: int, ports: int) -> bytes:
+    out = io.StringIO()
+    out.write('<?xml version="1.0"?><nmaprun scanner="nmap"><scaninfo type="syn" protocol="tcp"/>')
+    numbers = [22, 80, 443, 3389, 8080, 8443, 3306, 5432, 6379, 9200][:ports]
+    for i in range(hosts):
+        out.write(f'<host><status state="up" reason="echo-reply"/>'
+                  f'<address addr="10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" addrtype="ipv4"/><ports>')
+        for number in numbers:
+            out.write(f'<port protocol="tcp" portid="{number}"><state state="open" reason="syn-ack"/>'
+                      f'<service name="svc{number}" product="Product {number}" version="1.{number}" method="probed"/></port>')
+        out.write('</ports><times srtt="100" rttvar="50" to="100000"/></host>')
+    out.write('<runstats><finished time="1"/></runstats></nmaprun>')
+    return out.getvalue().encode()
+
+class ChunkStream:
+    """Lecteur du pipe de nmap : rend les données par blocs"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    async def read(self, size: int) -> bytes:
+        chunk = self.data[self.position:self.position + size]
+        self.position += size
+        return chunk
+
+def parse_buffered(data: bytes) -> list:
+    """Ancien chemin : sortie complète lue par communicate(), puis fromstring et findall"""
+    root = ElementTree.fromstring(data)
+    hosts = []
+    for host in root.findall(".//host"):
+        host_data = {
+            "ip": host.find("address").get("addr"),
+            "status": host.find("status").get("state"),
+            "ports": []
+        }
+        for port in host.findall(".//port"):
+            service = port.find("service")
+            host_data["ports"].append({
+                "number": port.get("portid"),
+                "protocol": port.get("protocol"),
+                "state": port.find("state").get("state"),
+                "service": {"name": service.get("name"), "product": service.get("product"),
+                            "version": service.get("version")}
+            })
+        hosts.append(host_data)
+    return hosts
+
+def run_buffered(data: bytes):
+    started = time.perf_counter()
+    hosts = parse_buffered(data)
+    elapsed = time.perf_counter() - started
+    # Aucun hôte n'est disponible avant la fin du parsing
+    return len(hosts), elapsed, elapsed
+
+async def run_streaming(data: bytes):
+    started = time.perf_counter()
+    first = None
+    count = 0
+    async for _ in iter_nmap_hosts(ChunkStream(data)):
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    return count, time.perf_counter() - started, first
+
+def measure(name: str, function) -> None:
+    tracemalloc.start()
+    count, elapsed, first = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:<10} hosts={count:<7} total={elapsed:6.2f} s  first host={first * 1000:8.1f} ms  "
+          f"peak={peak / 1e6:7.1f} MB")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=20000)
+    parser.add_argument("--ports", type=int, default=5)
+    args = parser.parse_args()
+
+    data = synthetic_nmap_xml(args.hosts, args.ports)
+    print(f"XML nmap : {len(data) / 1e6:.1f} MB, {args.hosts} hôtes x {args.ports} ports, "
+          f"blocs de {READ_CHUNK_SIZE // 1024} KiB")
+    measure("before", lambda: run_buffered(data))
+    measure("after", lambda: asyncio.run(run_streaming(data)))
+
+if __name__ == "__main__":
+    main()
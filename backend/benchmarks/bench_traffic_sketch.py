@@ -0,0 +1,88 @@
+"""Statistiques de trafic : dictionnaires exacts et FlowTable (avant) ou TrafficSketch (après).
+
+Trafic synthétique dont la moitié ressemble à un balayage (sources et ports
+aléatoires), le cas où les dictionnaires exacts grossissent sans limite.
+Mesure le débit, la mémoire retenue par les statistiques (tracemalloc) et
+la qualité des résumés par rapport au calcul exact.
+
+    cd backend && python benchmarks/bench_traffic_sketch.py --packets 300000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scanners.flow_table import FlowTable
+from app.scanners.sketches import TrafficSketch
+
+def synthetic_packets(count: int, seed: int = 7) -> list:
+    rnd = random.Random(seed)
+    packets = []
+    for index in range(count):
+        if rnd.random() < 0.5:
+            # Trafic de fond : peu d'émetteurs (loi de Pareto), ports usuels
+            src = f"10.0.{rnd.randint(0, 3)}.{int(rnd.paretovariate(1.2)) % 250}"
+            dport = str(rnd.choice([80, 443, 443, 22, 53]))
+        else:
+            src = f"172.{rnd.randint(16, 31)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}"
+            dport = str(rnd.randint(1, 65535))
+        packets.append((1e9 + index * 1e-3, "6", src, str(rnd.randint(1024, 65535)), "10.0.0.2", dport,
+                        60 + rnd.randint(0, 1400)))
+    return packets
+
+def exact(packets: list) -> dict:
+    """Ancien chemin : compteurs complets et table de flux"""
+    protocols, source_ports, destination_ports, talkers, flows = {}, {}, {}, {}, FlowTable()
+    for ts, protocol, src, sport, dst, dport, length in packets:
+        protocols[protocol] = protocols.get(protocol, 0) + 1
+        source_ports[sport] = source_ports.get(sport, 0) + 1
+        destination_ports[dport] = destination_ports.get(dport, 0) + 1
+        talkers[src] = talkers.get(src, 0) + length
+        flows.add(ts, protocol, src, sport, dst, dport, length)
+    return {"source_ports": source_ports, "destination_ports": destination_ports, "talkers": talkers, "flows": flows}
+
+def sketch(packets: list) -> TrafficSketch:
+    traffic = TrafficSketch()
+    for packet in packets:
+        traffic.add(*packet)
+    return traffic
+
+def measure(name: str, function, packets: list):
+    started = time.perf_counter()
+    function(packets)
+    elapsed = time.perf_counter() - started
+    # Seconde exécution sous tracemalloc : mémoire encore retenue par le résultat
+    tracemalloc.start()
+    result = function(packets)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name:<7} {len(packets) / elapsed:>10,.0f} pkt/s  retained={retained / 1e6:7.1f} MB")
+    return result
+
+def recall(exact_counts: dict, estimated: list, k: int) -> float:
+    expected = {key for key, _ in sorted(exact_counts.items(), key=lambda item: -item[1])[:k]}
+    return len(expected & {item["key"] for item in estimated[:k]}) / k
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packets", type=int, default=300000)
+    args = parser.parse_args()
+
+    packets = synthetic_packets(args.packets)
+    print(f"{args.packets} paquets synthétiques")
+    reference = measure("before", exact, packets)
+    traffic = measure("after", sketch, packets)
+
+    unique_ports = set(reference["source_ports"]) | set(reference["destination_ports"])
+    print(f"top-10 émetteurs : rappel {recall(reference['talkers'], traffic.talkers.top(), 10):.1f}")
+    print(f"top-5 ports destination : rappel "
+          f"{recall(reference['destination_ports'], traffic.destination_ports.top(), 5):.1f}")
+    print(f"sources distinctes : {len(reference['talkers'])} exactes, {traffic.unique_sources.count()} estimées")
+    print(f"ports distincts : {len(unique_ports)} exacts, {traffic.unique_ports.count()} estimés")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Analyse tshark : sortie -T json complète (avant) ou -T fields lue ligne à ligne (après).
+
+Chaque mode tourne dans un processus séparé (pic RSS propre) avec un tshark
+de remplacement qui rend une sortie préparée (voir synthetic.py) : seule
+la lecture et la comptabilisation côté NetworkAnalyzer sont mesurées.
+
+    cd backend && python benchmarks/bench_tshark_stream.py --packets 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from synthetic import TARGET, install_standin_tshark, write_tshark_fields, write_tshark_json
+
+def run_mode(mode: str, capture: str) -> None:
+    """Processus enfant : analyse complète dans le mode demandé"""
+    from app.scanners.network_analyzer import NetworkAnalyzer
+
+    analyzer = NetworkAnalyzer(TARGET, {"input_pcap": capture, "analysis_mode": mode})
+    started = time.perf_counter()
+    results = asyncio.run(analyzer.scan())
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "status": results["status"],
+        "packets": results["results"]["summary"]["total_packets"],
+        "seconds": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packets", type=int, default=200000)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "CAPTURE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_mode(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "packets.json")
+        fields_path = os.path.join(directory, "packets.tsv")
+        write_tshark_json(json_path, args.packets)
+        write_tshark_fields(fields_path, args.packets)
+        capture = os.path.join(directory, "capture.pcap")
+        open(capture, "wb").close()
+        env = {**os.environ, "PATH": install_standin_tshark(directory, json_path, fields_path)}
+        print(f"{args.packets} paquets : -T json {os.path.getsize(json_path) / 1e6:.0f} MB, "
+              f"-T fields {os.path.getsize(fields_path) / 1e6:.0f} MB")
+
+        for label, mode in (("before", "json"), ("after", "stream")):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, capture],
+                env=env, cwd=BACKEND, check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{label:<7} {mode:<7} {result['status']:<10} packets={result['packets']:<8} "
+                  f"{result['packets'] / result['seconds']:>10,.0f} pkt/s  peak RSS={result['peak_rss_mb']:6.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Rapport ZAP : json.load et une entrée par alerte (avant) ou lecture par blocs et regroupement (après).
+
+Rapport synthétique à plat (format de zap-baseline -J) : beaucoup d'alertes
+pour peu de règles, avec les longues descriptions répétées par ZAP. Mesure
+le temps de lecture, le pic mémoire (tracemalloc) et la taille du résultat
+enregistré en base.
+
+    cd backend && python benchmarks/bench_zap_report.py --alerts 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scanners.zap_report import summarize_report
+
+RISKS = ["High", "Medium", "Low", "Informational"]
+
+def write_report(path: str, count: int, rules: int = 60, seed: int = 1) -> None:
+    rnd = random.Random(seed)
+    alerts = []
+    for index in range(count):
+        rule = rnd.randrange(rules)
+        alerts.append({
+            "pluginId": str(10000 + rule),
+            "name": f"Rule {rule} \"quoted\" alert",
+            "risk": RISKS[rule % len(RISKS)],
+            "description": f"Long description of rule {rule}. " * 20,
+            "solution": f"Apply the fix for rule {rule}. " * 10,
+            "url": f"http://target.test/path/{index}?q=1",
+            "evidence": f"<script>{index}</script>"
+        })
+    with open(path, "w") as f:
+        json.dump({"@version": "2.14", "alerts": alerts}, f)
+
+def format_alerts(path: str) -> dict:
+    """Ancien chemin : rapport chargé en entier, une entrée par alerte"""
+    with open(path) as f:
+        alerts = json.load(f).get("alerts", [])
+    results = {
+        "summary": {
+            "total_alerts": len(alerts),
+            "risk_levels": {"high": 0, "medium": 0, "low": 0, "informational": 0}
+        },
+        "alerts": []
+    }
+    for alert in alerts:
+        risk = alert.get("risk", "informational").lower()
+        results["summary"]["risk_levels"][risk] = results["summary"]["risk_levels"].get(risk, 0) + 1
+        results["alerts"].append({
+            "name": alert.get("name"),
+            "risk": risk,
+            "description": alert.get("description"),
+            "solution": alert.get("solution"),
+            "url": alert.get("url"),
+            "evidence": alert.get("evidence")
+        })
+    return results
+
+def measure(name: str, function, path: str) -> dict:
+    started = time.perf_counter()
+    result = function(path)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    function(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:<7} {elapsed:6.2f} s  peak={peak / 1e6:6.1f} MB  "
+          f"stored={len(json.dumps(result)) / 1e6:6.2f} MB  entries={len(result['alerts'])}")
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "report.json")
+        write_report(path, args.alerts)
+        print(f"{args.alerts} alertes, rapport de {os.path.getsize(path) / 1e6:.0f} MB")
+        before = measure("before", format_alerts, path)
+        after = measure("after", summarize_report, path)
+    same = before["summary"]["risk_levels"] == after["summary"]["risk_levels"]
+    print(f"niveaux de risque identiques : {'oui' if same else 'non'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Latence de base de données simulée pour les benchmarks de l'API.
+
+Chargé par Python au démarrage quand ce répertoire est dans PYTHONPATH :
+chaque instruction SQLite attend DB_LATENCY_MS millisecondes, comme un
+aller-retour réseau vers PostgreSQL, et la requête du rang dans la file
+(sous-requête corrélée sur scan_jobs) DB_SLOW_MS de plus.
+"""
+import os
+import sqlite3
+import sqlite3.dbapi2
+import time
+
+DELAY = float(os.environ.get("DB_LATENCY_MS", "0")) / 1000
+SLOW = float(os.environ.get("DB_SLOW_MS", "0")) / 1000
+
+def delay(sql: str) -> None:
+    time.sleep(DELAY + (SLOW if "count(" in sql and "scan_jobs_1" in sql else 0))
+
+class DelayCursor(sqlite3.Cursor):
+    def execute(self, *args, **kwargs):
+        delay(args[0])
+        return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        delay(args[0])
+        return super().executemany(*args, **kwargs)
+
+class DelayConnection(sqlite3.Connection):
+    def cursor(self, factory=DelayCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args, **kwargs):
+        return self.cursor().execute(*args, **kwargs)
+
+if DELAY or SLOW:
+    _connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        kwargs.setdefault("factory", DelayConnection)
+        return _connect(*args, **kwargs)
+
+    sqlite3.connect = sqlite3.dbapi2.connect = connect
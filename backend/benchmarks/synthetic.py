@@ -0,0 +1,102 @@
+"""Trafic synthétique pour les benchmarks d'analyse réseau.
+
+Un même jeu de paquets est écrit en pcap (Ethernet/IPv4) et sous les deux
+formes de sortie de tshark lues par NetworkAnalyzer (-T json, -T fields).
+Le tshark de remplacement rend ces sorties sans décoder le pcap : les
+mesures portent sur le traitement côté analyseur, pas sur la dissection de
+tshark.
+"""
+import json
+import os
+import random
+import stat
+import struct
+import sys
+from typing import Iterator, Tuple
+
+# Adresse des paquets : chaque paquet a la cible pour source ou destination
+TARGET = "10.0.0.2"
+TARGET_ADDRESS = (10 << 24) | 2
+
+Packet = Tuple[float, int, int, int, int, int, int, int]  # ts, proto, src, sport, dst, dport, length, flags
+
+def packets(count: int, sources: int = 300, seed: int = 1, start: float = 1_700_000_000.0,
+            rate: float = 10000.0) -> Iterator[Packet]:
+    """count paquets TCP (80 %) et UDP entre la cible et sources adresses"""
+    rnd = random.Random(seed)
+    ts = start
+    for _ in range(count):
+        ts += rnd.expovariate(rate)
+        proto = 6 if rnd.random() < 0.8 else 17
+        peer = (10 << 24) | rnd.randint(3, 2 + sources)
+        src, dst = (peer, TARGET_ADDRESS) if rnd.random() < 0.5 else (TARGET_ADDRESS, peer)
+        sport, dport = rnd.randint(1024, 65535), rnd.choice([22, 53, 80, 443])
+        length = 60 + rnd.randint(0, 64)
+        flags = 0x18 if proto == 6 else 0
+        yield ts, proto, src, sport, dst, dport, length, flags
+
+def ip(value: int) -> str:
+    return ".".join(str((value >> shift) & 255) for shift in (24, 16, 8, 0))
+
+def write_pcap(path: str, count: int, **options) -> None:
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for ts, proto, src, sport, dst, dport, length, flags in packets(count, **options):
+            if proto == 6:
+                l4 = struct.pack("!HHIIBBHHH", sport, dport, 1, 1, 0x50, flags, 1024, 0, 0)
+            else:
+                l4 = struct.pack("!HHHH", sport, dport, 8, 0)
+            payload = b"x" * max(length - 14 - 20 - len(l4), 0)
+            header = struct.pack("!BBHHHBBHII", 0x45, 0, 20 + len(l4) + len(payload), 0, 0x4000, 64, proto, 0, src, dst)
+            frame = b"\x00" * 12 + b"\x08\x00" + header + l4 + payload
+            seconds = int(ts)
+            f.write(struct.pack("<IIII", seconds, int((ts - seconds) * 1e6), len(frame), len(frame)))
+            f.write(frame)
+
+def write_tshark_fields(path: str, count: int, **options) -> None:
+    """Sortie -T fields, colonnes de network_analyzer.STREAM_FIELDS"""
+    with open(path, "w") as f:
+        for ts, proto, src, sport, dst, dport, length, flags in packets(count, **options):
+            tcp = proto == 6
+            f.write("\t".join([
+                f"{ts:.6f}", str(proto), ip(src),
+                str(sport) if tcp else "", "" if tcp else str(sport),
+                ip(dst),
+                str(dport) if tcp else "", "" if tcp else str(dport),
+                str(length), f"0x{flags:04x}" if tcp else ""
+            ]) + "\n")
+
+def write_tshark_json(path: str, count: int, **options) -> None:
+    """Sortie -T json : tableau de paquets indenté, avec les couches usuelles"""
+    with open(path, "w") as f:
+        f.write("[\n")
+        for index, (ts, proto, src, sport, dst, dport, length, flags) in enumerate(packets(count, **options)):
+            transport = "tcp" if proto == 6 else "udp"
+            layers = {
+                "frame": {"frame.time_epoch": f"{ts:.6f}", "frame.len": str(length),
+                          "frame.protocols": f"eth:ethertype:ip:{transport}"},
+                "eth": {"eth.src": "00:11:22:33:44:55", "eth.dst": "66:77:88:99:aa:bb"},
+                "ip": {"ip.proto": str(proto), "ip.src": ip(src), "ip.dst": ip(dst), "ip.ttl": "64"},
+                transport: {f"{transport}.srcport": str(sport), f"{transport}.dstport": str(dport)}
+            }
+            if proto == 6:
+                layers["tcp"]["tcp.flags"] = f"0x{flags:04x}"
+            packet = {"_index": "packets", "_type": "doc", "_score": None, "_source": {"layers": layers}}
+            f.write(("  ," if index else "  ") + json.dumps(packet, indent=2) + "\n")
+        f.write("]\n")
+
+STANDIN_TSHARK = """#!{python}
+# tshark de remplacement : rend la sortie préparée pour -T json ou -T fields
+import shutil, sys
+path = {json!r} if "json" in sys.argv else {fields!r}
+with open(path, "rb") as f:
+    shutil.copyfileobj(f, sys.stdout.buffer, 1024 * 1024)
+"""
+
+def install_standin_tshark(directory: str, json_path: str, fields_path: str) -> str:
+    """Écrit un exécutable tshark dans directory ; retourne le PATH à utiliser"""
+    path = os.path.join(directory, "tshark")
+    with open(path, "w") as f:
+        f.write(STANDIN_TSHARK.format(python=sys.executable, json=json_path, fields=fields_path))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return directory + os.pathsep + os.environ.get("PATH", "")
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import tempfile
+
+# app.database et app.blob_store se configurent à l'import : base SQLite et blobs jetables par défaut
+TEST_DATA = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(TEST_DATA, "tests.db"))
+os.environ.setdefault("BLOB_STORE_PATH", os.path.join(TEST_DATA, "blobs"))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.main import app
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tests.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+@pytest.fixture
+def users(db):
+    alice = models.User(username="alice", email="alice@example.com", hashed_password="x")
+    bob = models.User(username="bob", email="bob@example.com", hashed_password="x")
+    db.add_all([alice, bob])
+    db.commit()
+    return alice, bob
+
+@pytest.fixture(scope="module")
+def client():
+    # Le TestClient de cette version de Starlette exécute l'API dans la boucle
+    # courante, que les tests précédents (asyncio.run) ont retirée
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    # Démarrage et arrêt de l'API : le moteur asynchrone est libéré à la fin du module
+    with TestClient(app) as client:
+        yield client
+    asyncio.set_event_loop(None)
+    loop.close()
@@ -0,0 +1,84 @@
+from app import baseline, models
+from app.baseline import load_baseline
+from app.scanners.scan_diff import apply_delta, open_services
+
+def port(number: int, protocol: str = "tcp", state: str = "open", name: str = None) -> dict:
+    return {"protocol": protocol, "number": str(number), "state": state, "service": {"name": name}}
+
+def host(ip: str, *ports) -> dict:
+    return {"ip": ip, "status": "up", "ports": list(ports)}
+
+def network_report(results: dict, timestamp: str = "2026-01-01T00:00:00") -> dict:
+    return {"results": {"NetworkScanner": {"status": "completed", "timestamp": timestamp, "results": results}}}
+
+def test_open_services_filters_protocol():
+    data = host("10.0.0.1", port(53, "udp"), port(53), port(80, state="closed"))
+    assert set(open_services(data)) == {("udp", 53), ("tcp", 53)}
+    assert set(open_services(data, {53}, "tcp")) == {("tcp", 53)}
+
+def test_apply_delta_replaces_only_rescanned_tcp_ports():
+    hosts = [
+        host("10.0.0.1", port(22, name="ssh"), port(161, "udp"), port(8443, name="https")),
+        host("10.0.0.2", port(80)),
+        host("10.0.0.3", port(25))
+    ]
+    results = {
+        "mode": "incremental",
+        "port_range": "1-1000",
+        "hosts": [host("10.0.0.1", port(22, name="openssh"), port(443, name="https"))],
+        "delta": {"gone_hosts": ["10.0.0.3"]}
+    }
+    merged = apply_delta(hosts, results)
+    assert [data["ip"] for data in merged] == ["10.0.0.1", "10.0.0.2"]
+    # UDP et hors plage (8443) repris de la référence, plage 1-1000 remplacée
+    assert [(entry["protocol"], entry["number"], entry["service"]["name"]) for entry in merged[0]["ports"]] == [
+        ("tcp", "22", "openssh"), ("tcp", "443", "https"), ("tcp", "8443", "https"), ("udp", "161", None)
+    ]
+
+def test_apply_delta_without_port_range_replaces_host():
+    merged = apply_delta([host("10.0.0.1", port(161, "udp"))], {"hosts": [host("10.0.0.1", port(22))]})
+    assert merged[0]["ports"] == [port(22)]
+
+def test_load_baseline_reads_each_report_once(db, users, monkeypatch):
+    alice, _ = users
+    full = models.Report(title="full", scan_type="network", target="10.0.0.0/30", owner_id=alice.id,
+                         results=network_report({"hosts": [host("10.0.0.1", port(22), port(53, "udp"))]}))
+    db.add(full)
+    db.commit()
+    incremental = models.Report(title="incremental", scan_type="network", target="10.0.0.0/30", owner_id=alice.id,
+                                results=network_report({
+                                    "mode": "incremental",
+                                    "port_range": "1-1000",
+                                    "baseline": {"report_id": full.id},
+                                    "hosts": [host("10.0.0.1", port(80))],
+                                    "delta": {"gone_hosts": []}
+                                }, timestamp="2026-01-02T00:00:00"))
+    db.add(incremental)
+    db.commit()
+
+    reads = []
+    original = baseline.load_report_results
+    monkeypatch.setattr(baseline, "load_report_results", lambda report: reads.append(report.id) or original(report))
+
+    state = load_baseline(db, alice.id, "10.0.0.0/30")
+    assert reads == [incremental.id, full.id]
+    assert state["report_id"] == incremental.id
+    assert state["timestamp"] == "2026-01-02T00:00:00"
+    assert [(entry["protocol"], entry["number"]) for entry in state["hosts"][0]["ports"]] == [("tcp", "80"), ("udp", "53")]
+
+def test_load_baseline_ignores_another_users_reports(db, users):
+    alice, bob = users
+    foreign = models.Report(title="full", scan_type="network", target="10.0.0.0/30", owner_id=alice.id,
+                            results=network_report({"hosts": [host("10.0.0.1", port(22))]}))
+    db.add(foreign)
+    db.commit()
+    # Rapport de bob dont la référence est un rapport d'alice (résultat partagé)
+    db.add(models.Report(title="incremental", scan_type="network", target="10.0.0.0/30", owner_id=bob.id,
+                         results=network_report({
+                             "mode": "incremental",
+                             "baseline": {"report_id": foreign.id},
+                             "hosts": [],
+                             "delta": {"gone_hosts": []}
+                         })))
+    db.commit()
+    assert load_baseline(db, bob.id, "10.0.0.0/30") is None
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from app import models
+from app.events import purge_events
+
+def add_job(db, owner: models.User, status: str, completed_minutes_ago=None) -> models.ScanJob:
+    completed_at = None
+    if completed_minutes_ago is not None:
+        completed_at = datetime.utcnow() - timedelta(minutes=completed_minutes_ago)
+    job = models.ScanJob(scan_type="network", target="10.0.0.1", parameters={}, status=status,
+                         completed_at=completed_at, owner_id=owner.id)
+    db.add(job)
+    db.commit()
+    db.add_all([models.ScanEvent(scan_job_id=job.id, type="host", data={"index": index}) for index in range(3)])
+    db.commit()
+    return job
+
+def remaining(db) -> dict:
+    counts = {}
+    for event in db.query(models.ScanEvent):
+        counts[event.scan_job_id] = counts.get(event.scan_job_id, 0) + 1
+    return counts
+
+def test_purge_events_of_old_terminal_jobs(db, users):
+    alice, _ = users
+    add_job(db, alice, "completed", completed_minutes_ago=120)
+    add_job(db, alice, "cancelled", completed_minutes_ago=90)
+    recent = add_job(db, alice, "failed", completed_minutes_ago=5)
+    running = add_job(db, alice, "running")
+
+    assert purge_events(db, retention=3600) == 6
+    assert remaining(db) == {recent.id: 3, running.id: 3}
+    # Idempotent
+    assert purge_events(db, retention=3600) == 0
+
+def test_purge_events_keeps_latest_event(db, users):
+    alice, _ = users
+    job = add_job(db, alice, "completed", completed_minutes_ago=120)
+    assert purge_events(db, retention=3600) == 2
+    assert remaining(db) == {job.id: 1}
@@ -0,0 +1,90 @@
+import uuid
+from datetime import datetime
+
+from app import models, security
+from app.database import SessionLocal
+from app.inventory import InventoryWriter
+from app.scan_cache import cache_key
+
+def port(number: int, name: str = None) -> dict:
+    return {"protocol": "tcp", "number": str(number), "state": "open",
+            "service": {"name": name, "product": None, "version": None}}
+
+def host(ip: str, *ports) -> dict:
+    return {"ip": ip, "status": "up", "ports": list(ports)}
+
+def network_report(results: dict, timestamp: str) -> dict:
+    return {"results": {"NetworkScanner": {"status": "completed", "timestamp": timestamp, "results": results}}}
+
+def record(db, owner: models.User, results: dict) -> models.Report:
+    report = models.Report(title="scan", scan_type="network", target="10.0.0.0/29", owner_id=owner.id)
+    db.add(report)
+    db.commit()
+    InventoryWriter(db, report).record(results)
+    return report
+
+def hosts(db) -> dict:
+    return {host.address: host for host in db.query(models.Host)}
+
+def test_incremental_scan_refreshes_unprobed_live_hosts(db, users):
+    alice, _ = users
+    record(db, alice, network_report({
+        "hosts": [host("10.0.0.1", port(22)), host("10.0.0.2", port(80)), host("10.0.0.3", port(25))]
+    }, "2026-01-01T00:00:00"))
+    incremental = record(db, alice, network_report({
+        "mode": "incremental",
+        "hosts": [host("10.0.0.1", port(22), port(443))],
+        "unchanged": ["10.0.0.2"],
+        "delta": {"gone_hosts": ["10.0.0.3"], "closed": []}
+    }, "2026-01-02T00:00:00"))
+
+    state = hosts(db)
+    # Hôte confirmé actif par la découverte, sans nouvelle détection de services
+    assert state["10.0.0.2"].last_seen == datetime(2026, 1, 2)
+    assert state["10.0.0.2"].report_id == incremental.id
+    assert state["10.0.0.1"].last_seen == datetime(2026, 1, 2)
+    assert (state["10.0.0.3"].status, state["10.0.0.3"].last_seen) == ("down", datetime(2026, 1, 1))
+    ports = {(service.host.address, service.port): service.last_seen for service in db.query(models.Service)}
+    assert ports[("10.0.0.2", 80)] == datetime(2026, 1, 1)
+    assert ports[("10.0.0.1", 443)] == datetime(2026, 1, 2)
+
+def test_older_incremental_scan_keeps_last_seen(db, users):
+    alice, _ = users
+    record(db, alice, network_report({"hosts": [host("10.0.0.2", port(80))]}, "2026-01-03T00:00:00"))
+    record(db, alice, network_report({
+        "mode": "incremental", "hosts": [], "unchanged": ["10.0.0.2"], "delta": {}
+    }, "2026-01-02T00:00:00"))
+    assert hosts(db)["10.0.0.2"].last_seen == datetime(2026, 1, 3)
+
+def add_user() -> tuple:
+    with SessionLocal() as db:
+        name = f"inventory-{uuid.uuid4().hex[:8]}"
+        user = models.User(username=name, email=f"{name}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        return user.id, {"Authorization": f"Bearer {security.create_access_token({'sub': name})}"}
+
+def test_cache_hit_indexes_requester_inventory(client):
+    leader_id, _ = add_user()
+    _, headers = add_user()
+    target = f"10.9.{uuid.uuid4().int % 256}.1"
+    with SessionLocal() as db:
+        report = models.Report(title="scan", scan_type="network", target=target, status="completed",
+                               owner_id=leader_id,
+                               results=network_report({"hosts": [host(target, port(22))]}, "2026-01-01T00:00:00"))
+        db.add(report)
+        db.commit()
+        leader = models.ScanJob(scan_type="network", target=target, parameters={}, status="completed",
+                                owner_id=leader_id, report_id=report.id, progress=100.0)
+        db.add(leader)
+        db.commit()
+        db.add(models.ScanCacheEntry(cache_key=cache_key("network", target, {}), scan_job_id=leader.id,
+                                     completed_at=datetime.utcnow(), last_used_at=datetime.utcnow(), hits=0))
+        db.commit()
+
+    response = client.post("/api/v1/scan/", json={"scan_type": "network", "target": target, "parameters": {}},
+                           headers=headers)
+    assert response.json()["cache_status"] == "hit"
+    # Tâche d'arrière-plan terminée avant le retour du TestClient
+    items = client.get("/api/v1/inventory/hosts", headers=headers).json()["items"]
+    assert [item["address"] for item in items] == [target]
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models
+from app.job_queue import SCAN_JOB_TIMEOUT, ScanJobQueue, parse_job_timeout
+
+def make_job(owner: models.User, priority: int = 0) -> models.ScanJob:
+    return models.ScanJob(scan_type="network", target="10.0.0.1", parameters={},
+                          priority=priority, owner_id=owner.id)
+
+def test_enqueue_sets_pending(db, users):
+    alice, _ = users
+    job = ScanJobQueue(db).enqueue(make_job(alice))
+    assert job.id is not None
+    assert job.status == "pending"
+
+def test_claim_order_priority_then_owner_fairness(db, users):
+    alice, bob = users
+    queue = ScanJobQueue(db)
+    busy = queue.enqueue(make_job(alice))
+    assert queue.claim("worker-0") == busy.id
+
+    alice_job = queue.enqueue(make_job(alice))
+    bob_job = queue.enqueue(make_job(bob))
+    urgent = queue.enqueue(make_job(alice, priority=5))
+    assert list(queue.queue_positions()) == [urgent.id, bob_job.id, alice_job.id]
+
+    # Priorité d'abord, puis l'utilisateur ayant le moins de scans en cours, puis l'ancienneté
+    assert queue.claim("worker-1") == urgent.id
+    assert queue.claim("worker-1") == bob_job.id
+    assert queue.claim("worker-1") == alice_job.id
+    assert queue.claim("worker-1") is None
+
+def test_claim_marks_running(db, users):
+    alice, _ = users
+    queue = ScanJobQueue(db)
+    job = queue.enqueue(make_job(alice))
+    queue.claim("worker-0")
+    db.refresh(job)
+    assert job.status == "running"
+    assert job.worker_id == "worker-0"
+    assert job.attempts == 1
+    assert job.heartbeat_at is not None
+
+def test_claimed_job_is_not_claimed_again(session_factory, users):
+    alice, _ = users
+    first, second = session_factory(), session_factory()
+    try:
+        job = ScanJobQueue(first).enqueue(make_job(alice))
+        assert ScanJobQueue(first).claim("worker-0") == job.id
+        # Un autre worker, avec sa propre session, ne voit plus de tâche à prendre
+        assert ScanJobQueue(second).claim("worker-1") is None
+    finally:
+        first.close()
+        second.close()
+
+def test_requeue_stale_after_missed_heartbeat(db, users):
+    alice, _ = users
+    queue = ScanJobQueue(db)
+    job = queue.enqueue(make_job(alice))
+    queue.claim("worker-0")
+
+    # Battement récent : la tâche reste au worker
+    assert queue.requeue_stale(stale_after=60, max_attempts=3)["requeued"] == []
+
+    db.query(models.ScanJob).filter(models.ScanJob.id == job.id).update(
+        {"heartbeat_at": datetime.utcnow() - timedelta(minutes=5)}
+    )
+    db.commit()
+    assert queue.requeue_stale(stale_after=60, max_attempts=3)["requeued"] == [job.id]
+    db.refresh(job)
+    assert job.status == "pending"
+    assert job.worker_id is None
+
+    assert queue.claim("worker-1") == job.id
+    db.refresh(job)
+    assert job.attempts == 2
+
+def test_requeue_stale_fails_after_max_attempts(db, users):
+    alice, _ = users
+    queue = ScanJobQueue(db)
+    job = queue.enqueue(make_job(alice))
+    queue.claim("worker-0")
+    db.query(models.ScanJob).filter(models.ScanJob.id == job.id).update(
+        {"heartbeat_at": datetime.utcnow() - timedelta(minutes=5)}
+    )
+    db.commit()
+    assert queue.requeue_stale(stale_after=60, max_attempts=1)["failed"] == [job.id]
+    db.refresh(job)
+    assert job.status == "failed"
+    assert job.completed_at is not None
+
+def test_request_cancel_pending_job_cancels_at_once(db, users):
+    alice, _ = users
+    queue = ScanJobQueue(db)
+    job = queue.enqueue(make_job(alice))
+    queue.request_cancel(job.id)
+    db.refresh(job)
+    assert job.status == "cancelled"
+    assert queue.claim("worker-0") is None
+
+def test_request_cancel_running_job_is_seen_by_worker(db, users):
+    alice, _ = users
+    queue = ScanJobQueue(db)
+    running = queue.enqueue(make_job(alice))
+    other = queue.enqueue(make_job(alice))
+    queue.claim("worker-0")
+    queue.claim("worker-0")
+    assert queue.cancel_requested([running.id, other.id]) == []
+
+    queue.request_cancel(running.id)
+    assert queue.cancel_requested([running.id, other.id]) == [running.id]
+    # L'arrêt est appliqué par le worker : la tâche reste en cours d'ici là
+    db.refresh(running)
+    assert running.status == "running"
+
+def test_parse_job_timeout():
+    assert parse_job_timeout({}) == SCAN_JOB_TIMEOUT
+    assert parse_job_timeout({"job_timeout": 60}) == 60.0
+    for invalid in (0, -5, SCAN_JOB_TIMEOUT + 1, "60", True):
+        with pytest.raises(ValueError):
+            parse_job_timeout({"job_timeout": invalid})
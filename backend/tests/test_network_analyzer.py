@@ -0,0 +1,22 @@
+from app.scanners.network_analyzer import NetworkAnalyzer, build_capture_filter, build_display_filter
+
+def test_build_display_filter_from_target_address():
+    assert build_display_filter("10.0.0.5") == "ip.addr == 10.0.0.5"
+    assert build_display_filter("10.0.0.0/24") == "ip.addr == 10.0.0.0/24"
+    assert build_display_filter("http://10.0.0.5:8080/login") == "ip.addr == 10.0.0.5"
+    assert build_display_filter("fe80::1") == "ipv6.addr == fe80::1"
+    # Noms d'hôte et URLs à nom : ip.addr ne les accepte pas
+    assert build_display_filter("example.com") is None
+    assert build_display_filter("https://example.com/app") is None
+
+def test_build_capture_filter_from_url():
+    assert build_capture_filter("https://example.com/app", "80,8000-8100") == \
+        "host example.com and (port 80 or portrange 8000-8100)"
+
+def test_display_filter_skipped_on_filtered_capture():
+    captured = NetworkAnalyzer("https://example.com/app", {"pipelined": True})
+    assert captured.capture_filter == "host example.com"
+    assert captured.display_filter() is None
+    # Fichier existant : aucun filtre noyau appliqué, filtre sur l'adresse
+    offline = NetworkAnalyzer("10.0.0.5", {"input_pcap": "capture.pcap"})
+    assert offline.display_filter() == "ip.addr == 10.0.0.5"
@@ -0,0 +1,108 @@
+import struct
+
+import pytest
+
+from app.scanners.pcap_stats import MAX_TIME_BUCKETS, analyze_pcap, compute_flows, read_pcap
+
+TARGET = (10 << 24) | 2
+PEER = (10 << 24) | 7
+
+def tcp_frame(src: int, sport: int, dst: int, dport: int, flags: int = 0x18, payload: bytes = b"") -> bytes:
+    tcp = struct.pack("!HHIIBBHHH", sport, dport, 1, 1, 0x50, flags, 1024, 0, 0)
+    ip = struct.pack("!BBHHHBBHII", 0x45, 0, 20 + len(tcp) + len(payload), 0, 0x4000, 64, 6, 0, src, dst)
+    return b"\x00" * 12 + b"\x08\x00" + ip + tcp + payload
+
+def udp_frame(src: int, sport: int, dst: int, dport: int, vlan: bool = False) -> bytes:
+    udp = struct.pack("!HHHH", sport, dport, 8, 0)
+    ip = struct.pack("!BBHHHBBHII", 0x45, 0, 28, 0, 0, 64, 17, 0, src, dst)
+    ethernet = b"\x00" * 12 + (b"\x81\x00\x00\x01" if vlan else b"") + b"\x08\x00"
+    return ethernet + ip + udp
+
+def arp_frame() -> bytes:
+    return b"\x00" * 12 + b"\x08\x06" + b"\x00" * 28
+
+def write_pcap(path, records) -> str:
+    """records : (horodatage, trame) ; pcap Ethernet, microsecondes, petit-boutiste"""
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for ts, frame in records:
+            seconds = int(ts)
+            f.write(struct.pack("<IIII", seconds, int(round((ts - seconds) * 1e6)), len(frame), len(frame)))
+            f.write(frame)
+    return str(path)
+
+@pytest.fixture
+def capture(tmp_path):
+    return write_pcap(tmp_path / "capture.pcap", [
+        (1000.0, tcp_frame(PEER, 40000, TARGET, 80, flags=0x02)),
+        (1000.5, tcp_frame(TARGET, 80, PEER, 40000, flags=0x12)),
+        (1001.25, tcp_frame(PEER, 40000, TARGET, 80, flags=0x10, payload=b"x" * 100)),
+        (1002.0, udp_frame(PEER, 5353, TARGET, 53, vlan=True)),
+        (1003.0, arp_frame())
+    ])
+
+def test_read_pcap_decodes_fixed_fields(capture):
+    packets = read_pcap(capture)
+    assert len(packets) == 5
+    assert list(packets["is_ip"]) == [True, True, True, True, False]
+    assert list(packets["proto"][:4]) == [6, 6, 6, 17]
+    assert packets["src"][0] == PEER and packets["dst"][0] == TARGET
+    assert (packets["sport"][0], packets["dport"][0]) == (40000, 80)
+    assert list(packets["flags"][:3]) == [0x02, 0x12, 0x10]
+    assert packets["ts"][2] == pytest.approx(1001.25)
+    assert packets["length"][2] == 14 + 20 + 20 + 100
+    # Trame 802.1Q : l'en-tête IP suit l'étiquette VLAN
+    assert (packets["sport"][3], packets["dport"][3]) == (5353, 53)
+
+def test_read_pcap_rejects_pcapng(tmp_path):
+    path = tmp_path / "capture.pcapng"
+    path.write_bytes(struct.pack("<IIIHHq", 0x0a0d0d0a, 28, 0x1a2b3c4d, 1, 0, -1) + b"\x00" * 8)
+    with pytest.raises(ValueError):
+        read_pcap(str(path))
+
+def test_read_pcap_empty_file(tmp_path):
+    path = tmp_path / "empty.pcap"
+    path.write_bytes(b"")
+    assert len(read_pcap(str(path))) == 0
+
+def test_compute_flows_groups_by_five_tuple(capture):
+    packets = read_pcap(capture)
+    total, flows = compute_flows(packets[packets["is_ip"]])
+    assert total == 3
+    # Les flux sont triés par volume décroissant
+    client = flows[0]
+    assert client["protocol"] == "6"
+    assert client["source"] == {"ip": "10.0.0.7", "port": "40000"}
+    assert client["destination"] == {"ip": "10.0.0.2", "port": "80"}
+    assert client["packets"] == 2
+    assert client["bytes"] == 54 + 154
+    assert client["first_seen"] == pytest.approx(1000.0)
+    assert client["last_seen"] == pytest.approx(1001.25)
+    assert client["tcp_flags"] == ["SYN", "ACK"]
+
+def test_compute_flows_limit_keeps_total(capture):
+    packets = read_pcap(capture)
+    total, flows = compute_flows(packets[packets["is_ip"]], limit=1)
+    assert total == 3
+    assert len(flows) == 1
+
+def test_analyze_pcap_offline_statistics(capture):
+    results = analyze_pcap(capture, target="10.0.0.2", interval=1.0)
+    summary = results["summary"]
+    assert summary["total_packets"] == 4
+    assert summary["protocols"] == {"6": 3, "17": 1}
+    assert summary["ports"]["destination"] == {"80": 2, "40000": 1, "53": 1}
+    assert summary["total_flows"] == 3
+    assert results["bytes_over_time"]["start"] == pytest.approx(1000.0)
+    assert len(results["bytes_over_time"]["bytes"]) == 3
+
+def test_analyze_pcap_bounds_time_buckets(tmp_path):
+    # Un en-tête d'enregistrement aberrant (horodatage 2^31) n'alloue pas une classe par seconde
+    path = write_pcap(tmp_path / "outlier.pcap", [
+        (1000.0, tcp_frame(PEER, 40000, TARGET, 80)),
+        (float(2 ** 31), tcp_frame(PEER, 40000, TARGET, 80))
+    ])
+    timeline = analyze_pcap(path, interval=1.0)["bytes_over_time"]
+    assert len(timeline["bytes"]) <= MAX_TIME_BUCKETS
+    assert sum(timeline["bytes"]) == 2 * 54
+    assert timeline["interval"] > 1.0
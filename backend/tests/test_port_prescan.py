@@ -0,0 +1,58 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from app.scanners.port_prescan import TcpConnectScanner, count_hosts, expand_hosts, parse_ports
+
+def free_port() -> int:
+    """Port local sans écoute : la connexion est refusée"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def scan_listeners(listeners: int, closed: int, **options):
+    async def accept(reader, writer):
+        writer.close()
+
+    servers = [await asyncio.start_server(accept, "127.0.0.1", 0) for _ in range(listeners)]
+    try:
+        open_ports = sorted(server.sockets[0].getsockname()[1] for server in servers)
+        closed_ports = [free_port() for _ in range(closed)]
+        scanner = TcpConnectScanner(**options)
+        started = time.monotonic()
+        results = await scanner.scan(["127.0.0.1"], open_ports + closed_ports)
+        return scanner, results, open_ports, time.monotonic() - started
+    finally:
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+
+def test_finds_open_ports_on_localhost():
+    scanner, results, open_ports, _ = asyncio.run(scan_listeners(5, 5, concurrency=4, timeout=1.0))
+    assert results == {"127.0.0.1": {"status": "up", "open_ports": open_ports}}
+    assert scanner.probes == 10
+
+def test_refused_connections_mark_host_up():
+    _, results, _, _ = asyncio.run(scan_listeners(0, 3, timeout=1.0))
+    assert results == {"127.0.0.1": {"status": "up", "open_ports": []}}
+
+def test_host_rate_limits_probes():
+    # 10 tentatives à 20/s : au moins 9 intervalles de 50 ms
+    _, results, open_ports, elapsed = asyncio.run(scan_listeners(2, 8, concurrency=10, host_rate=20))
+    assert results["127.0.0.1"]["open_ports"] == open_ports
+    assert elapsed >= 0.4
+
+def test_parse_ports():
+    assert parse_ports("22,80,1000-1002") == [22, 80, 1000, 1001, 1002]
+    assert parse_ports("443, 80,80") == [80, 443]
+    assert len(parse_ports("-")) == 65535
+    with pytest.raises(ValueError):
+        parse_ports("T:80,U:53")
+
+def test_expand_and_count_hosts():
+    target = "10.0.0.0/30 192.168.1.10-12,example.org"
+    assert expand_hosts(target) == ["10.0.0.1", "10.0.0.2", "192.168.1.10", "192.168.1.11", "192.168.1.12",
+                                    "example.org"]
+    assert count_hosts(target) == 6
@@ -0,0 +1,71 @@
+import uuid
+
+import pytest
+
+from app import models, schemas, security
+from app.blob_store import get_blob_store
+from app.database import SessionLocal
+from app.main import app
+
+RESULTS = {"status": "completed", "results": {"NetworkScanner": {"status": "completed", "results": {"hosts": []}}}}
+
+def add_user() -> tuple:
+    """Utilisateur de la base de l'API et en-têtes authentifiés"""
+    with SessionLocal() as db:
+        name = f"reader-{uuid.uuid4().hex[:8]}"
+        user = models.User(username=name, email=f"{name}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        token = security.create_access_token({"sub": name})
+        return user.id, {"Authorization": f"Bearer {token}"}
+
+def add_report(owner_id: int, **columns) -> int:
+    with SessionLocal() as db:
+        report = models.Report(title="scan", scan_type="network", target="10.0.0.1", status="completed",
+                               owner_id=owner_id, **columns)
+        db.add(report)
+        db.commit()
+        return report.id
+
+@pytest.fixture
+def reader():
+    return add_user()
+
+def test_report_detail_streams_blob(client, reader):
+    owner_id, headers = reader
+    report_id = add_report(owner_id, results_ref=get_blob_store().put_json(RESULTS), summary={"scanners": {}})
+    response = client.get(f"/users/me/reports/{report_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    body = response.json()
+    assert body["id"] == report_id and body["summary"] == {"scanners": {}}
+    assert body["results"] == RESULTS
+
+def test_report_detail_inline_results(client, reader):
+    owner_id, headers = reader
+    report_id = add_report(owner_id, results=RESULTS)
+    assert client.get(f"/users/me/reports/{report_id}", headers=headers).json()["results"] == RESULTS
+
+def test_report_detail_of_another_user(client, reader):
+    owner_id, _ = reader
+    report_id = add_report(owner_id, results=RESULTS)
+    _, other = add_user()
+    assert client.get(f"/users/me/reports/{report_id}", headers=other).status_code == 404
+
+def test_report_results_gzip_passthrough(client, reader):
+    owner_id, headers = reader
+    report_id = add_report(owner_id, results_ref=get_blob_store().put_json(RESULTS))
+    response = client.get(f"/users/me/reports/{report_id}/results", headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == RESULTS
+
+def test_report_detail_documents_payload():
+    operation = app.openapi()["paths"]["/users/me/reports/{report_id}"]["get"]
+    schema = operation["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema == {"$ref": "#/components/schemas/Report"}
+
+def test_report_schema_results_optional():
+    schema = app.openapi()["components"]["schemas"]["Report"]
+    assert "results" not in schema["required"]
+    assert schemas.Report(id=1, title="scan", scan_type="network", target="10.0.0.1",
+                          created_at="2026-01-01T00:00:00", owner_id=1).results is None
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app import models
+from app.resource_leases import ResourceLeases, SharedResources
+from app.scanners.resource_governor import ResourceGovernor
+
+CAPACITY = {"nmap": 2, "zap": 1, "tshark": 1, "cpu": 4, "memory": 1000}
+
+def test_tool_slots_are_shared_by_all_hosts(db):
+    leases = ResourceLeases(db)
+    assert leases.acquire("w1", "host-a", {"nmap": 1}, [], CAPACITY) is not None
+    assert leases.acquire("w2", "host-b", {"nmap": 1}, [], CAPACITY) is not None
+    assert leases.acquire("w3", "host-c", {"nmap": 1}, [], CAPACITY) is None
+
+def test_cpu_and_interfaces_are_per_host(db):
+    leases = ResourceLeases(db)
+    assert leases.acquire("w1", "host-a", {"cpu": 3}, ["interface:eth0"], CAPACITY) is not None
+    assert leases.acquire("w2", "host-a", {"cpu": 2}, [], CAPACITY) is None
+    assert leases.acquire("w2", "host-a", {"cpu": 1}, ["interface:eth0"], CAPACITY) is None
+    assert leases.acquire("w3", "host-b", {"cpu": 3}, ["interface:eth0"], CAPACITY) is not None
+
+def test_expired_and_released_leases_free_their_slots(db):
+    leases = ResourceLeases(db)
+    crashed = leases.acquire("w1", "host-a", {"zap": 1}, [], CAPACITY)
+    assert leases.acquire("w2", "host-a", {"zap": 1}, [], CAPACITY) is None
+    db.query(models.ResourceLease).filter(models.ResourceLease.id == crashed).update(
+        {"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    lease_id = leases.acquire("w2", "host-a", {"zap": 1}, [], CAPACITY)
+    assert lease_id is not None
+    leases.release(lease_id)
+    assert db.query(models.ResourceLease).count() == 0
+
+class LocalShared(SharedResources):
+    """Réservations communes sur la base de test (session synchrone)"""
+
+    def __init__(self, session_factory, holder: str):
+        super().__init__(holder, CAPACITY, host=holder, poll_interval=0.01)
+        self.session_factory = session_factory
+
+    async def call(self, function, *args):
+        with self.session_factory() as db:
+            return function(ResourceLeases(db), *args)
+
+def test_governors_of_two_workers_share_tool_slots(session_factory):
+    async def run():
+        first = ResourceGovernor(CAPACITY, LocalShared(session_factory, "w1"))
+        second = ResourceGovernor(CAPACITY, LocalShared(session_factory, "w2"))
+        waits = []
+        reservation = second.reserve({"zap": 1}, on_wait=lambda *_: waits.append(1))
+        async with first.reserve({"zap": 1}):
+            waiting = asyncio.create_task(reservation.__aenter__())
+            await asyncio.sleep(0.05)
+            # Accordée dans son processus, la demande attend l'autre worker
+            assert not waiting.done() and second.saturated and waits == [1]
+        assert await asyncio.wait_for(waiting, 1) == {"zap": 1}
+        assert not second.saturated
+        with session_factory() as db:
+            assert [lease.holder for lease in db.query(models.ResourceLease)] == ["w2"]
+        await reservation.__aexit__(None, None, None)
+        with session_factory() as db:
+            assert db.query(models.ResourceLease).count() == 0
+    asyncio.run(run())
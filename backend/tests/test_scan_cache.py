@@ -0,0 +1,14 @@
+from app.scan_cache import cache_key
+
+def test_cache_key_ignores_order_spacing_and_timeouts():
+    assert cache_key("network", " 10.0.0.1 ", {"ports": "1-100", "timeout": 5, "scan_type": "full"}) == \
+        cache_key("network", "10.0.0.1", {"scan_type": "full", "ports": "1-100"})
+
+def test_cache_key_shared_across_owners_except_incremental():
+    assert cache_key("network", "10.0.0.1", {}, owner_id=1) == cache_key("network", "10.0.0.1", {}, owner_id=2)
+    # L'écart d'un scan incrémental est calculé contre l'historique du demandeur
+    incremental = {"incremental": True}
+    assert cache_key("network", "10.0.0.1", incremental, owner_id=1) != \
+        cache_key("network", "10.0.0.1", incremental, owner_id=2)
+    assert cache_key("network", "10.0.0.1", incremental, owner_id=1) == \
+        cache_key("network", "10.0.0.1", incremental, owner_id=1)
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.scanners.base_scanner import BaseScanner
+from app.scanners.scanner_manager import DeadlineExceeded, ScannerManager, wait_with_deadline
+
+class SleepyScanner(BaseScanner):
+    """Scanner de test : attend delay secondes puis lève error, s'il y en a une"""
+
+    def __init__(self, delay: float, error: Exception = None, timeout: float = 1.0):
+        super().__init__("10.0.0.1", {"timeout": timeout})
+        self.delay = delay
+        self.error = error
+
+    async def scan(self):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.update_status("completed")
+        return self.results
+
+def test_wait_with_deadline_expires():
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(wait_with_deadline(asyncio.sleep(10), 0.05))
+
+def test_wait_with_deadline_passes_inner_timeout():
+    async def inner():
+        raise asyncio.TimeoutError("inner")
+
+    with pytest.raises(asyncio.TimeoutError) as error:
+        asyncio.run(wait_with_deadline(inner(), 10))
+    assert not isinstance(error.value, DeadlineExceeded)
+
+def test_execute_scanner_reports_deadline():
+    scanner, result = asyncio.run(ScannerManager.execute_scanner(SleepyScanner(10, timeout=0.05)))
+    assert result["status"] == "failed"
+    assert result["errors"][0]["message"] == "Scanner timed out after 0.05 s"
+
+def test_execute_scanner_inner_timeout_is_a_failure():
+    scanner, result = asyncio.run(ScannerManager.execute_scanner(SleepyScanner(0, asyncio.TimeoutError(), timeout=10)))
+    assert result["status"] == "failed"
+    assert "timed out" not in result["error"]
+
+def test_wait_with_deadline_cancels_inner_task():
+    cleaned = []
+
+    async def inner():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            cleaned.append(True)
+
+    async def run():
+        task = asyncio.create_task(wait_with_deadline(inner(), 10))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert cleaned == [True]
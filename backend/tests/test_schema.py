@@ -0,0 +1,34 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app import models
+from app.database import upgrade_schema
+
+def test_upgrade_schema_adds_missing_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    # Tables d'une installation antérieure aux colonnes de file, de cache et de synthèse
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, email VARCHAR, "
+                                "hashed_password VARCHAR, is_active BOOLEAN, role VARCHAR)"))
+        connection.execute(text("CREATE TABLE reports (id INTEGER PRIMARY KEY, title VARCHAR, description VARCHAR, "
+                                "scan_type VARCHAR, target VARCHAR, results JSON, created_at DATETIME, "
+                                "owner_id INTEGER)"))
+        connection.execute(text("CREATE TABLE scan_jobs (id INTEGER PRIMARY KEY, scan_type VARCHAR, target VARCHAR, "
+                                "parameters JSON, status VARCHAR, started_at DATETIME, completed_at DATETIME, "
+                                "owner_id INTEGER, report_id INTEGER)"))
+        connection.execute(text("INSERT INTO scan_jobs (id, scan_type, target, status) "
+                                "VALUES (1, 'network', '10.0.0.1', 'pending')"))
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    for table in ("reports", "scan_jobs"):
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        assert columns == set(models.Base.metadata.tables[table].columns.keys())
+    assert "ix_scan_jobs_owner_id" in {index["name"] for index in inspector.get_indexes("scan_jobs")}
+    assert "hosts" in inspector.get_table_names()
+    with engine.connect() as connection:
+        row = connection.execute(text("SELECT priority, attempts, cancel_requested, cache_key FROM scan_jobs")).one()
+    # Les lignes existantes reçoivent les valeurs par défaut constantes des modèles
+    assert tuple(row) == (0, 0, 0, None)
+    engine.dispose()
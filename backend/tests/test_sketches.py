@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from app.scanners.sketches import CountMinSketch, HyperLogLog, SpaceSaving, TimeHistogram
+
+def test_time_histogram_in_order():
+    histogram = TimeHistogram(interval=1.0, buckets=8)
+    for ts in (100.0, 100.5, 101.2, 103.9):
+        histogram.add(ts, 10)
+    assert histogram.to_dict() == {"start": 100.0, "interval": 1.0, "packets": [2, 1, 0, 1], "bytes": [20, 10, 0, 10]}
+
+def test_time_histogram_doubles_interval_past_range():
+    histogram = TimeHistogram(interval=1.0, buckets=8)
+    histogram.add(0.0, 1)
+    histogram.add(20.0, 1)
+    timeline = histogram.to_dict()
+    assert timeline["interval"] == 4.0
+    assert sum(timeline["packets"]) == 2
+
+def test_time_histogram_keeps_earlier_packets():
+    # Fichiers du tampon circulaire analysés dans le désordre
+    histogram = TimeHistogram(interval=1.0, buckets=8)
+    for ts in (105.0, 105.5, 102.2, 100.0, 106.0):
+        histogram.add(ts, 10)
+    timeline = histogram.to_dict()
+    assert timeline["start"] == 100.0
+    assert timeline["interval"] == 1.0
+    assert timeline["packets"] == [1, 0, 1, 0, 0, 2, 1]
+    assert sum(timeline["bytes"]) == 50
+
+def test_time_histogram_earlier_packet_beyond_range_merges():
+    histogram = TimeHistogram(interval=1.0, buckets=8)
+    histogram.add(100.0, 1)
+    histogram.add(104.0, 1)
+    histogram.add(90.0, 1)
+    timeline = histogram.to_dict()
+    assert len(timeline["packets"]) <= 8
+    assert sum(timeline["packets"]) == 3
+    assert timeline["start"] <= 90.0
+    assert timeline["interval"] > 1.0
+
+def test_time_histogram_out_of_order_matches_sorted():
+    timestamps = [1000 + random.Random(seed).uniform(0, 300) for seed in range(500)]
+    ordered, shuffled = TimeHistogram(interval=1.0), TimeHistogram(interval=1.0)
+    for ts in sorted(timestamps):
+        ordered.add(ts, 1)
+    for ts in timestamps:
+        shuffled.add(ts, 1)
+    assert sum(shuffled.to_dict()["packets"]) == len(timestamps)
+    assert shuffled.to_dict()["interval"] == ordered.to_dict()["interval"]
+
+def test_count_min_never_underestimates():
+    sketch = CountMinSketch(width=64, depth=4)
+    counts = {}
+    rnd = random.Random(1)
+    for _ in range(5000):
+        key = rnd.randint(0, 500)
+        counts[key] = counts.get(key, 0) + 1
+        sketch.add(key)
+    bound = sketch.error_bound()["max_overestimate"]
+    for key, count in counts.items():
+        assert count <= sketch.estimate(key) <= count + bound * 3
+
+def test_space_saving_keeps_heavy_hitters():
+    top = SpaceSaving(capacity=10)
+    rnd = random.Random(2)
+    for _ in range(10000):
+        top.add("heavy" if rnd.random() < 0.3 else str(rnd.randint(0, 5000)))
+    assert top.top(1)[0]["key"] == "heavy"
+
+def test_hyperloglog_relative_error():
+    counter = HyperLogLog()
+    for value in range(50000):
+        counter.add(f"10.{value >> 16}.{(value >> 8) & 255}.{value & 255}")
+    assert counter.count() == pytest.approx(50000, rel=4 * counter.error_bound()["relative_standard_error"])
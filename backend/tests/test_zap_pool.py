@@ -0,0 +1,120 @@
+import asyncio
+import os
+import socket
+import sys
+
+import pytest
+
+from app.scanners.zap_pool import ZapDaemon, ZapPool, ZapPoolError
+from zap_standin import start_standin
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_lease_round_trip():
+    async def run():
+        port = free_port()
+        runner = await start_standin(port)
+        pool = ZapPool(urls=[f"http://127.0.0.1:{port}"])
+        try:
+            async with pool.lease("http://example.org/") as lease:
+                assert pool.available.qsize() == 0
+                assert lease.context_id is not None
+                started = await lease.call("spider", "action", "scan", url="http://example.org/")
+                assert started["scan"]
+                assert int((await lease.call("core", "view", "numberOfAlerts"))["numberOfAlerts"]) == 10
+            # Retour au pool avec une session vidée
+            assert pool.available.qsize() == 1
+            async with pool.lease("http://example.org/") as lease:
+                assert (await lease.call("core", "view", "numberOfAlerts"))["numberOfAlerts"] == "0"
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+def test_unhealthy_daemon_stays_in_pool():
+    async def run():
+        pool = ZapPool(urls=[f"http://127.0.0.1:{free_port()}"])
+        await pool.start()
+        try:
+            with pytest.raises(ZapPoolError):
+                await pool.acquire(attempts=1)
+            assert pool.available.qsize() == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(run())
+
+def test_cancelled_acquire_returns_daemon():
+    async def run():
+        pool = ZapPool(urls=["http://127.0.0.1:1"])
+        await pool.start()
+        daemon = pool.daemons[0]
+        checking = asyncio.Event()
+
+        async def hanging(session):
+            checking.set()
+            await asyncio.sleep(3600)
+
+        daemon.healthy = hanging
+        try:
+            task = asyncio.create_task(pool.acquire())
+            await checking.wait()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert pool.available.qsize() == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(run())
+
+def test_restart_error_returns_daemon():
+    async def run():
+        pool = ZapPool(urls=[f"http://127.0.0.1:{free_port()}"])
+        await pool.start()
+        # Démon géré dont le binaire a disparu : FileNotFoundError, pas ZapPoolError
+        pool.daemons[0].command = ["/nonexistent/zap.sh", "-daemon"]
+        try:
+            with pytest.raises(FileNotFoundError):
+                await pool.acquire()
+            assert pool.available.qsize() == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(run())
+
+def test_failed_start_stops_started_daemons(tmp_path, monkeypatch):
+    base_port = free_port()
+    # Seul le premier démon démarre (stand-in), le second s'arrête aussitôt
+    zap = tmp_path / "zap.sh"
+    zap.write_text(
+        "#!/bin/sh\n"
+        f'[ "$5" = "{base_port}" ] || exit 1\n'
+        f'cd "{BACKEND}" && exec "{sys.executable}" tests/zap_standin.py --port "$5"\n'
+    )
+    zap.chmod(0o755)
+
+    async def run():
+        pool = ZapPool(size=2, zap_path=str(zap), base_port=base_port)
+        started = []
+        original = ZapDaemon.start
+
+        async def recording_start(daemon, session, startup_timeout=180):
+            started.append(daemon)
+            await original(daemon, session, startup_timeout)
+
+        monkeypatch.setattr(ZapDaemon, "start", recording_start)
+        with pytest.raises(ZapPoolError):
+            await pool.start()
+        assert pool.daemons == [] and pool.session is None and not pool.started
+        assert all(daemon.process.returncode is not None for daemon in started)
+        with pytest.raises(OSError):
+            await asyncio.open_connection("127.0.0.1", base_port)
+
+    asyncio.run(run())
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from app.scanners.zap_report import AlertAggregator, iter_report_alerts, summarize_report
+
+SITE_REPORT = {"site": [
+    {"@name": "a", "alerts": [{"pluginid": "1", "alert": "X", "riskdesc": "High (Medium)", "desc": "d",
+                               "instances": [{"uri": "u1"}, {"uri": "u2"}]}]},
+    {"@name": "b", "alerts": []}
+]}
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64])
+def test_per_site_report_in_small_chunks(tmp_path, chunk_size):
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps(SITE_REPORT, indent=2))
+    results = summarize_report(str(path), chunk_size=chunk_size)
+    assert results["summary"] == {"total_alerts": 2, "unique_alerts": 1,
+                                  "risk_levels": {"high": 2, "medium": 0, "low": 0, "informational": 0}}
+    assert results["alerts"][0]["urls"] == ["u1", "u2"]
+
+def test_flat_report_alerts_are_streamed(tmp_path):
+    path = tmp_path / "report.json"
+    alerts = [{"pluginId": str(index % 3), "name": "n \"q\" ]", "risk": "Low", "url": f"u{index}"}
+              for index in range(50)]
+    path.write_text(json.dumps({"@version": "2.14", "alerts": alerts}))
+    assert list(iter_report_alerts(str(path), chunk_size=7)) == alerts
+
+def test_empty_report(tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text('{"alerts": []}')
+    assert summarize_report(str(path))["summary"]["total_alerts"] == 0
+
+def test_aggregator_caps_instances():
+    aggregator = AlertAggregator(max_instances=2)
+    for index in range(5):
+        aggregator.add({"pluginId": "1", "name": "X", "risk": "Medium", "url": f"u{index}", "evidence": "e"})
+    group, = aggregator.to_dict()["alerts"]
+    assert group["count"] == 5
+    assert group["urls"] == ["u0", "u1"]
+    assert group["evidence"] == ["e"]
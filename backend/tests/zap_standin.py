@@ -0,0 +1,100 @@
+"""Serveur HTTP imitant le sous-ensemble de l'API ZAP utilisé par le pool.
+
+Double de test : permet de faire tourner ZapPool et VulnerabilityScanner
+sans ZAP, depuis backend/ :
+
+    python tests/zap_standin.py --port 8090 --alerts 50
+
+puis ZAP_API_URLS=http://127.0.0.1:8090 pour le worker.
+"""
+import argparse
+import itertools
+
+from aiohttp import web
+
+RISKS = ["High", "Medium", "Low", "Informational"]
+
+class ZapStandIn:
+    def __init__(self, alerts_per_scan: int = 10, steps: int = 3):
+        self.alerts_per_scan = alerts_per_scan
+        self.steps = steps
+        self.ids = itertools.count()
+        self.contexts = {}
+        self.scans = {}
+        self.alerts = []
+        self.app = web.Application()
+        self.app.router.add_get("/JSON/{component}/{kind}/{name}/", self.handle)
+
+    def synthetic_alerts(self, url: str):
+        for index in range(self.alerts_per_scan):
+            plugin = index % 7
+            yield {
+                "pluginId": str(10000 + plugin),
+                "alert": f"Synthetic alert {plugin}",
+                "name": f"Synthetic alert {plugin}",
+                "risk": RISKS[plugin % len(RISKS)],
+                "confidence": "Medium",
+                "description": f"Description of synthetic alert {plugin}",
+                "solution": f"Solution for synthetic alert {plugin}",
+                "url": f"{url.rstrip('/')}/page{index}",
+                "evidence": f"evidence-{index}"
+            }
+
+    def status(self, scan_id: str) -> str:
+        # Chaque consultation fait avancer le scan jusqu'à 100 %
+        self.scans[scan_id] = min(self.scans.get(scan_id, 0) + 100 // self.steps + 1, 100)
+        return str(self.scans[scan_id])
+
+    async def handle(self, request: web.Request) -> web.Response:
+        component = request.match_info["component"]
+        name = request.match_info["name"]
+        params = request.query
+        key = (component, name)
+
+        if key == ("core", "version"):
+            return web.json_response({"version": "stand-in"})
+        if key == ("core", "newSession"):
+            self.alerts = []
+            return web.json_response({"Result": "OK"})
+        if key == ("context", "newContext"):
+            context_id = str(next(self.ids))
+            self.contexts[params["contextName"]] = context_id
+            return web.json_response({"contextId": context_id})
+        if key in (("context", "includeInContext"), ("context", "removeContext")):
+            if key[1] == "removeContext":
+                self.contexts.pop(params.get("contextName"), None)
+            return web.json_response({"Result": "OK"})
+        if key in (("spider", "scan"), ("ascan", "scan")):
+            scan_id = str(next(self.ids))
+            self.scans[scan_id] = 0
+            if component == "spider":
+                self.alerts.extend(self.synthetic_alerts(params.get("url", "")))
+            return web.json_response({"scan": scan_id})
+        if key in (("spider", "stopAllScans"), ("ascan", "stopAllScans")):
+            return web.json_response({"Result": "OK"})
+        if key in (("spider", "status"), ("ascan", "status")):
+            return web.json_response({"status": self.status(params["scanId"])})
+        if key == ("pscan", "recordsToScan"):
+            return web.json_response({"recordsToScan": "0"})
+        if key == ("core", "numberOfAlerts"):
+            return web.json_response({"numberOfAlerts": str(len(self.alerts))})
+        if key == ("core", "alerts"):
+            start = int(params.get("start", 0))
+            count = int(params.get("count", 0)) or len(self.alerts)
+            return web.json_response({"alerts": self.alerts[start:start + count]})
+
+        return web.json_response({"code": "bad_view", "message": f"{component}/{name}"}, status=400)
+
+async def start_standin(port: int, alerts_per_scan: int = 10) -> web.AppRunner:
+    """Démarre le serveur dans la boucle courante (à arrêter avec runner.cleanup())"""
+    runner = web.AppRunner(ZapStandIn(alerts_per_scan).app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ZAP API stand-in")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--alerts", type=int, default=10)
+    args = parser.parse_args()
+    web.run_app(ZapStandIn(args.alerts).app, host="127.0.0.1", port=args.port)
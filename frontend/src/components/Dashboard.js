@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Container,
   Grid,
@@ -69,6 +69,47 @@ function Dashboard() {
   const [target, setTarget] = useState('');
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
+  const eventSources = useRef({});
+
+  // Suivi en direct des scans via /events (Server-Sent Events) au lieu de relire /results
+  useEffect(() => {
+    const token = localStorage.getItem('token');
+    Object.entries(activeScans).forEach(([scanId, scan]) => {
+      if (eventSources.current[scanId] || ['completed', 'failed', 'cancelled'].includes(scan.status)) {
+        return;
+      }
+      const source = new EventSource(
+        `http://localhost:8000/api/v1/scan/${scanId}/events?token=${encodeURIComponent(token)}`
+      );
+      const updateStatus = (status) => {
+        setActiveScans(prev => prev[scanId] ? { ...prev, [scanId]: { ...prev[scanId], status } } : prev);
+        if (['completed', 'failed', 'cancelled'].includes(status)) {
+          source.close();
+          delete eventSources.current[scanId];
+        }
+      };
+      source.addEventListener('snapshot', (event) => updateStatus(JSON.parse(event.data).status));
+      source.addEventListener('status', (event) => {
+        const payload = JSON.parse(event.data);
+        if (!payload.scanner) {
+          updateStatus(payload.data.status);
+        }
+      });
+      eventSources.current[scanId] = source;
+    });
+
+    // Fermer les flux des scans retirés de la liste
+    Object.keys(eventSources.current).forEach((scanId) => {
+      if (!activeScans[scanId]) {
+        eventSources.current[scanId].close();
+        delete eventSources.current[scanId];
+      }
+    });
+  }, [activeScans]);
+
+  useEffect(() => () => {
+    Object.values(eventSources.current).forEach((source) => source.close());
+  }, []);
 
   const handleStartScan = async (scanType) => {
     setScanDialog({ open: true, type: scanType });
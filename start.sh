@@ -12,6 +12,10 @@ echo "Starting FastAPI backend..."
 cd /app
 uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload &
 
+# Start scan worker (runs the jobs queued by the API)
+echo "Starting scan worker..."
+python -m app.worker &
+
 # Start React frontend
 echo "Starting React frontend..."
 cd /app/frontend